@@ -0,0 +1,375 @@
+"""Script to benchmark the rumble detection pipeline and its main functions on
+synthetic recordings of several sample rates and durations, reporting the
+audio hours processed per CPU hour and the peak memory."""
+
+import argparse
+import logging
+import multiprocessing
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+from ultralytics.engine.results import Results
+
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
+    waveform_to_np_image,
+)
+from forest_elephants_rumble_detection.data.synthetic import write_synthetic_recording
+from forest_elephants_rumble_detection.model.yolo.backend import (
+    BACKENDS,
+    load_model,
+    warmup,
+)
+from forest_elephants_rumble_detection.model.yolo.predict import (
+    chunk,
+    load_audio,
+    pipeline,
+    to_dataframe,
+)
+from forest_elephants_rumble_detection.utils import write_json, yaml_read
+
+BENCHMARKS = ["chunk", "waveform_to_np_image", "to_dataframe", "pipeline"]
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--model-weights-filepath",
+        help="path to the model weights",
+        default="./data/08_artifacts/model/rumbles/yolov8/weights/best.pt",
+        type=Path,
+    )
+    parser.add_argument(
+        "--model-config",
+        help="path to the model config",
+        default="./data/08_artifacts/model/rumbles/yolov8/config.yaml",
+        type=Path,
+    )
+    parser.add_argument(
+        "--backend",
+        help="inference backend of the pipeline benchmark",
+        default="pytorch",
+        choices=list(BACKENDS.keys()),
+        type=str,
+    )
+    parser.add_argument(
+        "--sample-rates",
+        help="sample rates (Hz) of the synthetic recordings",
+        nargs="+",
+        default=[4000, 8000],
+        type=int,
+    )
+    parser.add_argument(
+        "--durations",
+        help="durations (hours) of the synthetic recordings",
+        nargs="+",
+        default=[1.0, 6.0],
+        type=float,
+    )
+    parser.add_argument(
+        "--benchmarks",
+        help="benchmarks to run",
+        nargs="+",
+        default=BENCHMARKS,
+        choices=BENCHMARKS,
+        type=str,
+    )
+    parser.add_argument(
+        "--overlap",
+        help="Overlap in seconds between two subsequent spectrograms.",
+        default=10.0,
+        type=float,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="Batch size of the pipeline.",
+        default=64,
+        type=int,
+    )
+    parser.add_argument(
+        "--boxes-per-spectrogram",
+        help="number of boxes per spectrogram of the to_dataframe benchmark",
+        default=100,
+        type=int,
+    )
+    parser.add_argument(
+        "--num-threads",
+        help="number of torch threads, the torch default when not set",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "--random-seed",
+        help="Random seed of the synthetic recordings",
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "--audio-dir",
+        help="dir to write the synthetic recordings to, a temporary dir by default",
+        default=None,
+        type=Path,
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="path to save the benchmark report",
+        default=Path("./data/06_reporting/benchmark/pipeline/"),
+        type=Path,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if "pipeline" in args["benchmarks"] and not args["model_weights_filepath"].exists():
+        logging.error("Invalid --model-weights-filepath filepath does not exist")
+        return False
+    elif not args["model_config"].exists():
+        logging.error("Invalid --model-config filepath does not exist")
+        return False
+    else:
+        return True
+
+
+def rumble_recall(df_detections: pd.DataFrame, df_rumbles: pd.DataFrame) -> float:
+    """Returns the share of the injected rumbles overlapped in time by at least
+    one detection."""
+    if len(df_rumbles) == 0:
+        return float("nan")
+    if len(df_detections) == 0:
+        return 0.0
+    t_start = df_detections["t_start"].to_numpy()[None, :]
+    t_end = df_detections["t_end"].to_numpy()[None, :]
+    overlaps = (df_rumbles["t_end"].to_numpy()[:, None] > t_start) & (
+        df_rumbles["t_start"].to_numpy()[:, None] < t_end
+    )
+    return float(overlaps.any(axis=1).mean())
+
+
+def synthetic_predictions(
+    number_spectrograms: int,
+    boxes_per_spectrogram: int,
+    width: int,
+    height: int,
+) -> list[Results]:
+    """Returns yolov8 Results with random boxes, as many as predicted with a low
+    confidence threshold."""
+    generator = torch.Generator().manual_seed(0)
+    orig_img = np.zeros((height, width, 3), dtype=np.uint8)
+    predictions = []
+    for i in range(number_spectrograms):
+        xy = torch.rand(boxes_per_spectrogram, 2, generator=generator) * torch.tensor(
+            [width, height]
+        )
+        wh = torch.rand(boxes_per_spectrogram, 2, generator=generator) * 50
+        boxes = torch.cat(
+            [
+                xy,
+                xy + wh,
+                torch.rand(boxes_per_spectrogram, 1, generator=generator),
+                torch.zeros(boxes_per_spectrogram, 1),
+            ],
+            dim=1,
+        )
+        predictions.append(
+            Results(orig_img, path=f"image{i}.png", names={0: "rumble"}, boxes=boxes)
+        )
+    return predictions
+
+
+def run_benchmark(
+    benchmark: str,
+    audio_filepath: Path,
+    df_rumbles: pd.DataFrame,
+    config: dict,
+    args: dict,
+) -> dict:
+    """Runs a single benchmark in the current process and returns its wall and
+    CPU time, the peak RSS of the process and benchmark specific metrics. Only
+    the benchmarked call is timed, not its setup."""
+    if args["num_threads"] is not None:
+        torch.set_num_threads(args["num_threads"])
+    duration, overlap = config["duration"], args["overlap"]
+    metrics = {}
+
+    if benchmark == "pipeline":
+        imgsz = (config["height"], config["width"])
+        model = warmup(
+            load_model(
+                args["model_weights_filepath"], backend=args["backend"], imgsz=imgsz
+            ),
+            imgsz=imgsz,
+        )
+        with tempfile.TemporaryDirectory() as output_dir:
+
+            def fn():
+                return pipeline(
+                    model=model,
+                    audio_filepaths=[audio_filepath],
+                    duration=duration,
+                    overlap=overlap,
+                    width=config["width"],
+                    height=config["height"],
+                    freq_min=config["freq_min"],
+                    freq_max=config["freq_max"],
+                    n_fft=config["n_fft"],
+                    hop_length=config["hop_length"],
+                    batch_size=args["batch_size"],
+                    output_dir=Path(output_dir),
+                    save_spectrograms=False,
+                    save_predictions=False,
+                    verbose=False,
+                )
+
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            df = fn()
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.process_time() - cpu_start
+        metrics["number_detections"] = len(df)
+        metrics["rumble_recall"] = rumble_recall(df, df_rumbles)
+    else:
+        waveform, sample_rate = load_audio(audio_filepath)
+        waveforms = chunk(
+            waveform=waveform,
+            sample_rate=sample_rate,
+            duration=duration,
+            overlap=overlap,
+        )
+        if benchmark == "chunk":
+
+            def fn():
+                return chunk(
+                    waveform=waveform,
+                    sample_rate=sample_rate,
+                    duration=duration,
+                    overlap=overlap,
+                )
+
+        elif benchmark == "waveform_to_np_image":
+
+            def fn():
+                return [
+                    waveform_to_np_image(
+                        waveform=y,
+                        sample_rate=sample_rate,
+                        n_fft=config["n_fft"],
+                        hop_length=config["hop_length"],
+                        freq_max=config["freq_max"],
+                        width=config["width"],
+                        height=config["height"],
+                    )
+                    for y in waveforms
+                ]
+
+        else:
+            predictions = synthetic_predictions(
+                number_spectrograms=len(waveforms),
+                boxes_per_spectrogram=args["boxes_per_spectrogram"],
+                width=config["width"],
+                height=config["height"],
+            )
+            metrics["number_boxes"] = len(predictions) * args["boxes_per_spectrogram"]
+
+            def fn():
+                return to_dataframe(
+                    yolov8_predictions=predictions,
+                    duration=duration,
+                    overlap=overlap,
+                    freq_min=config["freq_min"],
+                    freq_max=config["freq_max"],
+                )
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        fn()
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+        metrics["number_spectrograms"] = len(waveforms)
+
+    return {
+        "wall_time": wall_time,
+        "cpu_time": cpu_time,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        **metrics,
+    }
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        logging.error(f"Could not validate the parsed args: {args}")
+        exit(1)
+    else:
+        logging.info(args)
+        config = yaml_read(args["model_config"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            audio_dir = args["audio_dir"] or Path(tmp_dir)
+            audio_dir.mkdir(exist_ok=True, parents=True)
+            records = []
+            for sample_rate in args["sample_rates"]:
+                for duration_hours in args["durations"]:
+                    audio_filepath = (
+                        audio_dir / f"synthetic_{sample_rate}hz_{duration_hours}h.wav"
+                    )
+                    logging.info(f"Generating {audio_filepath}")
+                    df_rumbles = write_synthetic_recording(
+                        audio_filepath,
+                        total_duration=duration_hours * 3600,
+                        sample_rate=sample_rate,
+                        random_seed=args["random_seed"],
+                    )
+                    for benchmark in args["benchmarks"]:
+                        logging.info(f"Running {benchmark} on {audio_filepath.name}")
+                        # A fresh process per benchmark isolates its peak RSS
+                        with ProcessPoolExecutor(
+                            max_workers=1,
+                            mp_context=multiprocessing.get_context("spawn"),
+                        ) as executor:
+                            result = executor.submit(
+                                run_benchmark,
+                                benchmark,
+                                audio_filepath,
+                                df_rumbles,
+                                config,
+                                args,
+                            ).result()
+                        record = {
+                            "benchmark": benchmark,
+                            "sample_rate": sample_rate,
+                            "duration_hours": duration_hours,
+                            **result,
+                            "audio_hours_per_cpu_hour": duration_hours
+                            / (result["cpu_time"] / 3600),
+                        }
+                        print(
+                            f"{benchmark} {sample_rate}Hz {duration_hours}h: {record['audio_hours_per_cpu_hour']:.1f} audio hours per CPU hour, peak RSS {record['peak_rss_mb']:.0f}MB"
+                        )
+                        records.append(record)
+
+        df_report = pd.DataFrame(records)
+        output_dir = args["output_dir"]
+        output_dir.mkdir(exist_ok=True, parents=True)
+        df_report.to_csv(output_dir / "report.csv", index=False)
+        write_json(
+            to=output_dir / "report.json",
+            data={
+                "args": {k: str(v) for k, v in args.items()},
+                "torch_num_threads": args["num_threads"] or torch.get_num_threads(),
+                "benchmarks": df_report.to_dict("records"),
+            },
+        )
+        exit(0)
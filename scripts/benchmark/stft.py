@@ -0,0 +1,207 @@
+"""Script to benchmark the STFT backends of the spectrograms on random
+waveforms of several sample rates and FFT sizes, reporting which one is the
+fastest, eg. when the band-limited DFT beats the full torch.stft, and how close
+their spectrograms and images are to the torch backend."""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
+    STFT_BACKENDS,
+    fastest_stft_backend,
+    spectrogram_engine,
+    stft_parity,
+)
+from forest_elephants_rumble_detection.utils import write_json
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sample-rates",
+        help="sample rates (Hz) of the waveforms",
+        nargs="+",
+        default=[4000, 8000, 16000, 44100],
+        type=int,
+    )
+    parser.add_argument(
+        "--n-ffts",
+        help="FFT sizes, the hop length is a quarter of it",
+        nargs="+",
+        default=[2048, 4096],
+        type=int,
+    )
+    parser.add_argument(
+        "--duration",
+        help="duration in seconds of the waveforms",
+        default=164.0,
+        type=float,
+    )
+    parser.add_argument(
+        "--freq-max",
+        help="cutoff frequency (Hz) of the spectrograms",
+        default=250.0,
+        type=float,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="number of waveforms processed per call",
+        default=8,
+        type=int,
+    )
+    parser.add_argument(
+        "--number-repeats",
+        help="number of timed calls per configuration, after a warmup call",
+        default=5,
+        type=int,
+    )
+    parser.add_argument(
+        "--num-threads",
+        help="number of torch threads, the torch default when not set",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="path to save the benchmark report",
+        default=Path("./data/06_reporting/benchmark/stft/"),
+        type=Path,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if any(n_fft % 4 != 0 for n_fft in args["n_ffts"]):
+        logging.error("Invalid --n-ffts, should be multiples of 4")
+        return False
+    elif args["batch_size"] < 1 or args["number_repeats"] < 1:
+        logging.error("Invalid --batch-size or --number-repeats, should be positive")
+        return False
+    else:
+        return True
+
+
+def time_per_window(fn, waveforms: torch.Tensor, number_repeats: int) -> float:
+    """Returns the mean wall time in ms per waveform of fn after a warmup call."""
+    fn(waveforms)
+    start_time = time.perf_counter()
+    for _ in range(number_repeats):
+        fn(waveforms)
+    return (time.perf_counter() - start_time) / number_repeats / len(waveforms) * 1000
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        logging.error(f"Could not validate the parsed args: {args}")
+        exit(1)
+    else:
+        logging.info(args)
+        if args["num_threads"] is not None:
+            torch.set_num_threads(args["num_threads"])
+        generator = torch.Generator().manual_seed(0)
+        records = []
+        for sample_rate in args["sample_rates"]:
+            waveforms = 0.1 * torch.randn(
+                args["batch_size"],
+                int(args["duration"] * sample_rate),
+                generator=generator,
+            )
+            for n_fft in args["n_ffts"]:
+                for decimate_waveform in [False, True]:
+                    engines = {
+                        stft_backend: spectrogram_engine(
+                            sample_rate=sample_rate,
+                            n_fft=n_fft,
+                            hop_length=n_fft // 4,
+                            freq_max=args["freq_max"],
+                            width=640,
+                            height=256,
+                            decimate_waveform=decimate_waveform,
+                            stft_backend=stft_backend,
+                        )
+                        for stft_backend in STFT_BACKENDS
+                    }
+                    reference = engines["torch"]
+                    # The STFT alone is timed on waveforms of the decimated length
+                    stft_waveforms = waveforms[:, :: reference.factor].contiguous()
+                    reference_power = reference.power_spectrogram(stft_waveforms)
+                    reference_image = reference.np_image(waveforms[:1])
+                    record = {
+                        "sample_rate": sample_rate,
+                        "n_fft": n_fft,
+                        "decimate_waveform": decimate_waveform,
+                        "stft_n_fft": reference.stft_n_fft,
+                        "number_bins": reference.max_freq_bin,
+                    }
+                    for stft_backend, engine in engines.items():
+                        record[f"{stft_backend}_stft_ms"] = time_per_window(
+                            engine.power_spectrogram,
+                            stft_waveforms,
+                            number_repeats=args["number_repeats"],
+                        )
+                        record[f"{stft_backend}_spectrogram_ms"] = time_per_window(
+                            engine.spectrogram,
+                            waveforms,
+                            number_repeats=args["number_repeats"],
+                        )
+                        record[f"{stft_backend}_max_abs_db_diff"] = stft_parity(
+                            reference_power, engine.power_spectrogram(stft_waveforms)
+                        )
+                        record[f"{stft_backend}_max_abs_pixel_diff"] = int(
+                            np.abs(
+                                engine.np_image(waveforms[:1]).astype(np.int16)
+                                - reference_image.astype(np.int16)
+                            ).max()
+                        )
+                    record["fastest"] = min(
+                        STFT_BACKENDS, key=lambda k: record[f"{k}_stft_ms"]
+                    )
+                    # Pick of the startup micro-benchmark used by stft_backend=auto
+                    record["auto"] = fastest_stft_backend(
+                        sample_rate=sample_rate,
+                        n_fft=n_fft,
+                        hop_length=n_fft // 4,
+                        freq_max=args["freq_max"],
+                        decimate_waveform=decimate_waveform,
+                    )
+                    print(
+                        f"{sample_rate}Hz n_fft={n_fft} decimate={decimate_waveform}, {record['number_bins']} bins: "
+                        + ", ".join(
+                            f"{k} {record[f'{k}_stft_ms']:.2f}ms"
+                            for k in STFT_BACKENDS
+                        )
+                        + f" per window, fastest {record['fastest']}, auto {record['auto']}"
+                    )
+                    records.append(record)
+
+        df_report = pd.DataFrame(records)
+        print(df_report.to_string(index=False))
+        output_dir = args["output_dir"]
+        output_dir.mkdir(exist_ok=True, parents=True)
+        df_report.to_csv(output_dir / "report.csv", index=False)
+        write_json(
+            to=output_dir / "report.json",
+            data={
+                "args": {k: str(v) for k, v in args.items()},
+                "torch_num_threads": args["num_threads"] or torch.get_num_threads(),
+                "benchmarks": df_report.to_dict("records"),
+            },
+        )
+        exit(0)
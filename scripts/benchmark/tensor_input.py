@@ -0,0 +1,112 @@
+"""Script to measure the throughput of feeding spectrograms to a YOLOv8
+model as PIL images versus native geometry tensors."""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+import torch
+from PIL import Image
+from ultralytics import YOLO
+
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
+    images_to_np_images,
+)
+from forest_elephants_rumble_detection.model.yolo.predict import predict_tensor
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--model-weights-filepath",
+        help="path to the model weights",
+        default="./data/08_artifacts/model/rumbles/yolov8/weights/best.pt",
+        type=Path,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="number of spectrograms per batch",
+        default=64,
+        type=int,
+    )
+    parser.add_argument(
+        "--num-batches",
+        help="number of timed batches",
+        default=5,
+        type=int,
+    )
+    parser.add_argument(
+        "--width",
+        help="width of the spectrograms",
+        default=640,
+        type=int,
+    )
+    parser.add_argument(
+        "--height",
+        help="height of the spectrograms",
+        default=256,
+        type=int,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if not args["model_weights_filepath"].exists():
+        logging.error("Invalid --model-weights-filepath filepath does not exist")
+        return False
+    else:
+        return True
+
+
+def throughput(fn, num_batches: int, batch_size: int) -> float:
+    """Returns the number of images per second processed by `fn` after a
+    warmup call."""
+    fn()
+    start_time = time.perf_counter()
+    for _ in range(num_batches):
+        fn()
+    elapsed_time = time.perf_counter() - start_time
+    return num_batches * batch_size / elapsed_time
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        exit(1)
+    else:
+        batch_size = args["batch_size"]
+        images = torch.rand(batch_size, 1, args["height"], args["width"]).expand(
+            -1, 3, -1, -1
+        )
+        pil_images = [Image.fromarray(arr) for arr in images_to_np_images(images)]
+
+        model_pil = YOLO(args["model_weights_filepath"])
+        model_tensor = YOLO(args["model_weights_filepath"])
+
+        results = {
+            "pil": throughput(
+                lambda: model_pil.predict(pil_images, verbose=False),
+                num_batches=args["num_batches"],
+                batch_size=batch_size,
+            ),
+            "tensor": throughput(
+                lambda: predict_tensor(model_tensor, images),
+                num_batches=args["num_batches"],
+                batch_size=batch_size,
+            ),
+        }
+        for name, images_per_second in results.items():
+            print(f"{name}: {images_per_second:.1f} images/s")
+        print(f"tensor speedup: {results['tensor'] / results['pil']:.2f}x")
+        exit(0)
@@ -21,12 +21,17 @@ from forest_elephants_rumble_detection.data.spectrogram.librosa import (
     df_rumbles_to_all_spectrogram_yolov8_bboxes,
     make_spectrogram,
     make_spectrogram2,
+    make_spectrogram_image,
+    save_spectrogram_image,
     select_rumbles_at,
 )
 from forest_elephants_rumble_detection.data.yolov8 import bboxes_to_yolov8_txt_format
 from forest_elephants_rumble_detection.utils import yaml_write
 
 
+RENDERERS = ["matplotlib", "array"]
+
+
 def make_cli_parser() -> argparse.ArgumentParser:
     """Makes the CLI parser."""
     parser = argparse.ArgumentParser()
@@ -72,6 +77,13 @@ def make_cli_parser() -> argparse.ArgumentParser:
         type=float,
         default=0.2,
     )
+    parser.add_argument(
+        "--renderer",
+        help="renderer of the spectrogram images: matplotlib draws a librosa specshow figure per spectrogram, array renders the same pixels directly and faster.",
+        type=str,
+        default="matplotlib",
+        choices=RENDERERS,
+    )
     parser.add_argument(
         "-log",
         "--loglevel",
@@ -112,10 +124,14 @@ def generate_and_save_annotated_spectogram2(
     hop_length: int,
     width: int,
     height: int,
+    renderer: str = "matplotlib",
 ) -> None:
-    """Saves a spectrogram alongside its annotation bboxes of the rumbles."""
-    # Non interactive mode for matplotlib
-    matplotlib.use("Agg")
+    """Saves a spectrogram alongside its annotation bboxes of the rumbles.
+
+    The array renderer writes the same pixels as the saved matplotlib figure,
+    see `render_spectrogram`, without creating a figure per spectrogram.
+    """
+    assert renderer in RENDERERS, f"renderer should be in {RENDERERS}"
 
     df_rumbles = select_rumbles_at(df=df, offset=offset, duration=duration)
 
@@ -124,19 +140,6 @@ def generate_and_save_annotated_spectogram2(
         len(audio_filepaths) <= 1
     ), "Assumption that only one Begin File per df_rumbles"
     audio, sr = load_audio(audio_filepath, duration=duration, offset=offset)
-    fig = make_spectrogram2(
-        audio=audio,
-        sr=sr,
-        n_fft=n_fft,
-        top_db=top_db,
-        fmin=freq_min,
-        fmax=freq_max,
-        dpi=dpi,
-        hop_length=hop_length,
-        width=width,
-        height=height,
-    )
-    ax = fig.get_axes()[0]
 
     if len(df_rumbles) > 0:
         bboxes = df_rumbles_to_all_spectrogram_yolov8_bboxes(
@@ -152,6 +155,38 @@ def generate_and_save_annotated_spectogram2(
             with open(output_dir / f"{filename}.txt", "w") as f:
                 f.write(labels)
 
+    if renderer == "array":
+        image = make_spectrogram_image(
+            audio=audio,
+            sr=sr,
+            n_fft=n_fft,
+            top_db=top_db,
+            fmin=freq_min,
+            fmax=freq_max,
+            dpi=dpi,
+            hop_length=hop_length,
+            width=width,
+            height=height,
+        )
+        save_spectrogram_image(image, output_dir / f"{filename}.png")
+        return None
+
+    # Non interactive mode for matplotlib
+    matplotlib.use("Agg")
+    fig = make_spectrogram2(
+        audio=audio,
+        sr=sr,
+        n_fft=n_fft,
+        top_db=top_db,
+        fmin=freq_min,
+        fmax=freq_max,
+        dpi=dpi,
+        hop_length=hop_length,
+        width=width,
+        height=height,
+    )
+    ax = fig.get_axes()[0]
+
     plt.savefig(
         output_dir / f"{filename}.png",
         bbox_inches="tight",
@@ -242,6 +277,7 @@ def task_generate_spectrograms_for2(params: dict):
     hop_length = params["hop_length"]
     spectrogram_width = params["spectrogram_width"]
     spectrogram_height = params["spectrogram_height"]
+    renderer = params.get("renderer", "matplotlib")
 
     process_id = os.getpid()
     logging.info(
@@ -262,6 +298,7 @@ def task_generate_spectrograms_for2(params: dict):
         hop_length=hop_length,
         width=spectrogram_width,
         height=spectrogram_height,
+        renderer=renderer,
     )
     return None
 
@@ -286,6 +323,7 @@ def task_generate_spectrograms_for(params: dict):
     hop_length = params["hop_length"]
     spectrogram_width = params["spectrogram_width"]
     spectrogram_height = params["spectrogram_height"]
+    renderer = params.get("renderer", "matplotlib")
 
     process_id = os.getpid()
     logging.info(f"[{process_id}] Processing audio_filepath {audio_filepath}")
@@ -329,6 +367,7 @@ def task_generate_spectrograms_for(params: dict):
             hop_length=hop_length,
             width=spectrogram_width,
             height=spectrogram_height,
+            renderer=renderer,
         )
     return audio_filepath
 
@@ -348,6 +387,7 @@ def build_testing_dataset_parallel(
     spectrogram_height: int,
     random_seed: int = 0,
     ratio_random_offsets: float = 0.20,
+    renderer: str = "matplotlib",
 ) -> None:
     """Main entry point to generate the spectrogram from the testing data
     files."""
@@ -381,6 +421,7 @@ def build_testing_dataset_parallel(
         "hop_length": hop_length,
         "spectrogram_width": spectrogram_width,
         "spectrogram_height": spectrogram_height,
+        "renderer": renderer,
     }
 
     # Contains all the task arguments for running processes in parallel
@@ -464,6 +505,7 @@ def build_testing_dataset(
     spectrogram_height: int,
     random_seed: int = 0,
     ratio_random_offsets: float = 0.20,
+    renderer: str = "matplotlib",
 ) -> None:
     """Main entry point to generate the spectrogram from the testing data
     files."""
@@ -524,6 +566,7 @@ def build_testing_dataset(
                 hop_length=hop_length,
                 width=spectrogram_width,
                 height=spectrogram_height,
+                renderer=renderer,
             )
 
 
@@ -541,6 +584,7 @@ def build_training_dataset(
     spectrogram_height: int,
     random_seed: int = 0,
     ratio_random_offsets: float = 0.20,
+    renderer: str = "matplotlib",
 ) -> None:
     """Main entry point to generate the spectrogram from the training data
     file."""
@@ -596,6 +640,7 @@ def build_training_dataset(
                 hop_length=hop_length,
                 width=spectrogram_width,
                 height=spectrogram_height,
+                renderer=renderer,
             )
 
 
@@ -613,6 +658,7 @@ def build_training_dataset_parallel(
     spectrogram_height: int,
     random_seed: int = 0,
     ratio_random_offsets: float = 0.20,
+    renderer: str = "matplotlib",
 ) -> None:
     """Main entry point to generate the spectrogram from the training data
     file."""
@@ -642,6 +688,7 @@ def build_training_dataset_parallel(
                 "hop_length": hop_length,
                 "spectrogram_width": spectrogram_width,
                 "spectrogram_height": spectrogram_height,
+                "renderer": renderer,
             }
             for fp in audio_filepaths
         ]
@@ -694,6 +741,7 @@ if __name__ == "__main__":
             "height": spectrogram_height,
             "random_seed": random_seed,
             "ratio_random_offsets": ratio_random_offsets,
+            "renderer": args["renderer"],
         }
 
         yaml_write(
@@ -716,6 +764,7 @@ if __name__ == "__main__":
             spectrogram_height=spectrogram_height,
             random_seed=random_seed,
             ratio_random_offsets=ratio_random_offsets,
+            renderer=args["renderer"],
         )
 
         # logging.info("Building the training dataset")
@@ -7,7 +7,6 @@ from pathlib import Path
 
 import pandas as pd
 import torch
-import torchaudio
 from PIL import Image
 from tqdm import tqdm
 
@@ -20,7 +19,8 @@ from forest_elephants_rumble_detection.data.rumbles import (
 from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
     chunk,
     clip,
-    waveform_to_np_image,
+    load_waveform,
+    spectrogram_engine,
 )
 from forest_elephants_rumble_detection.data.yolov8 import bboxes_to_yolov8_txt_format
 from forest_elephants_rumble_detection.utils import yaml_write
@@ -111,8 +111,8 @@ def generate_and_save_annotated_spectogram(
     width: int,
     height: int,
 ) -> None:
-    arr = waveform_to_np_image(
-        waveform=waveform,
+    # The engine of the parameters is created once and shared by all the spectrograms
+    engine = spectrogram_engine(
         sample_rate=sample_rate,
         n_fft=n_fft,
         hop_length=hop_length,
@@ -120,6 +120,7 @@ def generate_and_save_annotated_spectogram(
         width=width,
         height=height,
     )
+    arr = engine.np_image(waveform)
     img = Image.fromarray(arr)
     img.save(output_dir / f"{filename}.png")
     df_rumbles = select_rumbles_at(df=df, offset=offset, duration=duration)
@@ -192,8 +193,9 @@ def build_testing_dataset(
         logging.info(df_metadata.head())
         df_metadata.to_csv(output_audio_filepath_dir / "metadata.csv")
         logging.info(f"number of offsets: {len(offsets)}")
-        logging.info(f"Loading waveform {audio_filepath} signal into memory")
-        waveform_full, sample_rate = torchaudio.load(audio_filepath)
+        logging.info(f"Loading waveform {audio_filepath}")
+        # Memory-mapped for WAV files, the clips are read at the offsets only
+        waveform_full, sample_rate = load_waveform(audio_filepath)
 
         for idx, offset in enumerate(tqdm(offsets)):
             filename = spectrogram_stem(audio_filepath, idx)
@@ -0,0 +1,197 @@
+"""Script to check that the spectrogram generation methods produce images
+equivalent to the ones of the baseline torchaudio implementation."""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+import torchaudio
+from tqdm import tqdm
+
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
+    baseline_spectrogram,
+    chunk,
+    spectrogram_tensor_to_np_image,
+    waveform_to_spectrogram,
+)
+
+# Keyword arguments passed to waveform_to_spectrogram for each candidate method
+CANDIDATES = {
+    "torch": {},
+    "decimate": {"decimate_waveform": True},
+    "scipy": {"stft_backend": "scipy"},
+    "numpy": {"stft_backend": "numpy"},
+    "dft": {"stft_backend": "dft"},
+    "decimate_dft": {"decimate_waveform": True, "stft_backend": "dft"},
+}
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input-dir-audio-filepaths",
+        help="directory containing the audio files to compare the spectrograms on",
+        default=Path("./data/03_model_input/sounds/rumbles/"),
+        type=Path,
+    )
+    parser.add_argument(
+        "--candidate",
+        help="spectrogram method to compare against the baseline implementation",
+        default="decimate",
+        choices=list(CANDIDATES.keys()),
+        type=str,
+    )
+    parser.add_argument(
+        "--duration",
+        help="duration in seconds of the generated spectrograms.",
+        type=float,
+        default=164.0,
+    )
+    parser.add_argument(
+        "--max-clips-per-file",
+        help="maximum number of clips compared per audio file",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "--max-mean-abs-pixel-diff",
+        help="maximum mean absolute difference between the pixels of the baseline and candidate images",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "--max-abs-pixel-diff",
+        help="maximum absolute difference between the pixels of the baseline and candidate images",
+        type=float,
+        default=4.0,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if not args["input_dir_audio_filepaths"].exists():
+        logging.error("Invalid --input-dir-audio-filepaths dir does not exist")
+        return False
+    else:
+        return True
+
+
+def compare(
+    reference: torch.Tensor,
+    candidate: torch.Tensor,
+    reference_image: np.ndarray,
+    candidate_image: np.ndarray,
+) -> dict:
+    """
+    Returns parity metrics between the dB spectrograms and the uint8 images of the
+    baseline and of the candidate.
+
+    The per-image min/max normalization maps the dB range of each spectrogram to
+    [0, 255], hence the differences of their minimum and maximum.
+    """
+    pixel_diff = np.abs(
+        reference_image.astype(np.float64) - candidate_image.astype(np.float64)
+    )
+    return {
+        "min_db_diff": (candidate.min() - reference.min()).item(),
+        "max_db_diff": (candidate.max() - reference.max()).item(),
+        "mean_abs_pixel_diff": pixel_diff.mean(),
+        "max_abs_pixel_diff": pixel_diff.max(),
+    }
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        exit(1)
+    else:
+        # Default parameters used to generate the spectrograms
+        n_fft = 4096
+        hop_length = 1024
+        freq_max = 250.0
+        width = 640
+        height = 256
+        candidate_kwargs = CANDIDATES[args["candidate"]]
+
+        audio_filepaths = [
+            fp for fp in args["input_dir_audio_filepaths"].iterdir() if fp.is_file()
+        ]
+        records = []
+        for audio_filepath in tqdm(audio_filepaths):
+            waveform_full, sample_rate = torchaudio.load(audio_filepath)
+            waveforms = chunk(
+                waveform_full,
+                sample_rate=sample_rate,
+                duration=args["duration"],
+                overlap=0.0,
+            )[: args["max_clips_per_file"]]
+            for idx, waveform in enumerate(waveforms):
+                kwargs = {
+                    "waveform": waveform,
+                    "sample_rate": sample_rate,
+                    "n_fft": n_fft,
+                    "hop_length": hop_length,
+                    "freq_max": freq_max,
+                }
+                start_time = time.perf_counter()
+                reference = baseline_spectrogram(**kwargs)
+                reference_image = spectrogram_tensor_to_np_image(
+                    reference, width=width, height=height
+                )
+                reference_time = time.perf_counter() - start_time
+                start_time = time.perf_counter()
+                candidate = waveform_to_spectrogram(**kwargs, **candidate_kwargs)
+                candidate_image = spectrogram_tensor_to_np_image(
+                    candidate, width=width, height=height
+                )
+                candidate_time = time.perf_counter() - start_time
+                records.append(
+                    {
+                        "audio_filepath": str(audio_filepath),
+                        "index": idx,
+                        "sample_rate": sample_rate,
+                        "reference_time": reference_time,
+                        "candidate_time": candidate_time,
+                        **compare(
+                            reference, candidate, reference_image, candidate_image
+                        ),
+                    }
+                )
+
+        df = pd.DataFrame(records)
+        if df.empty:
+            logging.error("No clip to compare")
+            exit(1)
+        print(df.describe())
+        speedup = df["reference_time"].sum() / df["candidate_time"].sum()
+        print(f"Candidate {args['candidate']} speedup: {speedup:.1f}x")
+        mean_abs_pixel_diff = df["mean_abs_pixel_diff"].max()
+        max_abs_pixel_diff = df["max_abs_pixel_diff"].max()
+        if mean_abs_pixel_diff > args["max_mean_abs_pixel_diff"]:
+            logging.error(
+                f"Parity check failed: mean absolute pixel difference {mean_abs_pixel_diff:.3f} > {args['max_mean_abs_pixel_diff']}"
+            )
+            exit(1)
+        if max_abs_pixel_diff > args["max_abs_pixel_diff"]:
+            logging.error(
+                f"Parity check failed: max absolute pixel difference {max_abs_pixel_diff:.0f} > {args['max_abs_pixel_diff']}"
+            )
+            exit(1)
+        print(
+            f"Parity check passed: mean and max absolute pixel differences {mean_abs_pixel_diff:.3f} and {max_abs_pixel_diff:.0f}"
+        )
+        exit(0)
@@ -0,0 +1,190 @@
+"""Script to check that the spectrograms computed by a StreamingSpectrogram on
+audio files read in blocks match the spectrograms of the whole files computed at
+once, within float32 rounding."""
+
+import argparse
+import logging
+import random
+import time
+from pathlib import Path
+
+import pandas as pd
+import torch
+from tqdm import tqdm
+
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
+    STFT_BACKENDS,
+    STREAMING_TOLERANCE_DB,
+    STREAMING_TOP_DB,
+    StreamingSpectrogram,
+    load_waveform,
+    spectrogram_engine,
+    spectrogram_parity,
+)
+from forest_elephants_rumble_detection.data.wav import WavReader
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input-dir-audio-filepaths",
+        help="directory containing the audio files to stream",
+        default=Path("./data/03_model_input/sounds/rumbles/"),
+        type=Path,
+    )
+    parser.add_argument(
+        "--block-duration",
+        help="duration in seconds of the blocks pushed to the stream",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--random-block-sizes",
+        help="push blocks of random sizes, up to twice --block-duration",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--decimate-waveform",
+        help="decimate the waveforms before the STFT",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--stft-backend",
+        help="STFT backend of the spectrograms",
+        default="torch",
+        choices=list(STFT_BACKENDS.keys()),
+        type=str,
+    )
+    parser.add_argument(
+        "--max-db-diff",
+        help=f"maximum absolute difference (dB) between the streamed and one-shot spectrograms, on the bins within {STREAMING_TOP_DB} dB of their maximum",
+        type=float,
+        default=STREAMING_TOLERANCE_DB,
+    )
+    parser.add_argument(
+        "--random-seed",
+        help="Random seed of the random block sizes.",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if not args["input_dir_audio_filepaths"].exists():
+        logging.error("Invalid --input-dir-audio-filepaths dir does not exist")
+        return False
+    elif args["block_duration"] <= 0:
+        logging.error("Invalid --block-duration, should be positive")
+        return False
+    else:
+        return True
+
+
+def read_samples(
+    waveform: torch.Tensor | WavReader, start: int, num_frames: int
+) -> torch.Tensor:
+    """Returns the (channel, time) samples of the waveform from start."""
+    if isinstance(waveform, WavReader):
+        return torch.from_numpy(
+            waveform.read_float(frame_offset=start, num_frames=num_frames)
+        )
+    return waveform[:, start : start + num_frames]
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        exit(1)
+    else:
+        # Default parameters used to generate the spectrograms
+        n_fft = 4096
+        hop_length = 1024
+        freq_max = 250.0
+        rng = random.Random(args["random_seed"])
+
+        audio_filepaths = [
+            fp for fp in args["input_dir_audio_filepaths"].iterdir() if fp.is_file()
+        ]
+        records = []
+        for audio_filepath in tqdm(audio_filepaths):
+            waveform, sample_rate = load_waveform(audio_filepath)
+            num_frames = waveform.shape[-1]
+            engine = spectrogram_engine(
+                sample_rate=sample_rate,
+                n_fft=n_fft,
+                hop_length=hop_length,
+                freq_max=freq_max,
+                decimate_waveform=args["decimate_waveform"],
+                stft_backend=args["stft_backend"],
+            )
+            block_num_frames = int(args["block_duration"] * sample_rate)
+
+            start_time = time.perf_counter()
+            reference = engine.spectrogram(read_samples(waveform, 0, num_frames))
+            reference_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            stream = StreamingSpectrogram(engine)
+            spectrograms = []
+            start = 0
+            while start < num_frames:
+                size = block_num_frames
+                if args["random_block_sizes"]:
+                    size = rng.randint(1, 2 * block_num_frames)
+                spectrograms.append(stream.push(read_samples(waveform, start, size)))
+                start += size
+            spectrograms.append(stream.flush())
+            streamed = torch.cat(spectrograms, dim=-1)
+            streaming_time = time.perf_counter() - start_time
+
+            same_shape = streamed.shape == reference.shape
+            records.append(
+                {
+                    "audio_filepath": str(audio_filepath),
+                    "sample_rate": sample_rate,
+                    "number_blocks": len(spectrograms) - 1,
+                    "number_frames": reference.shape[-1],
+                    "reference_time": reference_time,
+                    "streaming_time": streaming_time,
+                    "same_shape": same_shape,
+                    "max_abs_db_diff": (
+                        spectrogram_parity(
+                            reference, streamed, top_db=STREAMING_TOP_DB
+                        )
+                        if same_shape
+                        else float("nan")
+                    ),
+                }
+            )
+
+        df = pd.DataFrame(records)
+        if df.empty:
+            logging.error("No audio file to stream")
+            exit(1)
+        print(df.to_string(index=False))
+        if not df["same_shape"].all():
+            logging.error(
+                f"Parity check failed: {(~df['same_shape']).sum()} streamed spectrograms have another number of frames"
+            )
+            exit(1)
+        max_abs_db_diff = df["max_abs_db_diff"].max()
+        if max_abs_db_diff > args["max_db_diff"]:
+            logging.error(
+                f"Parity check failed: max absolute difference {max_abs_db_diff:.4f}dB > {args['max_db_diff']}"
+            )
+            exit(1)
+        print(
+            f"Parity check passed: max absolute difference {max_abs_db_diff:.4f}dB"
+        )
+        exit(0)
@@ -0,0 +1,148 @@
+"""Script to calibrate the batch size, torch threads and number of worker
+processes of the inference pipeline on the current machine, and to save them
+as the machine profile used by default by predict_raven.py and the GUI."""
+
+import argparse
+import logging
+from pathlib import Path
+
+import pandas as pd
+import psutil
+
+from forest_elephants_rumble_detection.model.yolo.autotune import (
+    MACHINE_PROFILE_FILEPATH,
+    run_trials,
+    save_machine_profile,
+)
+from forest_elephants_rumble_detection.model.yolo.backend import BACKENDS
+from forest_elephants_rumble_detection.model.yolo.predict import SPECTROGRAM_METHODS
+from forest_elephants_rumble_detection.utils import yaml_read
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--model-weights-filepath",
+        help="path to the model weights",
+        default="./data/08_artifacts/model/rumbles/yolov8/weights/best.pt",
+        type=Path,
+    )
+    parser.add_argument(
+        "--model-config",
+        help="path to the model config",
+        default="./data/08_artifacts/model/rumbles/yolov8/config.yaml",
+        type=Path,
+    )
+    parser.add_argument(
+        "--backend",
+        help="inference backend to calibrate",
+        default="pytorch",
+        choices=list(BACKENDS.keys()),
+        type=str,
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        help="batch sizes to try",
+        nargs="+",
+        default=[8, 16, 32, 64, 128],
+        type=int,
+    )
+    parser.add_argument(
+        "--num-workers",
+        help="numbers of worker processes to try, powers of 2 up to the number of CPUs by default",
+        nargs="+",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "--number-batches",
+        help="number of batches timed per trial, after a warmup batch",
+        default=2,
+        type=int,
+    )
+    parser.add_argument(
+        "--sample-rate",
+        help="sample rate (Hz) of the synthetic windows, the one of the recordings to analyze",
+        default=8000,
+        type=int,
+    )
+    parser.add_argument(
+        "--spectrogram-method",
+        help="Method used to generate the spectrograms.",
+        default="clip",
+        choices=SPECTROGRAM_METHODS,
+        type=str,
+    )
+    parser.add_argument(
+        "--memory-budget-mb",
+        help="maximum memory (MB) of all the workers, 75%% of the available memory by default",
+        default=None,
+        type=float,
+    )
+    parser.add_argument(
+        "--output-filepath",
+        help="path to save the machine profile",
+        default=MACHINE_PROFILE_FILEPATH,
+        type=Path,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if not args["model_weights_filepath"].exists():
+        logging.error("Invalid --model-weights-filepath filepath does not exist")
+        return False
+    elif not args["model_config"].exists():
+        logging.error("Invalid --model-config filepath does not exist")
+        return False
+    elif min(args["batch_sizes"]) < 1 or min(args["num_workers"] or [1]) < 1:
+        logging.error("Invalid --batch-sizes or --num-workers, should be positive")
+        return False
+    else:
+        return True
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        logging.error(f"Could not validate the parsed args: {args}")
+        exit(1)
+    else:
+        logging.info(args)
+        config = yaml_read(args["model_config"])
+        memory_budget_mb = args["memory_budget_mb"] or (
+            0.75 * psutil.virtual_memory().available / 2**20
+        )
+        logging.info(f"Memory budget of {memory_budget_mb:.0f}MB")
+        trials = run_trials(
+            model_weights_filepath=args["model_weights_filepath"],
+            config=config,
+            backend=args["backend"],
+            batch_sizes=args["batch_sizes"],
+            num_workers=args["num_workers"],
+            number_batches=args["number_batches"],
+            sample_rate=args["sample_rate"],
+            spectrogram_method=args["spectrogram_method"],
+        )
+        print(pd.DataFrame(trials).to_string(index=False))
+        profile = save_machine_profile(
+            trials,
+            memory_budget_mb=memory_budget_mb,
+            backend=args["backend"],
+            filepath=args["output_filepath"],
+        )
+        print(
+            f"Selected batch_size={profile['batch_size']} num_workers={profile['num_workers']} threads_per_worker={profile['threads_per_worker']}: {profile['windows_per_second']:.2f} windows/s, {profile['peak_rss_mb']:.0f}MB"
+        )
+        logging.info(f"Saved the machine profile in {args['output_filepath']}")
+        exit(0)
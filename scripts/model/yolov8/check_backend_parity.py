@@ -0,0 +1,172 @@
+"""Script to check that an exported inference backend (ONNX, OpenVINO)
+produces the same rumble detections as the PyTorch model."""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from forest_elephants_rumble_detection.model.yolo.backend import BACKENDS, load_model
+from forest_elephants_rumble_detection.model.yolo.predict import pipeline
+from forest_elephants_rumble_detection.utils import yaml_read
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input-dir-audio-filepaths",
+        help="directory containing the audio filepaths to analyze",
+        default=Path("./data/08_artifacts/audio/rumbles/"),
+        type=Path,
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="directory to save the results of both backends",
+        default=Path("./data/06_reporting/yolov8/backend_parity/"),
+        type=Path,
+    )
+    parser.add_argument(
+        "--model-weights-filepath",
+        help="path to the model weights",
+        default="./data/08_artifacts/model/rumbles/yolov8/weights/best.pt",
+        type=Path,
+    )
+    parser.add_argument(
+        "--model-config",
+        help="path to the model config",
+        default="./data/08_artifacts/model/rumbles/yolov8/config.yaml",
+        type=Path,
+    )
+    parser.add_argument(
+        "--backend",
+        help="backend to compare against the pytorch model",
+        default="onnx",
+        choices=[backend for backend in BACKENDS.keys() if backend != "pytorch"],
+        type=str,
+    )
+    parser.add_argument(
+        "--overlap",
+        help="Overlap in seconds between two subsequent spectrograms.",
+        default=10.0,
+        type=float,
+    )
+    parser.add_argument(
+        "--atol-seconds",
+        help="tolerance in seconds on t_start and t_end of the matched detections",
+        default=0.5,
+        type=float,
+    )
+    parser.add_argument(
+        "--atol-probability",
+        help="tolerance on the probability of the matched detections",
+        default=0.05,
+        type=float,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if not args["input_dir_audio_filepaths"].exists():
+        logging.error("Invalid --input-dir-audio-filepaths dir does not exist")
+        return False
+    elif not args["model_weights_filepath"].exists():
+        logging.error("Invalid --model-weights-filepath filepath does not exist")
+        return False
+    elif not args["model_config"].exists():
+        logging.error("Invalid --model-config filepath does not exist")
+        return False
+    else:
+        return True
+
+
+def sort_detections(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns the detections sorted by file and time so that two runs can
+    be compared row by row."""
+    if df.empty:
+        return df
+    return df.sort_values(["audio_filepath", "t_start", "freq_start"]).reset_index(
+        drop=True
+    )
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        logging.error(f"Could not validate the parsed args: {args}")
+        exit(1)
+    else:
+        config = yaml_read(args["model_config"])
+        input_dir = args["input_dir_audio_filepaths"]
+        audio_filepaths = sorted(fp for fp in input_dir.iterdir() if fp.is_file())
+
+        dfs = {}
+        for backend in ["pytorch", args["backend"]]:
+            model = load_model(
+                args["model_weights_filepath"],
+                backend=backend,
+                imgsz=(config["height"], config["width"]),
+            )
+            output_dir = args["output_dir"] / backend
+            output_dir.mkdir(parents=True, exist_ok=True)
+            start_time = time.perf_counter()
+            df = pipeline(
+                model=model,
+                audio_filepaths=audio_filepaths,
+                duration=config["duration"],
+                overlap=args["overlap"],
+                width=config["width"],
+                height=config["height"],
+                freq_min=config["freq_min"],
+                freq_max=config["freq_max"],
+                n_fft=config["n_fft"],
+                hop_length=config["hop_length"],
+                batch_size=64,
+                output_dir=output_dir,
+                save_spectrograms=False,
+                save_predictions=False,
+                verbose=False,
+            )
+            elapsed_time = time.perf_counter() - start_time
+            print(f"{backend}: {len(df)} detections in {elapsed_time:.2f}s")
+            df.to_csv(output_dir / "results.csv")
+            dfs[backend] = sort_detections(df)
+
+        df_reference, df_candidate = dfs["pytorch"], dfs[args["backend"]]
+        if len(df_reference) != len(df_candidate):
+            logging.error(
+                f"Parity check failed: {len(df_reference)} pytorch detections vs {len(df_candidate)} {args['backend']} detections"
+            )
+            exit(1)
+        if df_reference.empty:
+            print("Parity check passed: no detections with both backends")
+            exit(0)
+
+        max_diff_seconds = max(
+            (df_reference[column] - df_candidate[column]).abs().max()
+            for column in ["t_start", "t_end"]
+        )
+        max_diff_probability = (
+            (df_reference["probability"] - df_candidate["probability"]).abs().max()
+        )
+        print(f"max diff t_start/t_end: {max_diff_seconds:.3f}s")
+        print(f"max diff probability: {max_diff_probability:.4f}")
+        if (
+            max_diff_seconds > args["atol_seconds"]
+            or max_diff_probability > args["atol_probability"]
+        ):
+            logging.error("Parity check failed: detections differ beyond tolerance")
+            exit(1)
+        print("Parity check passed")
+        exit(0)
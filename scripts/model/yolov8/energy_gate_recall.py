@@ -0,0 +1,227 @@
+"""Script to report the recall and the skip ratio of the infrasonic energy
+gate on the annotated testing rumbles, to tune the energy_gate_k parameter of
+the inference pipeline."""
+
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+import forest_elephants_rumble_detection.data.features.testing as features_testing
+from forest_elephants_rumble_detection.model.yolo.gate import gate, infrasonic_scores
+from forest_elephants_rumble_detection.model.yolo.predict import (
+    SPECTROGRAM_METHODS,
+    index_to_relative_offset,
+    load_audio,
+    spectrogram_batches,
+)
+from forest_elephants_rumble_detection.utils import yaml_read
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input-rumbles-dir",
+        help="dir containing the rumbles, with the annotated Testing sounds.",
+        type=Path,
+        default=Path("./data/01_raw/cornell_data/Rumble/"),
+    )
+    parser.add_argument(
+        "--model-config",
+        help="path to the model config",
+        default="./data/08_artifacts/model/rumbles/yolov8/config.yaml",
+        type=Path,
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="path to save the recall report",
+        default=Path("./data/06_reporting/yolov8/energy_gate/"),
+        type=Path,
+    )
+    parser.add_argument(
+        "--overlap",
+        help="Overlap in seconds between two subsequent spectrograms.",
+        default=10.0,
+        type=float,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="Batch size, the gate threshold is updated after each batch.",
+        default=64,
+        type=int,
+    )
+    parser.add_argument(
+        "--spectrogram-method",
+        help="Method used to generate the spectrograms.",
+        default="clip",
+        choices=SPECTROGRAM_METHODS,
+        type=str,
+    )
+    parser.add_argument(
+        "--k",
+        help="values of energy_gate_k to evaluate",
+        nargs="+",
+        default=[0.0, 0.5, 1.0, 1.5, 2.0, 3.0],
+        type=float,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if not (args["input_rumbles_dir"] / "Testing").exists():
+        logging.error("Invalid --input-rumbles-dir, the Testing dir does not exist")
+        return False
+    elif not args["model_config"].exists():
+        logging.error("Invalid --model-config filepath does not exist")
+        return False
+    else:
+        return True
+
+
+def batch_scores(
+    audio_filepath: Path,
+    config: dict,
+    overlap: float,
+    batch_size: int,
+    spectrogram_method: str,
+) -> list[np.ndarray]:
+    """Returns the infrasonic scores of the spectrograms of audio_filepath,
+    one array per batch as computed during inference."""
+    waveform, sample_rate = load_audio(audio_filepath)
+    batches = spectrogram_batches(
+        waveform=waveform,
+        sample_rate=sample_rate,
+        duration=config["duration"],
+        overlap=overlap,
+        width=config["width"],
+        height=config["height"],
+        freq_max=config["freq_max"],
+        n_fft=config["n_fft"],
+        hop_length=config["hop_length"],
+        batch_size=batch_size,
+        spectrogram_method=spectrogram_method,
+    )
+    return [infrasonic_scores(batch, freq_max=config["freq_max"]) for batch in batches]
+
+
+def gate_mask(scores_per_batch: list[np.ndarray], k: float) -> np.ndarray:
+    """Replays the energy gate of the inference on the batches of scores of an
+    audio file and returns the mask of the spectrograms sent to the model."""
+    masks = []
+    file_scores = np.empty(0)
+    for scores in scores_per_batch:
+        file_scores = np.concatenate([file_scores, scores])
+        masks.append(gate(scores, file_scores=file_scores, k=k))
+    return np.concatenate(masks)
+
+
+def evaluate_gate(
+    mask: np.ndarray,
+    offsets: np.ndarray,
+    duration: float,
+    df_rumbles: pd.DataFrame,
+) -> dict:
+    """Returns the skip ratio of the gate and its recall at the rumble level (a
+    rumble is recalled when a spectrogram overlapping it passes the gate) and
+    at the spectrogram level (share of the spectrograms with rumbles that
+    pass)."""
+    t_start = df_rumbles["t_start"].to_numpy()[:, None]
+    t_end = df_rumbles["t_end"].to_numpy()[:, None]
+    # (rumbles, spectrograms) overlap matrix
+    overlaps = (t_end > offsets[None, :]) & (t_start < offsets[None, :] + duration)
+    positives = overlaps.any(axis=0)
+    return {
+        "number_spectrograms": len(mask),
+        "number_skipped": int((~mask).sum()),
+        "number_rumbles": len(df_rumbles),
+        "number_rumbles_recalled": int((overlaps & mask[None, :]).any(axis=1).sum()),
+        "number_positive_spectrograms": int(positives.sum()),
+        "number_positive_spectrograms_passed": int((positives & mask).sum()),
+    }
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        logging.error(f"Could not validate the parsed args: {args}")
+        exit(1)
+    else:
+        logging.info(args)
+        config = yaml_read(args["model_config"])
+        rumbles_dir = args["input_rumbles_dir"]
+        test_dir = rumbles_dir / "Testing"
+        train_dir = rumbles_dir / "Training"
+
+        logging.info("Loading and parsing the testing txt files")
+        df_prepared = features_testing.prepare_df(
+            features_testing.parse_all_testing_txt_files(test_dir),
+            train_dir=train_dir,
+            test_dir=test_dir,
+        )
+        audio_filepaths = [
+            fp for fp in df_prepared["audio_filepath"].unique() if fp.exists()
+        ]
+
+        records = []
+        for audio_filepath in tqdm(audio_filepaths):
+            logging.info(f"Scoring the spectrograms of {audio_filepath}")
+            scores_per_batch = batch_scores(
+                audio_filepath,
+                config=config,
+                overlap=args["overlap"],
+                batch_size=args["batch_size"],
+                spectrogram_method=args["spectrogram_method"],
+            )
+            number_spectrograms = sum(len(scores) for scores in scores_per_batch)
+            offsets = index_to_relative_offset(
+                idx=np.arange(number_spectrograms),
+                duration=config["duration"],
+                overlap=args["overlap"],
+            )
+            df_rumbles = df_prepared[df_prepared["audio_filepath"] == audio_filepath]
+            for k in args["k"]:
+                records.append(
+                    {
+                        "audio_filepath": str(audio_filepath),
+                        "k": k,
+                        **evaluate_gate(
+                            gate_mask(scores_per_batch, k=k),
+                            offsets=offsets,
+                            duration=config["duration"],
+                            df_rumbles=df_rumbles,
+                        ),
+                    }
+                )
+
+        df_files = pd.DataFrame(records)
+        df_report = df_files.drop(columns=["audio_filepath"]).groupby("k").sum()
+        df_report["skip_ratio"] = (
+            df_report["number_skipped"] / df_report["number_spectrograms"]
+        )
+        df_report["rumble_recall"] = (
+            df_report["number_rumbles_recalled"] / df_report["number_rumbles"]
+        )
+        df_report["spectrogram_recall"] = (
+            df_report["number_positive_spectrograms_passed"]
+            / df_report["number_positive_spectrograms"]
+        )
+        print(df_report[["skip_ratio", "rumble_recall", "spectrogram_recall"]])
+
+        output_dir = args["output_dir"]
+        output_dir.mkdir(exist_ok=True, parents=True)
+        df_files.to_csv(output_dir / "recall_per_file.csv")
+        df_report.to_csv(output_dir / "recall.csv")
+        exit(0)
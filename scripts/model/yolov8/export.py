@@ -0,0 +1,84 @@
+"""Script to export trained YOLOv8 weights to faster CPU inference backends
+(ONNX, OpenVINO)."""
+
+import argparse
+import logging
+from pathlib import Path
+
+from forest_elephants_rumble_detection.model.yolo.backend import (
+    BACKENDS,
+    QUANTIZED_BACKENDS,
+    export,
+)
+from forest_elephants_rumble_detection.utils import yaml_read
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--model-weights-filepath",
+        help="path to the model weights",
+        default="./data/08_artifacts/model/rumbles/yolov8/weights/best.pt",
+        type=Path,
+    )
+    parser.add_argument(
+        "--model-config",
+        help="path to the model config, used for the width and height of the spectrograms",
+        default="./data/08_artifacts/model/rumbles/yolov8/config.yaml",
+        type=Path,
+    )
+    parser.add_argument(
+        "--backend",
+        help="backends to export the weights to",
+        nargs="+",
+        default=["onnx", "openvino"],
+        choices=[
+            backend
+            for backend in BACKENDS.keys()
+            if backend not in ["pytorch", *QUANTIZED_BACKENDS]
+        ],
+        type=str,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if not args["model_weights_filepath"].exists():
+        logging.error("Invalid --model-weights-filepath filepath does not exist")
+        return False
+    elif not args["model_config"].exists():
+        logging.error("Invalid --model-config filepath does not exist")
+        return False
+    else:
+        return True
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        logging.error(f"Could not validate the parsed args: {args}")
+        exit(1)
+    else:
+        config = yaml_read(args["model_config"])
+        imgsz = (config["height"], config["width"])
+        for backend in args["backend"]:
+            logging.info(f"Exporting {args['model_weights_filepath']} to {backend}")
+            try:
+                exported_path = export(
+                    args["model_weights_filepath"], backend=backend, imgsz=imgsz
+                )
+                logging.info(f"Exported the {backend} model to {exported_path}")
+            except Exception as e:
+                # The runtimes, eg. OpenVINO, are optional dependencies
+                logging.warning(f"Could not export to {backend}: {e}")
+        exit(0)
@@ -4,9 +4,20 @@ import argparse
 import logging
 from pathlib import Path
 
-from ultralytics import YOLO
+import torch
 
-from forest_elephants_rumble_detection.model.yolo.predict import pipeline
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import STFT_BACKENDS
+from forest_elephants_rumble_detection.model.yolo.autotune import (
+    MACHINE_PROFILE_FILEPATH,
+    machine_settings,
+)
+from forest_elephants_rumble_detection.model.yolo.backend import BACKENDS, load_model
+from forest_elephants_rumble_detection.model.yolo.merge import MERGE_STRATEGIES
+from forest_elephants_rumble_detection.model.yolo.predict import (
+    parallel_pipeline,
+    pipeline,
+)
+from forest_elephants_rumble_detection.timing import StageTimer
 from forest_elephants_rumble_detection.utils import yaml_read, yaml_write
 
 
@@ -27,9 +38,38 @@ def make_cli_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument(
         "--verbose",
-        help="Should it be verbose? Can take significantly longer as it will save some intermediate spectrograms and predictions",
+        help="Should it be verbose? Also saves the intermediate spectrograms and predictions",
         action="store_true",
     )
+    parser.add_argument(
+        "--save-spectrograms",
+        help="Save the spectrograms as PNGs, without being verbose",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--save-predictions",
+        help="Save the spectrograms with the predicted boxes as PNGs, without being verbose",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--png-compression-level",
+        help="PNG compression level of the saved spectrograms and predictions, from 0 (largest) to 9 (slowest, smallest). Defaults to the fast OpenCV setting",
+        default=None,
+        choices=range(10),
+        type=int,
+    )
+    parser.add_argument(
+        "--artifact-workers",
+        help="Number of background threads saving the spectrograms and predictions",
+        default=2,
+        type=int,
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        help="Save the completed windows of each audio file every N seconds in output-dir/checkpoints, to resume an interrupted run with the same arguments",
+        default=None,
+        type=float,
+    )
     parser.add_argument(
         "--overlap",
         help="Overlap in seconds between two subsequent spectrograms.",
@@ -38,16 +78,112 @@ def make_cli_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument(
         "--batch-size",
-        help="batch size for running inference. Higher value means running inference faster but using more CPU/GPU",
-        default=64,
+        help="batch size for running inference. Higher value means running inference faster but using more CPU/GPU. Defaults to the one of --machine-profile-filepath when provided, 64 otherwise",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "--spectrogram-method",
+        help="clip: one spectrogram per clip, sliced: one spectrogram per block of clips starting a multiple of the hop_length samples apart, sliced by frame index, batched: vectorized spectrograms per batch of clips",
+        default="clip",
+        choices=["clip", "sliced", "batched"],
+        type=str,
+    )
+    parser.add_argument(
+        "--spectrogram-block-size",
+        help="number of clips sharing a spectrogram with --spectrogram-method sliced. Defaults to the whole file",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "--decimate",
+        help="Downsample the audio to about 4 * freq_max before computing the spectrograms, much faster on high sample rates",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--stft-backend",
+        help="torch, scipy and numpy run a full FFT, dft only computes the frequency bins below freq_max, auto picks the fastest one on this host, see scripts/benchmark/stft.py",
+        default="torch",
+        choices=[*STFT_BACKENDS.keys(), "auto"],
+        type=str,
+    )
+    parser.add_argument(
+        "--pipelined",
+        help="Generate the spectrograms in a background thread while the model runs on the previous batch",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--queue-depth",
+        help="Maximum number of spectrogram batches waiting for the model with --pipelined",
+        default=2,
+        type=int,
+    )
+    parser.add_argument(
+        "--streaming",
+        help="Read the audio files in blocks instead of loading them entirely in memory",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--block-duration",
+        help="Duration in seconds of the blocks read with --streaming",
+        default=3600.0,
+        type=float,
+    )
+    parser.add_argument(
+        "--num-workers",
+        help="Number of worker processes analyzing the audio files in parallel, each loading its own model. Defaults to the one of --machine-profile-filepath when provided, 1 otherwise",
+        default=None,
         type=int,
     )
+    parser.add_argument(
+        "--threads-per-worker",
+        help="Number of torch threads of each worker process. Defaults to the one of --machine-profile-filepath when provided, cpu_count / num_workers otherwise",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "--machine-profile-filepath",
+        help=f"opt-in machine profile providing the defaults of --batch-size, --num-workers and --threads-per-worker, eg. {MACHINE_PROFILE_FILEPATH} saved by scripts/model/yolov8/autotune.py",
+        default=None,
+        type=Path,
+    )
     parser.add_argument(
         "--model-weights-filepath",
         help="path to the model weights",
         default="./data/08_artifacts/model/rumbles/yolov8/weights/best.pt",
         type=Path,
     )
+    parser.add_argument(
+        "--backend",
+        help="inference backend, the onnx, openvino and onnx_int8 models are expected next to the weights, see scripts/model/yolov8/export.py and quantize.py",
+        default="pytorch",
+        choices=list(BACKENDS.keys()),
+        type=str,
+    )
+    parser.add_argument(
+        "--merge-iou-threshold",
+        help="IoU above which the detections of a rumble reported by two overlapping spectrograms are merged, no merging by default",
+        default=None,
+        type=float,
+    )
+    parser.add_argument(
+        "--merge-strategy",
+        help="keep the most confident box of the merged detections (suppress) or their union",
+        default="suppress",
+        choices=MERGE_STRATEGIES,
+        type=str,
+    )
+    parser.add_argument(
+        "--energy-gate",
+        help="only run the model on the spectrograms with enough infrasonic (10-50Hz) energy compared to the rest of the file",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--energy-gate-k",
+        help="number of robust standard deviations above the median score of the file for a spectrogram to pass the energy gate, see scripts/model/yolov8/energy_gate_recall.py",
+        default=1.0,
+        type=float,
+    )
     parser.add_argument(
         "--model-config",
         help="path to the model weights",
@@ -74,6 +210,14 @@ def validate_parsed_args(args: dict) -> bool:
     elif not args["model_config"].exists():
         logging.error("Invalid --model-config filepath does not exist")
         return False
+    elif args["merge_iou_threshold"] is not None and not (
+        0.0 < args["merge_iou_threshold"] <= 1.0
+    ):
+        logging.error("Invalid --merge-iou-threshold value, should be in (0, 1]")
+        return False
+    elif args["checkpoint_interval"] is not None and args["checkpoint_interval"] < 0:
+        logging.error("Invalid --checkpoint-interval value, should be positive")
+        return False
     else:
         return True
 
@@ -86,10 +230,6 @@ if __name__ == "__main__":
         logging.error(f"Could not validate the parsed args: {args}")
         exit(1)
     else:
-        logging.info(f"Loading the model from weights {args['model_weights_filepath']}")
-        model = YOLO(args["model_weights_filepath"])
-        model.info()
-
         input_dir = args["input_dir_audio_filepaths"]
         output_dir = args["output_dir"]
 
@@ -99,18 +239,24 @@ if __name__ == "__main__":
         logging.info(f"Loaded config {config}")
 
         overlap = args["overlap"]
-        batch_size = args["batch_size"]
+        settings = machine_settings(
+            args["machine_profile_filepath"], backend=args["backend"]
+        )
+        logging.info(f"Machine settings {settings}")
+        batch_size = args["batch_size"] or settings["batch_size"]
+        num_workers = args["num_workers"] or settings["num_workers"]
+        threads_per_worker = (
+            args["threads_per_worker"] or settings["threads_per_worker"]
+        )
 
         output_dir.mkdir(parents=True, exist_ok=True)
 
         # If the verbose parameter is set, save intermediate results
         verbose = args["verbose"]
-        save_spectrograms = verbose
-        save_predictions = verbose
+        save_spectrograms = verbose or args["save_spectrograms"]
+        save_predictions = verbose or args["save_predictions"]
 
-        df_pipeline = pipeline(
-            model=model,
-            audio_filepaths=audio_filepaths,
+        pipeline_kwargs = dict(
             duration=config["duration"],
             overlap=overlap,
             width=config["width"],
@@ -124,11 +270,60 @@ if __name__ == "__main__":
             save_spectrograms=save_spectrograms,
             save_predictions=save_predictions,
             verbose=args["verbose"],
+            spectrogram_method=args["spectrogram_method"],
+            spectrogram_block_size=args["spectrogram_block_size"],
+            decimate_waveform=args["decimate"],
+            stft_backend=args["stft_backend"],
+            pipelined=args["pipelined"],
+            queue_depth=args["queue_depth"],
+            streaming=args["streaming"],
+            block_duration=args["block_duration"],
+            merge_iou_threshold=args["merge_iou_threshold"],
+            merge_strategy=args["merge_strategy"],
+            energy_gate=args["energy_gate"],
+            energy_gate_k=args["energy_gate_k"],
+            png_compression_level=args["png_compression_level"],
+            artifact_workers=args["artifact_workers"],
+            checkpoint_interval=args["checkpoint_interval"],
         )
+        timer = StageTimer()
+        if num_workers > 1:
+            df_pipeline = parallel_pipeline(
+                model_weights_filepath=args["model_weights_filepath"],
+                audio_filepaths=audio_filepaths,
+                num_workers=num_workers,
+                threads_per_worker=threads_per_worker,
+                backend=args["backend"],
+                timer=timer,
+                **pipeline_kwargs,
+            )
+        else:
+            if threads_per_worker is not None:
+                torch.set_num_threads(threads_per_worker)
+            logging.info(
+                f"Loading the {args['backend']} model from weights {args['model_weights_filepath']}"
+            )
+            model = load_model(
+                args["model_weights_filepath"],
+                backend=args["backend"],
+                imgsz=(config["height"], config["width"]),
+            )
+            if args["backend"] == "pytorch":
+                model.info()
+            df_pipeline = pipeline(
+                model=model,
+                audio_filepaths=audio_filepaths,
+                timer=timer,
+                **pipeline_kwargs,
+            )
 
         logging.info(f"Saving the results")
         logging.info(df_pipeline.head())
-        df_pipeline.to_csv(output_dir / "results.csv")
+        timer.audio_filepath = None
+        with timer.stage("writing"):
+            df_pipeline.to_csv(output_dir / "results.csv")
+        logging.info(f"Saving the stage timings in {output_dir}")
+        timer.save(output_dir)
         yaml_write(
             output_dir / "args.yaml",
             {
@@ -136,7 +331,27 @@ if __name__ == "__main__":
                 "args": {
                     "batch_size": batch_size,
                     "overlap": overlap,
+                    "spectrogram_method": args["spectrogram_method"],
+                    "spectrogram_block_size": args["spectrogram_block_size"],
+                    "decimate": args["decimate"],
+                    "stft_backend": args["stft_backend"],
+                    "pipelined": args["pipelined"],
+                    "queue_depth": args["queue_depth"],
+                    "streaming": args["streaming"],
+                    "block_duration": args["block_duration"],
+                    "merge_iou_threshold": args["merge_iou_threshold"],
+                    "merge_strategy": args["merge_strategy"],
+                    "energy_gate": args["energy_gate"],
+                    "energy_gate_k": args["energy_gate_k"],
+                    "save_spectrograms": save_spectrograms,
+                    "save_predictions": save_predictions,
+                    "png_compression_level": args["png_compression_level"],
+                    "artifact_workers": args["artifact_workers"],
+                    "checkpoint_interval": args["checkpoint_interval"],
+                    "num_workers": num_workers,
+                    "threads_per_worker": threads_per_worker,
                     "model_weights_filepath": str(args["model_weights_filepath"]),
+                    "backend": args["backend"],
                     "input_dir_audio_filepaths": [str(fp) for fp in audio_filepaths],
                 },
             },
@@ -0,0 +1,195 @@
+"""Script to quantize trained YOLOv8 weights to INT8 for CPU inference,
+calibrated on spectrograms of the yolov8 dataset, and to report the mAP and
+throughput of the quantized model next to the float ones."""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+import torch
+
+from forest_elephants_rumble_detection.model.yolo.backend import (
+    calibration_image_filepaths,
+    load_model,
+    quantize,
+)
+from forest_elephants_rumble_detection.model.yolo.eval import evaluate
+from forest_elephants_rumble_detection.model.yolo.predict import predict_tensor
+from forest_elephants_rumble_detection.utils import write_json, yaml_read
+
+
+def make_cli_parser() -> argparse.ArgumentParser:
+    """Makes the CLI parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--model-weights-filepath",
+        help="path to the model weights",
+        default="./data/08_artifacts/model/rumbles/yolov8/weights/best.pt",
+        type=Path,
+    )
+    parser.add_argument(
+        "--model-config",
+        help="path to the model config, used for the width and height of the spectrograms",
+        default="./data/08_artifacts/model/rumbles/yolov8/config.yaml",
+        type=Path,
+    )
+    parser.add_argument(
+        "--input-dir-yolov8-dataset",
+        help="yolov8 dataset used to calibrate and evaluate the quantized model",
+        default=Path("./data/03_model_input/yolov8/full/"),
+        type=Path,
+    )
+    parser.add_argument(
+        "--calibration-split",
+        help="split of the dataset to sample the calibration spectrograms from",
+        default="train",
+        type=str,
+    )
+    parser.add_argument(
+        "--k",
+        help="number of calibration spectrograms",
+        default=300,
+        type=int,
+    )
+    parser.add_argument(
+        "--random-seed",
+        help="Random seed to sample the calibration spectrograms",
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "--split",
+        help="split of the dataset the models are evaluated on, in {train, val, test}",
+        default="test",
+        type=str,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="number of spectrograms per batch to measure the throughput",
+        default=64,
+        type=int,
+    )
+    parser.add_argument(
+        "--num-batches",
+        help="number of timed batches to measure the throughput",
+        default=5,
+        type=int,
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="path to save the quantization report",
+        default=Path("./data/06_reporting/yolov8/quantization/"),
+        type=Path,
+    )
+    parser.add_argument(
+        "-log",
+        "--loglevel",
+        default="warning",
+        help="Provide logging level. Example --loglevel debug, default=warning",
+    )
+    return parser
+
+
+def validate_parsed_args(args: dict) -> bool:
+    """Returns whether the parsed args are valid."""
+    if not args["model_weights_filepath"].exists():
+        logging.error("Invalid --model-weights-filepath filepath does not exist")
+        return False
+    elif not args["model_config"].exists():
+        logging.error("Invalid --model-config filepath does not exist")
+        return False
+    elif not (args["input_dir_yolov8_dataset"] / "data.yaml").exists():
+        logging.error("Invalid --input-dir-yolov8-dataset, data.yaml does not exist")
+        return False
+    elif args["calibration_split"] not in ["train", "val", "test"]:
+        logging.error(
+            "Invalid --calibration-split value, should be in {train, val, test}"
+        )
+        return False
+    elif args["split"] not in ["train", "val", "test"]:
+        logging.error("Invalid --split value, should be in {train, val, test}")
+        return False
+    else:
+        return True
+
+
+def throughput(model, images: torch.Tensor, num_batches: int) -> float:
+    """Returns the number of spectrograms per second predicted by the model on
+    the batch of images after a warmup call."""
+    predict_tensor(model, images)
+    start_time = time.perf_counter()
+    for _ in range(num_batches):
+        predict_tensor(model, images)
+    elapsed_time = time.perf_counter() - start_time
+    return num_batches * len(images) / elapsed_time
+
+
+if __name__ == "__main__":
+    cli_parser = make_cli_parser()
+    args = vars(cli_parser.parse_args())
+    logging.basicConfig(level=args["loglevel"].upper())
+    if not validate_parsed_args(args):
+        logging.error(f"Could not validate the parsed args: {args}")
+        exit(1)
+    else:
+        logging.info(args)
+        config = yaml_read(args["model_config"])
+        imgsz = (config["height"], config["width"])
+        calibration_filepaths = calibration_image_filepaths(
+            args["input_dir_yolov8_dataset"],
+            split=args["calibration_split"],
+            k=args["k"],
+            random_seed=args["random_seed"],
+        )
+        if not calibration_filepaths:
+            logging.error(
+                f"No calibration spectrograms found in the {args['calibration_split']} split"
+            )
+            exit(1)
+        quantized_filepath = quantize(
+            args["model_weights_filepath"],
+            calibration_filepaths=calibration_filepaths,
+            imgsz=imgsz,
+        )
+        logging.info(f"Saved the quantized model to {quantized_filepath}")
+
+        images = torch.rand(args["batch_size"], 1, *imgsz).expand(-1, 3, -1, -1)
+        report = {}
+        for backend in ["pytorch", "onnx", "onnx_int8"]:
+            model = load_model(
+                args["model_weights_filepath"], backend=backend, imgsz=imgsz
+            )
+            metrics = evaluate(
+                model,
+                split=args["split"],
+                data=args["input_dir_yolov8_dataset"] / "data.yaml",
+            )
+            report[backend] = {
+                "mAP50": float(metrics.box.map50),
+                "mAP50-95": float(metrics.box.map),
+                "images_per_second": throughput(
+                    load_model(
+                        args["model_weights_filepath"], backend=backend, imgsz=imgsz
+                    ),
+                    images=images,
+                    num_batches=args["num_batches"],
+                ),
+            }
+            print(
+                f"{backend}: mAP50={report[backend]['mAP50']:.3f} mAP50-95={report[backend]['mAP50-95']:.3f} {report[backend]['images_per_second']:.1f} images/s"
+            )
+        print(
+            f"int8 speedup: {report['onnx_int8']['images_per_second'] / report['pytorch']['images_per_second']:.2f}x"
+        )
+        output_dir = args["output_dir"]
+        output_dir.mkdir(exist_ok=True, parents=True)
+        write_json(
+            to=output_dir / "report.json",
+            data={
+                "calibration_filepaths": [str(fp) for fp in calibration_filepaths],
+                "split": args["split"],
+                "backends": report,
+            },
+        )
+        exit(0)
@@ -156,6 +156,10 @@ class MainWindow(QMainWindow):
             return
 
         self.model = Model() 
+        if self.model.num_workers is not None:
+            # Number of files analyzed concurrently from the machine profile
+            self.max_threads = self.model.num_workers
+            self.max_threads_label.setText(f"max threads (machine profile): {self.max_threads}")
 
         self.tmp_session_dir = Path(self.output_dir) / "tmp_session"
         self.tmp_session_dir.mkdir(exist_ok=True)
@@ -3,43 +3,109 @@ from collections import namedtuple
 #from .mlmodel import modelapi
 from forest_elephants_rumble_detection.utils import yaml_read
 from pathlib import Path
-from ultralytics import YOLO
 import logging
+import queue
+import torch
+from forest_elephants_rumble_detection.model.yolo.autotune import load_machine_profile
+from forest_elephants_rumble_detection.model.yolo.backend import load_model, warmup
 from forest_elephants_rumble_detection.model.yolo.predict import pipeline
 
+CONFIG_FILEPATH = Path(r"src/forest_elephants_rumble_detection/application/08_artifacts/inference_config.yaml")
+
 class Model(ModelInterface):
-    """Class for analyzing a file by the ML model."""
+    """
+    Class for analyzing a file by the ML model.
+
+    The config is read and a warmed-up detector is loaded once per session. The
+    ultralytics predictors are not thread safe, so each worker thread checks out its
+    own detector for the duration of a file: extra detectors are only loaded when
+    more files are analyzed concurrently and are reused for the next files.
 
-    def __init__(self, callbacks=[]):
+    When the config sets the machine_profile_filepath of a machine calibrated with
+    scripts/model/yolov8/autotune.py, the profile sets the torch threads, the batch size
+    when the config one is null and `num_workers`, the number of files to analyze
+    concurrently.
+    """
+
+    def __init__(self, callbacks=[], config_filepath: Path = CONFIG_FILEPATH):
         self.callbacks = callbacks
+        self.config = yaml_read(config_filepath)
+        logging.basicConfig(level=self.config['loglevel'].upper())
+        self.batch_size = self.config.get("batch_size")
+        self.num_workers = None
+        profile = None
+        if self.config.get("machine_profile_filepath") is not None:
+            profile = load_machine_profile(
+                self.config["machine_profile_filepath"],
+                backend=self.config.get("backend", "pytorch"),
+            )
+        if profile is not None:
+            logging.info(f"Using the machine profile: batch_size={profile['batch_size']} num_workers={profile['num_workers']} threads_per_worker={profile['threads_per_worker']}")
+            torch.set_num_threads(profile["threads_per_worker"])
+            self.batch_size = self.batch_size or profile["batch_size"]
+            self.num_workers = profile["num_workers"]
+        self.detectors = queue.LifoQueue()
+        self.detectors.put(self.load_detector())
+
+    def load_detector(self):
+        """Loads the detector from the config and warms it up."""
+        config = self.config
+        logging.info(f"Loading the {config.get('backend', 'pytorch')} model from {config['model_weights_filepath']}")
+        imgsz = (config["height"], config["width"])
+        model = load_model(
+            config["model_weights_filepath"],
+            backend=config.get("backend", "pytorch"),
+            imgsz=imgsz,
+        )
+        return warmup(model, imgsz=imgsz)
 
     def analyze(self, file: File, output_dir:Path):
         """
         Performance inference
         """
         
-        config = yaml_read(Path(r"src/forest_elephants_rumble_detection/application/08_artifacts/inference_config.yaml"))
-
-        model = YOLO(config["model_weights_filepath"])
-        logging.basicConfig(level=config['loglevel'].upper())
-
-        df_pipeline = pipeline(
-            model=model,
-            audio_filepaths=[Path(file.path)],
-            duration=config["duration"],
-            overlap=config["overlap"],
-            width=config["width"],
-            height=config["height"],
-            freq_min=config["freq_min"],
-            freq_max=config["freq_max"],
-            n_fft=config["n_fft"],
-            hop_length=config["hop_length"],
-            batch_size=config["batch_size"],
-            output_dir=output_dir,
-            save_spectrograms=config["save_spectrograms"],
-            save_predictions=config["save_predictions"],
-            verbose=config["verbose"],
-        )
+        config = self.config
+
+        try:
+            model = self.detectors.get_nowait()
+        except queue.Empty:
+            model = self.load_detector()
+
+        try:
+            df_pipeline = pipeline(
+                model=model,
+                audio_filepaths=[Path(file.path)],
+                duration=config["duration"],
+                overlap=config["overlap"],
+                width=config["width"],
+                height=config["height"],
+                freq_min=config["freq_min"],
+                freq_max=config["freq_max"],
+                n_fft=config["n_fft"],
+                hop_length=config["hop_length"],
+                batch_size=self.batch_size,
+                output_dir=output_dir,
+                save_spectrograms=config["save_spectrograms"],
+                save_predictions=config["save_predictions"],
+                verbose=config["verbose"],
+                spectrogram_method=config.get("spectrogram_method", "clip"),
+                spectrogram_block_size=config.get("spectrogram_block_size"),
+                decimate_waveform=config.get("decimate_waveform", False),
+                stft_backend=config.get("stft_backend", "torch"),
+                pipelined=config.get("pipelined", False),
+                queue_depth=config.get("queue_depth", 2),
+                streaming=config.get("streaming", False),
+                block_duration=config.get("block_duration", 3600.0),
+                merge_iou_threshold=config.get("merge_iou_threshold"),
+                merge_strategy=config.get("merge_strategy", "suppress"),
+                energy_gate=config.get("energy_gate", False),
+                energy_gate_k=config.get("energy_gate_k", 1.0),
+                png_compression_level=config.get("png_compression_level"),
+                artifact_workers=config.get("artifact_workers", 2),
+                checkpoint_interval=config.get("checkpoint_interval"),
+            )
+        finally:
+            self.detectors.put(model)
 
         # Function to map DataFrame to Events
         def map_events(df, event_class):
@@ -4,8 +4,24 @@ from pathlib import Path
 
 import librosa
 
+from forest_elephants_rumble_detection.data.wav import open_wav
+
 
 def load_audio(sound_path: Path, duration: float = 10.0, offset: float = 0.0):
     """Load audio path and clip it to duration with the provided offset using
-    librosa."""
-    return librosa.load(sound_path, sr=None, duration=duration, offset=offset)
+    librosa.
+
+    PCM WAV files are memory-mapped instead of decoded, only the samples of
+    the clip are read, with the same output as librosa (mono, native sample
+    rate).
+    """
+    reader = open_wav(sound_path)
+    if reader is None:
+        return librosa.load(sound_path, sr=None, duration=duration, offset=offset)
+    sr = reader.sample_rate
+    # Frames truncated like librosa does
+    audio = reader.read_float(
+        frame_offset=int(offset * sr),
+        num_frames=None if duration is None else int(duration * sr),
+    )
+    return audio.mean(axis=0), sr
@@ -1,5 +1,6 @@
 """Create and save spectrograms from raw audio inputs."""
 
+from functools import lru_cache
 from pathlib import Path
 
 import librosa
@@ -10,12 +11,20 @@ import numpy as np
 import pandas as pd
 from matplotlib.figure import Figure
 from matplotlib.patches import Rectangle
+from matplotlib.scale import SymmetricalLogTransform
+from PIL import Image
 
 from forest_elephants_rumble_detection.data.audio import load_audio
 
 from ..math import clamp
 from ..yolov8 import bboxes_to_yolov8_txt_format
 
+# Matplotlib specific: by default it counts some inches for the padding -
+# we subtract it to match our target width and height
+# TODO: investigate why it does not work the same from python than from jupyterlab
+HORIZONTAL_PAD_INCHES = 1.94
+VERTICAL_PAD_INCHES = 2.0
+
 
 def make_spectrogram(
     audio,
@@ -83,16 +92,10 @@ def make_spectrogram2(
     # Convert the amplitude to decibels
     S_DB = librosa.amplitude_to_db(np.abs(D), ref=np.max, top_db=top_db)
 
-    # Matplotlib specific: by default it counts some inches for the padding -
-    # we subtract it to match our target width and height
-    # TODO: investigate why it does not work the same from python than from jupyterlab
-    horizontal_pad_inches = 1.94
-    vertical_pad_inches = 2.0
-
     fig = plt.figure(
         figsize=(
-            width / dpi + horizontal_pad_inches,
-            height / dpi + vertical_pad_inches,
+            width / dpi + HORIZONTAL_PAD_INCHES,
+            height / dpi + VERTICAL_PAD_INCHES,
         ),
         dpi=dpi,
     )
@@ -121,6 +124,170 @@ def make_spectrogram2(
     return fig
 
 
+def figure_axes_size(width: int, height: int, dpi: int) -> tuple[float, float]:
+    """
+    Returns the width and height in pixels of the axes of the figure of
+    `make_spectrogram2`, from the padding and the subplot parameters of matplotlib.
+    Saved with a tight bbox, the figure is cropped to the axes and its image is
+    int(width) x int(height) pixels.
+    """
+    params = matplotlib.rcParams
+    figure_width = (width / dpi + HORIZONTAL_PAD_INCHES) * dpi
+    figure_height = (height / dpi + VERTICAL_PAD_INCHES) * dpi
+    return (
+        (params["figure.subplot.right"] - params["figure.subplot.left"])
+        * figure_width,
+        (params["figure.subplot.top"] - params["figure.subplot.bottom"])
+        * figure_height,
+    )
+
+
+def cell_edges(centers: np.ndarray) -> np.ndarray:
+    """
+    Returns the edges of the cells of the centers, halfway between two centers and
+    extended by half a cell at both ends, like pcolormesh with nearest shading.
+    """
+    return np.concatenate(
+        [
+            [centers[0] - (centers[1] - centers[0]) / 2],
+            (centers[1:] + centers[:-1]) / 2,
+            [centers[-1] + (centers[-1] - centers[-2]) / 2],
+        ]
+    )
+
+
+@lru_cache(maxsize=16)
+def spectrogram_image_indices(
+    sr: float,
+    n_fft: int,
+    number_frames: int,
+    fmin: float,
+    fmax: float,
+    width: int,
+    height: int,
+    dpi: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the frequency bin of each row, from top to bottom, and the frame of each
+    column of the image of a spectrogram of number_frames frames, as
+    `make_spectrogram2` lays it out with `librosa.display.specshow` and saves it:
+      each bin and frame is a cell centered on its frequency and time, extending
+        halfway to its neighbours;
+      the frequency axis is the symmetrical log scale of specshow with y_axis="log",
+        between fmin and fmax;
+      the time axis spans all the frames;
+      the axes are `figure_axes_size` pixels, the saved image keeps their bottom left
+        int(width) x int(height) pixels.
+    Each pixel takes the value of the cell under its center, as the Agg backend fills
+    the cells of the mesh once their edges are snapped to the pixel grid.
+    """
+    axes_width, axes_height = figure_axes_size(width=width, height=height, dpi=dpi)
+    image_width, image_height = int(axes_width), int(axes_height)
+    number_bins = 1 + n_fft // 2
+    transform = SymmetricalLogTransform(
+        base=2, linthresh=float(librosa.note_to_hz("C2")), linscale=0.5
+    )
+    y_min, y_max = transform.transform(np.array([fmin, fmax], dtype=np.float64))
+    frequencies = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    y_edges = (transform.transform(cell_edges(frequencies)) - y_min) / (y_max - y_min)
+    # Rows from the top of the image, whose origin is at its bottom
+    y = (image_height - np.arange(image_height) - 0.5) / axes_height
+    rows = np.searchsorted(y_edges, y) - 1
+    x_edges = cell_edges(np.arange(number_frames, dtype=np.float64))
+    x_edges = (x_edges - x_edges[0]) / (x_edges[-1] - x_edges[0])
+    x = (np.arange(image_width) + 0.5) / axes_width
+    columns = np.searchsorted(x_edges, x) - 1
+    return (
+        np.clip(rows, 0, number_bins - 1),
+        np.clip(columns, 0, number_frames - 1),
+    )
+
+
+@lru_cache(maxsize=4)
+def colormap_lut(cmap: str = "magma") -> np.ndarray:
+    """
+    Returns the RGB uint8 lookup table (N, 3) of the matplotlib colormap, rounded as
+    the Agg backend does.
+    """
+    colormap = matplotlib.colormaps[cmap]
+    return (colormap(np.arange(colormap.N))[:, :3] * 255).round().astype(np.uint8)
+
+
+def render_spectrogram(
+    S_DB: np.ndarray,
+    sr: float,
+    n_fft: int,
+    fmin: float,
+    fmax: float,
+    width: int,
+    height: int,
+    dpi: int,
+    cmap: str = "magma",
+) -> np.ndarray:
+    """
+    Renders the dB spectrogram S_DB (bins, frames) as the RGB uint8 image that
+    `make_spectrogram2` draws with matplotlib and saves with a tight bbox: same axes,
+    cells and colormap, normalized between the min and max of S_DB. It is
+    (height, width, 3) for the defaults of build_features.py, see
+    `spectrogram_image_indices` for the other sizes.
+
+    No figure is created, so it is orders of magnitude faster and its memory does not
+    grow in long running workers.
+    """
+    rows, columns = spectrogram_image_indices(
+        sr=sr,
+        n_fft=n_fft,
+        number_frames=S_DB.shape[1],
+        fmin=fmin,
+        fmax=fmax,
+        width=width,
+        height=height,
+        dpi=dpi,
+    )
+    lut = colormap_lut(cmap)
+    vmin, vmax = S_DB.min(), S_DB.max()
+    pixels = S_DB[rows[:, None], columns[None, :]]
+    # Same quantization as matplotlib.colors.Colormap on the normalized values
+    normalized = (pixels - vmin) / (vmax - vmin) if vmax > vmin else pixels * 0.0
+    idxs = np.clip((normalized * len(lut)).astype(np.int64), 0, len(lut) - 1)
+    return lut[idxs]
+
+
+def make_spectrogram_image(
+    audio,
+    sr: float,
+    n_fft: int,
+    top_db: float,
+    fmin: float,
+    fmax: float,
+    dpi: int,
+    hop_length: int,
+    width: int,
+    height: int,
+) -> np.ndarray:
+    """
+    Array counterpart of `make_spectrogram2`: returns the RGB uint8 image of the
+    spectrogram of audio, see `render_spectrogram`.
+    """
+    D = librosa.stft(audio, n_fft=n_fft, hop_length=hop_length)
+    S_DB = librosa.amplitude_to_db(np.abs(D), ref=np.max, top_db=top_db)
+    return render_spectrogram(
+        S_DB,
+        sr=sr,
+        n_fft=n_fft,
+        fmin=fmin,
+        fmax=fmax,
+        width=width,
+        height=height,
+        dpi=dpi,
+    )
+
+
+def save_spectrogram_image(image: np.ndarray, filepath: Path) -> None:
+    """Saves the uint8 image of a spectrogram as a PNG."""
+    Image.fromarray(image).save(filepath)
+
+
 def select_rumbles_at(df: pd.DataFrame, offset: float, duration: float) -> pd.DataFrame:
     """Filters our rows in the dataframe `df` that are outside the offset and
     duration range.
@@ -2,54 +2,1009 @@
 Generates spectrograms using torchaudio.
 """
 
+import logging
 import math
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
 
 import cv2
 import numpy as np
+import scipy.fft
 import torch
+import torch.nn.functional as F
 import torchaudio
-import torchaudio.transforms as T
+
+from forest_elephants_rumble_detection.data.wav import WavReader, open_wav
+
+# Maximum difference (dB) to the torch backend, on the bins within 80 dB of the maximum,
+# for a backend to be selected by `fastest_stft_backend`
+STFT_PARITY_TOLERANCE_DB = 0.1
+
+# BLAS multiplies the matrices of fewer rows with other kernels, which round differently
+DFT_MIN_FRAMES = 16
+
+# Stopband attenuation (dB) of the anti-aliasing filter of the decimation, and
+# attenuation of the taps cut from the impulse response of the low-pass biquad
+DECIMATION_ATTENUATION_DB = 100.0
+
+
+def load_waveform(audio_filepath: Path) -> Tuple[torch.Tensor | WavReader, int]:
+    """
+    Returns a memory-mapped WavReader of the audio_filepath when it is a PCM WAV file,
+    its decoded waveform otherwise, and its sample rate. Both can be clipped with `clip`.
+    """
+    reader = open_wav(audio_filepath)
+    if reader is None:
+        return torchaudio.load(audio_filepath)
+    return reader, reader.sample_rate
 
 
 def clip(
-    waveform: torch.Tensor, offset: float, duration: float, sample_rate: int
+    waveform: torch.Tensor | WavReader,
+    offset: float,
+    duration: float,
+    sample_rate: int,
 ) -> torch.Tensor:
     """
     Returns a clipped waveform of `duration` seconds at `offset` in seconds.
+    When waveform is a WavReader, only the samples of the clip are read and converted.
     """
     offset_frames_start = int(offset * sample_rate)
-    offset_frames_end = offset_frames_start + int(duration * sample_rate)
+    num_frames = int(duration * sample_rate)
+    if isinstance(waveform, WavReader):
+        return torch.from_numpy(
+            waveform.read_float(frame_offset=offset_frames_start, num_frames=num_frames)
+        )
+    offset_frames_end = offset_frames_start + num_frames
     return waveform[:, offset_frames_start:offset_frames_end]
 
 
-def waveform_to_spectrogram(
-    waveform: torch.Tensor,
+def decimation_factor(
     sample_rate: int,
     n_fft: int,
     hop_length: int,
     freq_max: float,
+    min_sample_rate: Optional[float] = None,
+) -> int:
+    """
+    Returns the largest integer factor the waveform can be decimated by while keeping a
+    sampling rate of at least `min_sample_rate` (4 * freq_max by default) and while n_fft and
+    hop_length stay integers, ie. the time-frequency resolution of the spectrogram is kept.
+    """
+    min_sample_rate = min_sample_rate or 4 * freq_max
+    candidates = [
+        factor
+        for factor in range(1, hop_length + 1)
+        if n_fft % factor == 0
+        and hop_length % factor == 0
+        and sample_rate / factor >= min_sample_rate
+    ]
+    return max(candidates, default=1)
+
+
+def impulse_response(
+    a_coeffs: torch.Tensor, b_coeffs: torch.Tensor, attenuation_db: float
 ) -> torch.Tensor:
     """
-    Returns a spectrogram as a torch.Tensor given the provided arguments.
-    See torchaudio.transforms.Spectrogram for more details about the parameters.
+    Returns the impulse response of the IIR filter of coefficients a_coeffs and
+    b_coeffs, computed in float64 and truncated once the sum of the absolute values of
+    the taps left is attenuation_db below the one of all the taps.
+    """
+    tolerance = 10 ** (-attenuation_db / 20)
+    length = 64
+    while True:
+        impulse = torch.zeros(length, dtype=torch.float64)
+        impulse[0] = 1.0
+        response = torchaudio.functional.lfilter(
+            impulse,
+            a_coeffs=a_coeffs.to(torch.float64),
+            b_coeffs=b_coeffs.to(torch.float64),
+            clamp=False,
+        )
+        # Sum of the absolute values of the taps from each one
+        remaining = response.abs().flip(0).cumsum(0).flip(0)
+        if remaining[length // 2] < tolerance * remaining[0]:
+            return response[: int((remaining >= tolerance * remaining[0]).sum())]
+        length *= 2
+
+
+def antialiasing_filter(
+    sample_rate: int, factor: int, passband: float, attenuation_db: float
+) -> torch.Tensor:
+    """
+    Returns the taps, in float64 and of odd length, of the Kaiser windowed sinc filter
+    that keeps the frequencies below passband and attenuates by attenuation_db the
+    ones that fold back below passband once decimated by factor.
+    """
+    stopband = sample_rate / factor - passband
+    transition = 2 * math.pi * (stopband - passband) / sample_rate
+    width = math.ceil((attenuation_db - 8) / (2.285 * transition) / 2)
+    cutoff = (passband + stopband) / 2 / sample_rate
+    n = torch.arange(-width, width + 1, dtype=torch.float64)
+    window = torch.kaiser_window(
+        2 * width + 1,
+        periodic=False,
+        beta=0.1102 * (attenuation_db - 8.7),
+        dtype=torch.float64,
+    )
+    taps = 2 * cutoff * torch.sinc(2 * cutoff * n) * window
+    return taps / taps.sum()
+
+
+def max_frequency_bin(sample_rate: int, n_fft: int, freq_max: float) -> int:
+    """
+    Returns the number of frequency bins of a `n_fft` spectrogram that are kept below freq_max.
+    """
+    frequencies = torch.linspace(0, sample_rate // 2, n_fft // 2 + 1)
+    return int(torch.searchsorted(frequencies, freq_max).item())
+
+
+class SpectrogramEngine:
+    """
+    Generates the spectrograms and images of the waveforms sampled at sample_rate with
+    fixed parameters. Everything that only depends on the parameters is computed once:
+    the decimation factor, the Hann window, the low-pass biquad coefficients and the
+    number of frequency bins kept below freq_max.
+
+    The STFT is cropped to freq_max before the power and dB conversions, which are
+    elementwise, so only the kept bins are converted.
+
+    The STFT is computed by one of the STFT_BACKENDS, all framing the reflect-padded
+    waveforms like `torch.stft` does. With the dft stft_backend, only the kept bins are
+    computed: the frames are multiplied by the windowed DFT basis of the kept bins, a
+    (2 * max_freq_bin, n_fft) matrix. It needs about 4 * max_freq_bin / log2(n_fft) times
+    the operations of the FFT but runs as a single GEMM. With auto, the fastest backend
+    on this host is picked by `fastest_stft_backend`, see scripts/benchmark/stft.py.
+
+    Use `spectrogram_engine` to share the engines across calls.
 
     Args:
-      waveform (torch.Tensor): audio waveform of dimension of `(..., time)`
-      sample_rate (int): sampling rate of the waveform, e.g. 44100 (Hz)
+      sample_rate (int): sampling rate of the waveforms, e.g. 44100 (Hz)
       n_fft (int): Size of FFT
       hop_length (int): Length of hop between STFT windows.
       freq_max (float): cutoff frequency (Hz)
+      width (int): width of the generated images, only needed for the images
+      height (int): height of the generated images, only needed for the images
+      decimate_waveform (bool): downsample the waveforms to about 4 * freq_max while
+        filtering them and run the STFT on fewer samples, with n_fft and hop_length
+        rescaled to keep the same time-frequency resolution, see `decimate`.
+      stft_backend (str): torch, scipy, numpy, dft or auto, see STFT_BACKENDS.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        n_fft: int,
+        hop_length: int,
+        freq_max: float,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        decimate_waveform: bool = False,
+        stft_backend: str = "torch",
+    ):
+        assert (
+            stft_backend in STFT_BACKENDS or stft_backend == "auto"
+        ), f"stft_backend should be auto or in {list(STFT_BACKENDS.keys())}"
+        if stft_backend == "auto":
+            stft_backend = fastest_stft_backend(
+                sample_rate=sample_rate,
+                n_fft=n_fft,
+                hop_length=hop_length,
+                freq_max=freq_max,
+                decimate_waveform=decimate_waveform,
+            )
+        self.stft_backend = stft_backend
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.freq_max = freq_max
+        self.width = width
+        self.height = height
+        self.max_freq_bin = max_frequency_bin(
+            sample_rate=sample_rate, n_fft=n_fft, freq_max=freq_max
+        )
+        self.factor = 1
+        # Parameters of the STFT, after decimation
+        self.stft_sample_rate = sample_rate
+        self.stft_n_fft = n_fft
+        self.stft_hop_length = hop_length
+        if decimate_waveform:
+            self.factor = decimation_factor(
+                sample_rate=sample_rate,
+                n_fft=n_fft,
+                hop_length=hop_length,
+                freq_max=freq_max,
+            )
+            self.stft_sample_rate = sample_rate / self.factor
+            self.stft_n_fft = n_fft // self.factor
+            self.stft_hop_length = hop_length // self.factor
+        # Scaled by the decimation factor: the frames sum factor times fewer samples,
+        # hence a power factor ** 2 lower
+        self.window = torch.hann_window(self.stft_n_fft) * self.factor
+        self._biquad_coefficients: dict[torch.dtype, Tuple[torch.Tensor, ...]] = {}
+        self._dft_bases: dict[torch.dtype, torch.Tensor] = {}
+        self._decimation_kernels: dict[torch.dtype, Tuple[torch.Tensor, ...]] = {}
+        a_coeffs, b_coeffs = self.biquad_coefficients(torch.float64)
+        response = impulse_response(
+            a_coeffs, b_coeffs, attenuation_db=DECIMATION_ATTENUATION_DB
+        )
+        # Number of samples after which the biquad has forgotten its initial state
+        self.transient_samples = response.shape[0]
+        self.antialiasing_width = 0
+        if self.factor > 1:
+            # The kept bins and the main lobe of the Hann window of the last one
+            taps = antialiasing_filter(
+                sample_rate=sample_rate,
+                factor=self.factor,
+                passband=freq_max + 2 * sample_rate / n_fft,
+                attenuation_db=DECIMATION_ATTENUATION_DB,
+            )
+            self.antialiasing_width = taps.shape[0] // 2
+            kernel = torch.from_numpy(np.convolve(response.numpy(), taps.numpy()))
+            self._decimation_kernels[torch.float64] = (response, taps, kernel)
+
+    def biquad_coefficients(
+        self, dtype: torch.dtype = torch.float32
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Returns the denominator and numerator coefficients of the low-pass biquad in dtype,
+        computed like `torchaudio.functional.lowpass_biquad` does.
+        """
+        if dtype not in self._biquad_coefficients:
+            cutoff_freq = torch.as_tensor(self.freq_max, dtype=dtype)
+            Q = torch.as_tensor(0.707, dtype=dtype)
+            w0 = 2 * math.pi * cutoff_freq / self.sample_rate
+            alpha = torch.sin(w0) / 2 / Q
+            b0 = (1 - torch.cos(w0)) / 2
+            b1 = 1 - torch.cos(w0)
+            a0 = 1 + alpha
+            a1 = -2 * torch.cos(w0)
+            a2 = 1 - alpha
+            self._biquad_coefficients[dtype] = (
+                torch.stack([a0, a1, a2]),
+                torch.stack([b0, b1, b0]),
+            )
+        return self._biquad_coefficients[dtype]
+
+    def dft_basis(self, dtype: torch.dtype = torch.float32) -> torch.Tensor:
+        """
+        Returns the (2 * max_freq_bin, n_fft) matrix of the Hann windowed cosines and
+        sines of the kept bins, in dtype. Computed in float64, with the phases reduced
+        modulo n_fft, before being cast.
+        """
+        if dtype not in self._dft_bases:
+            n = torch.arange(self.stft_n_fft, dtype=torch.int64)
+            k = torch.arange(self.max_freq_bin, dtype=torch.int64)
+            phases = 2 * math.pi * (torch.outer(k, n) % self.stft_n_fft) / self.stft_n_fft
+            window = self.window.to(torch.float64)
+            basis = torch.cat([torch.cos(phases) * window, -torch.sin(phases) * window])
+            self._dft_bases[dtype] = basis.to(dtype)
+        return self._dft_bases[dtype]
+
+    def decimation_kernels(
+        self, dtype: torch.dtype = torch.float32
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Returns, in dtype, the truncated impulse response of the low-pass biquad, the
+        taps of the anti-aliasing filter and their convolution, used by `decimate`.
+        """
+        if dtype not in self._decimation_kernels:
+            self._decimation_kernels[dtype] = tuple(
+                kernel.to(dtype) for kernel in self._decimation_kernels[torch.float64]
+            )
+        return self._decimation_kernels[dtype]
+
+    def decimation_bounds(self, number_samples: int) -> Tuple[int, int, int]:
+        """
+        Returns the indices of the decimated samples of a waveform of number_samples
+        samples that are computed by the convolution of `decimate`: from the first one
+        whose anti-aliasing filter does not cover the start of the waveform to the first
+        one that covers its end, and the end of the right padding of the STFT frames.
+        """
+        width = self.antialiasing_width
+        number_frames = 1 + number_samples // self.hop_length
+        end = (number_frames - 1) * self.stft_hop_length + self.stft_n_fft // 2
+        first = min(-(-width // self.factor), end)
+        last = min(max((number_samples - 1 - width) // self.factor + 1, first), end)
+        return first, last, end
+
+    def decimated_samples(
+        self,
+        waveforms: torch.Tensor,
+        first: int,
+        last: int,
+        number_samples: int,
+        offset: int = 0,
+    ) -> torch.Tensor:
+        """
+        Returns the decimated samples first to last (excluded), negative in the left
+        padding, of a waveform of number_samples samples low-passed by the biquad and
+        reflected at both ends like the STFT frames are padded. They are computed from
+        the low-passed samples under their anti-aliasing filter, for the edges of
+        `decimate`. The (batch, time) waveforms hold the samples from offset, at least
+        the ones the low-passed samples depend on.
+        """
+        response, taps, _ = self.decimation_kernels(waveforms.dtype)
+        width = self.antialiasing_width
+        positions = self.factor * torch.arange(first, last)[:, None] + torch.arange(
+            -width, width + 1
+        )
+        positions = positions.abs()
+        last_position = number_samples - 1
+        positions = torch.where(
+            positions > last_position, 2 * last_position - positions, positions
+        )
+        assert (
+            positions.numel() == 0 or positions.min() >= 0
+        ), f"The waveform is too short to be decimated, {number_samples} samples"
+        if positions.numel() == 0:
+            return waveforms.new_zeros(waveforms.shape[0], 0)
+        low, high = positions.min().item(), positions.max().item()
+        start = low - (response.shape[0] - 1)
+        assert max(start, 0) >= offset, "Missing samples to decimate the edges"
+        inputs = waveforms[:, max(start, 0) - offset : high + 1 - offset]
+        inputs = F.pad(inputs, (max(-start, 0), 0))
+        filtered = F.conv1d(inputs[:, None], response.flip(0).view(1, 1, -1))[:, 0]
+        return filtered[:, positions - low] @ taps
+
+    def decimate(self, waveforms: torch.Tensor) -> torch.Tensor:
+        """
+        Returns the (batch, time) waveforms low-passed by the biquad and decimated by
+        factor, reflect-padded like the frames of `torch.stft` with center=True.
+
+        The biquad runs at the sampling rate of the waveforms, like in the baseline
+        implementation, and is followed by an anti-aliasing filter: as both are linear,
+        the decimated samples are computed by a single strided convolution with their
+        combined kernel, from the truncated impulse response of the biquad. The
+        samples close to the ends of the waveforms and the padding are computed from the
+        reflected low-passed samples instead, see `decimated_samples`.
+        """
+        number_samples = waveforms.shape[-1]
+        first, last, end = self.decimation_bounds(number_samples)
+        response, _, kernel = self.decimation_kernels(waveforms.dtype)
+        padding = self.antialiasing_width + response.shape[0] - 1
+        head = self.decimated_samples(
+            waveforms, -(self.stft_n_fft // 2), first, number_samples
+        )
+        tail = self.decimated_samples(waveforms, last, end, number_samples)
+        if last == first:
+            return torch.cat([head, tail], dim=-1)
+        padded = F.pad(waveforms, (padding, 0))
+        padded = padded[
+            :, first * self.factor : (last - 1) * self.factor + kernel.shape[0]
+        ]
+        interior = F.conv1d(
+            padded[:, None], kernel.flip(0).view(1, 1, -1), stride=self.factor
+        )[:, 0]
+        return torch.cat([head, interior, tail], dim=-1)
+
+    def edge_frames(self, number_samples: int) -> Tuple[int, int]:
+        """
+        Returns the number of leading frames of the spectrogram of a waveform of
+        number_samples samples that depend on its start, through the reflect padding,
+        the transient of the biquad and the anti-aliasing filter, and the index of the
+        first trailing frame that depends on its end. The frames in between are the
+        ones of any longer waveform containing it on the same frame grid, up to the
+        truncation of the impulse response of the biquad.
+        """
+        width = self.antialiasing_width
+        half = self.n_fft // 2
+        head = -(-(half + self.transient_samples + width) // self.hop_length)
+        tail = (number_samples - width - half) // self.hop_length + 1
+        return head, tail
+
+    def frames(self, waveforms: torch.Tensor, center: bool = True) -> torch.Tensor:
+        """
+        Returns a (batch, frames, n_fft) view of the STFT frames of the reflect-padded
+        (batch, time) waveforms, the ones of `torch.stft` with center=True, or of the
+        waveforms as is when center is False.
+        """
+        if center:
+            pad = self.stft_n_fft // 2
+            waveforms = F.pad(waveforms.unsqueeze(1), (pad, pad), mode="reflect")
+            waveforms = waveforms.squeeze(1)
+        return waveforms.unfold(-1, self.stft_n_fft, self.stft_hop_length)
+
+    def power_spectrogram(
+        self, waveforms: torch.Tensor, center: bool = True
+    ) -> torch.Tensor:
+        """
+        Returns the power spectrogram of the kept bins, of dimension
+        `(batch, max_freq_bin, frames)`, of the filtered and decimated `(batch, time)`
+        waveforms with the stft_backend. With center=False, the waveforms are not padded,
+        see `decimate` and `StreamingSpectrogram`.
+        """
+        return STFT_BACKENDS[self.stft_backend](self, waveforms, center)
+
+    def spectrogram(self, waveform: torch.Tensor) -> torch.Tensor:
+        """
+        Returns the dB spectrogram of the waveform of dimension `(..., time)`, cropped to
+        freq_max, of dimension `(..., max_freq_bin, frames)`.
+        """
+        shape = waveform.shape
+        waveforms = waveform.reshape(-1, shape[-1])
+        if self.factor > 1:
+            power = self.power_spectrogram(self.decimate(waveforms), center=False)
+        else:
+            a_coeffs, b_coeffs = self.biquad_coefficients(waveform.dtype)
+            filtered_waveforms = torchaudio.functional.lfilter(
+                waveforms, a_coeffs=a_coeffs, b_coeffs=b_coeffs
+            )
+            power = self.power_spectrogram(filtered_waveforms)
+        spectrogram = power.reshape(shape[:-1] + power.shape[-2:])
+        return torchaudio.functional.amplitude_to_DB(
+            spectrogram, multiplier=10.0, amin=1e-10, db_multiplier=0.0
+        )
+
+    def spectrogram_to_np_image(self, spectrogram: torch.Tensor) -> np.ndarray:
+        """
+        Returns the numpy image of shape (height, width) of a spectrogram of dimension
+        `(channel, freq, time)`, see `spectrogram_tensor_to_np_image`.
+        """
+        return spectrogram_tensor_to_np_image(
+            spectrogram=spectrogram, width=self.width, height=self.height
+        )
+
+    def np_image(self, waveform: torch.Tensor) -> np.ndarray:
+        """
+        Returns the numpy image of shape (height, width) of the spectrogram of the
+        waveform of dimension `(channel, time)`.
+        """
+        return self.spectrogram_to_np_image(self.spectrogram(waveform))
+
+    def uint8_images(self, waveforms: torch.Tensor) -> torch.Tensor:
+        """
+        Batched version of `np_image`: returns the single-channel uint8 images of shape
+        (batch, height, width) of the `(batch, time)` waveforms, the compact form the
+        spectrograms are kept in until the model input, see `predict_tensor`.
+
+        Filtering, STFT, dB conversion, bin cropping, per-window min/max normalization,
+        resize and flip all run as vectorized tensor ops over the batch.
+        """
+        spectrograms = self.spectrogram(waveforms)
+        _min = spectrograms.amin(dim=(1, 2), keepdim=True)
+        _max = spectrograms.amax(dim=(1, 2), keepdim=True)
+        # Same quantization as the uint8 conversion done in `normalize`
+        normalized = torch.floor(255 * (spectrograms - _min) / (_max - _min))
+        resized = F.interpolate(
+            normalized.unsqueeze(1),
+            size=(self.height, self.width),
+            mode="bilinear",
+            align_corners=False,
+        )
+        # Flip to show the low frequency range at the bottom of the image
+        return torch.flip(resized[:, 0].round(), dims=[1]).to(torch.uint8)
+
+    def images(self, waveforms: torch.Tensor, channels: int = 3) -> torch.Tensor:
+        """
+        Returns the images of `uint8_images` as a contiguous float tensor of shape
+        (batch, channels, height, width) with values in [0, 1], ready to be fed to YOLO.
+        """
+        images = self.uint8_images(waveforms).unsqueeze(1) / 255
+        return images.expand(-1, channels, -1, -1).contiguous()
+
+
+def torch_stft_power(
+    engine: SpectrogramEngine, waveforms: torch.Tensor, center: bool = True
+) -> torch.Tensor:
+    """Returns the power of the kept bins of the (batch, time) waveforms with torch.stft."""
+    stft = torch.stft(
+        waveforms,
+        n_fft=engine.stft_n_fft,
+        hop_length=engine.stft_hop_length,
+        window=engine.window.to(waveforms.dtype),
+        center=center,
+        pad_mode="reflect",
+        normalized=False,
+        onesided=True,
+        return_complex=True,
+    )
+    return stft[:, : engine.max_freq_bin, :].abs().pow(2.0)
+
+
+def scipy_stft_power(
+    engine: SpectrogramEngine, waveforms: torch.Tensor, center: bool = True
+) -> torch.Tensor:
+    """
+    Returns the power of the kept bins of the (batch, time) waveforms with scipy.fft,
+    using as many workers as torch threads.
+    """
+    frames = engine.frames(waveforms, center=center).numpy() * engine.window.numpy()
+    spectrum = scipy.fft.rfft(frames, axis=-1, workers=torch.get_num_threads())
+    power = np.abs(spectrum[..., : engine.max_freq_bin]) ** 2
+    return torch.from_numpy(power.astype(np.float32)).transpose(1, 2)
+
+
+def numpy_stft_power(
+    engine: SpectrogramEngine, waveforms: torch.Tensor, center: bool = True
+) -> torch.Tensor:
+    """
+    Returns the power of the kept bins of the (batch, time) waveforms with numpy.fft,
+    which computes in float64.
+    """
+    frames = engine.frames(waveforms, center=center).numpy() * engine.window.numpy()
+    spectrum = np.fft.rfft(frames, axis=-1)
+    power = np.abs(spectrum[..., : engine.max_freq_bin]) ** 2
+    return torch.from_numpy(power.astype(np.float32)).transpose(1, 2)
+
+
+def dft_stft_power(
+    engine: SpectrogramEngine, waveforms: torch.Tensor, center: bool = True
+) -> torch.Tensor:
+    """
+    Returns the power of the kept bins of the (batch, time) waveforms as a matrix
+    product of their frames with the DFT basis of the kept bins.
+    """
+    frames = engine.frames(waveforms, center=center)
+    number_frames = frames.shape[-2]
+    # Padded with silent frames so that each frame gets the same coefficients whatever
+    # the number of frames, eg. in the blocks of a StreamingSpectrogram
+    if number_frames < DFT_MIN_FRAMES:
+        frames = F.pad(frames, (0, 0, 0, DFT_MIN_FRAMES - number_frames))
+    coefficients = torch.matmul(frames, engine.dft_basis(waveforms.dtype).T)
+    coefficients = coefficients[:, :number_frames]
+    real = coefficients[..., : engine.max_freq_bin]
+    imag = coefficients[..., engine.max_freq_bin :]
+    return (real.square() + imag.square()).transpose(1, 2)
+
+
+# STFT backend name -> function returning the power of the kept bins of the waveforms,
+# framed with or without padding
+STFT_BACKENDS: dict[
+    str, Callable[[SpectrogramEngine, torch.Tensor, bool], torch.Tensor]
+] = {
+    "torch": torch_stft_power,
+    "scipy": scipy_stft_power,
+    "numpy": numpy_stft_power,
+    "dft": dft_stft_power,
+}
+
+
+def spectrogram_parity(
+    reference_db: torch.Tensor, candidate_db: torch.Tensor, top_db: float = 80.0
+) -> float:
+    """
+    Returns the maximum absolute difference between two dB spectrograms, on the bins of
+    the reference within top_db of its maximum. The quieter bins are dominated by the
+    rounding errors of each implementation.
+    """
+    mask = reference_db >= reference_db.max() - top_db
+    return (reference_db - candidate_db)[mask].abs().max().item()
+
+
+def stft_parity(
+    reference: torch.Tensor, candidate: torch.Tensor, top_db: float = 80.0
+) -> float:
+    """
+    Returns the maximum absolute difference in dB between two power spectrograms, see
+    `spectrogram_parity`.
+    """
+    reference_db = 10.0 * torch.log10(torch.clamp(reference, min=1e-10))
+    candidate_db = 10.0 * torch.log10(torch.clamp(candidate, min=1e-10))
+    return spectrogram_parity(reference_db, candidate_db, top_db=top_db)
+
+
+@lru_cache(maxsize=16)
+def fastest_stft_backend(
+    sample_rate: int,
+    n_fft: int,
+    hop_length: int,
+    freq_max: float,
+    decimate_waveform: bool = False,
+    number_frames: int = 256,
+    number_repeats: int = 3,
+) -> str:
+    """
+    Returns the fastest STFT backend on this host for the parameters, among the ones
+    within STFT_PARITY_TOLERANCE_DB of the torch backend. Each backend is timed on
+    number_frames frames of noise, best of number_repeats, once per process.
+    """
+    engines = {
+        stft_backend: spectrogram_engine(
+            sample_rate=sample_rate,
+            n_fft=n_fft,
+            hop_length=hop_length,
+            freq_max=freq_max,
+            decimate_waveform=decimate_waveform,
+            stft_backend=stft_backend,
+        )
+        for stft_backend in STFT_BACKENDS
+    }
+    reference = engines["torch"]
+    generator = torch.Generator().manual_seed(0)
+    waveforms = torch.randn(
+        1, reference.stft_hop_length * (number_frames - 1), generator=generator
+    )
+    reference_power = reference.power_spectrogram(waveforms)
+    timings = {}
+    for stft_backend, engine in engines.items():
+        power = engine.power_spectrogram(waveforms)
+        difference_db = stft_parity(reference_power, power)
+        if difference_db > STFT_PARITY_TOLERANCE_DB:
+            logging.warning(
+                f"Skipping the {stft_backend} STFT backend, {difference_db:.3f}dB away from torch"
+            )
+            continue
+        elapsed_times = []
+        for _ in range(number_repeats):
+            start_time = time.perf_counter()
+            engine.power_spectrogram(waveforms)
+            elapsed_times.append(time.perf_counter() - start_time)
+        timings[stft_backend] = min(elapsed_times)
+    fastest = min(timings, key=timings.get)
+    logging.info(
+        f"Selected the {fastest} STFT backend: "
+        + ", ".join(f"{k} {v * 1000:.2f}ms" for k, v in timings.items())
+    )
+    return fastest
+
+
+@lru_cache(maxsize=16)
+def spectrogram_engine(
+    sample_rate: int,
+    n_fft: int,
+    hop_length: int,
+    freq_max: float,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    decimate_waveform: bool = False,
+    stft_backend: str = "torch",
+) -> SpectrogramEngine:
+    """
+    Returns the SpectrogramEngine of the parameters, created on the first call and
+    shared by the next ones.
+    """
+    return SpectrogramEngine(
+        sample_rate=sample_rate,
+        n_fft=n_fft,
+        hop_length=hop_length,
+        freq_max=freq_max,
+        width=width,
+        height=height,
+        decimate_waveform=decimate_waveform,
+        stft_backend=stft_backend,
+    )
+
+
+# Maximum difference (dB) between the frames of a `StreamingSpectrogram` and the ones
+# of the whole signal computed at once, on the bins within STREAMING_TOP_DB of their
+# maximum. Both are within float32 rounding of the float64 spectrogram, which grows on
+# the quieter bins, eg. up to 0.2 dB 70 dB below the maximum at 44.1 kHz
+STREAMING_TOLERANCE_DB = 0.1
+STREAMING_TOP_DB = 60.0
+
+
+class StreamingSpectrogram:
+    """
+    Stateful version of `SpectrogramEngine.spectrogram` for a stream of samples pushed in
+    blocks of any size, eg. read sequentially from a long recording or from a live input.
+    `push` returns the dB frames completed by each block and `flush` the last ones once
+    the stream ends. Concatenated along time, they match the spectrogram of the
+    concatenated blocks computed at once, without seams at the block boundaries.
+
+    Between two blocks, it keeps:
+      when the engine decimates, the input samples still under the kernel of
+        `SpectrogramEngine.decimate` and the last ones the decimated samples at the end
+        of the stream depend on, the start being decimated once enough samples are in;
+      otherwise, the last inputs and outputs of the low-pass biquad, ie. its filter
+        state, and the last n_fft // 2 + 1 filtered samples, reflected to pad the end of
+        the stream;
+      the filtered samples of the STFT frames that are not complete yet.
+    Its memory does not depend on the length of the stream.
+
+    The first samples of a decimated stream are held back until its start can be
+    decimated, a shorter stream is computed at once on flush.
+
+    The blocks are filtered with `F.conv1d` and `torchaudio.functional.lfilter`, which
+    sum in another order than on the whole signal, eg. `F.conv1d` runs long float32
+    signals on oneDNN and short ones on a native kernel. The frames are within float32
+    rounding of the one-shot spectrogram: STREAMING_TOLERANCE_DB on the bins within
+    STREAMING_TOP_DB of its maximum, see `spectrogram_parity`.
+
+    Args:
+      engine (SpectrogramEngine): parameters of the spectrogram, see `spectrogram_engine`
+    """
+
+    def __init__(self, engine: SpectrogramEngine):
+        self.engine = engine
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets the state to start a new stream."""
+        # Number of samples pushed and of frames returned
+        self.number_samples = 0
+        self.number_frames = 0
+        self.closed = False
+        self._shape: Optional[torch.Size] = None
+        self._dtype: Optional[torch.dtype] = None
+        self._decimation_buffer: Optional[torch.Tensor] = None
+        self._number_decimated = 0
+        self._history: Optional[torch.Tensor] = None
+        self._filter_inputs: Optional[torch.Tensor] = None
+        self._filter_outputs: Optional[torch.Tensor] = None
+        self._frame_buffer: Optional[torch.Tensor] = None
+        self._tail: Optional[torch.Tensor] = None
+        self._padded = False
+        self._held: Optional[torch.Tensor] = None
+
+    def _holds(self, waveforms: torch.Tensor) -> bool:
+        """
+        Returns whether the (batch, time) waveforms, the first samples of the stream,
+        are too short to decimate the start of the stream.
+        """
+        engine = self.engine
+        if engine.factor == 1:
+            return False
+        width = engine.antialiasing_width
+        first = -(-width // engine.factor)
+        # The samples that the left padding and the first decimated samples depend on
+        return (
+            waveforms.shape[-1]
+            <= max(engine.n_fft // 2, engine.factor * first) + width
+        )
+
+    def _decimation_kernel(self, dtype: torch.dtype) -> Tuple[int, torch.Tensor]:
+        """
+        Returns the number of zeros the waveforms are padded with before the convolution
+        of `SpectrogramEngine.decimate` and its F.conv1d weight, in dtype.
+        """
+        response, _, kernel = self.engine.decimation_kernels(dtype)
+        padding = self.engine.antialiasing_width + response.shape[0] - 1
+        return padding, kernel.flip(0).view(1, 1, -1)
+
+    def _decimate(self, waveforms: torch.Tensor, final: bool) -> torch.Tensor:
+        """
+        Returns the decimated samples of the (batch, time) waveforms that the kernel of
+        `SpectrogramEngine.decimate` has fully covered, preceded by the left padding at
+        the start of the stream, and followed by the last ones and the right padding
+        when final.
+        """
+        engine = self.engine
+        factor = engine.factor
+        padding, kernel = self._decimation_kernel(waveforms.dtype)
+        # The last decimated samples depend on the low-passed samples reflected in the
+        # right padding and under the anti-aliasing filter, and on their inputs
+        history_size = engine.n_fft // 2 + engine.antialiasing_width + padding + 2
+        decimated = []
+        if self._decimation_buffer is None:
+            first, _, _ = engine.decimation_bounds(self.number_samples)
+            decimated.append(
+                engine.decimated_samples(
+                    waveforms, -(engine.stft_n_fft // 2), first, self.number_samples
+                )
+            )
+            padded = F.pad(waveforms, (padding, 0))
+            self._decimation_buffer = padded[:, first * factor :]
+            self._number_decimated = first
+            self._history = waveforms[:, :0]
+        else:
+            self._decimation_buffer = torch.cat(
+                [self._decimation_buffer, waveforms], dim=-1
+            )
+        self._history = torch.cat([self._history, waveforms], dim=-1)[
+            :, -history_size:
+        ]
+        buffer = self._decimation_buffer
+        kernel_size = kernel.shape[-1]
+        number_outputs = max((buffer.shape[-1] - kernel_size) // factor + 1, 0)
+        if number_outputs > 0:
+            end = (number_outputs - 1) * factor + kernel_size
+            decimated.append(
+                F.conv1d(buffer[:, None, :end], kernel, stride=factor)[:, 0]
+            )
+        self._decimation_buffer = buffer[:, number_outputs * factor :]
+        self._number_decimated += number_outputs
+        if final:
+            _, last, end = engine.decimation_bounds(self.number_samples)
+            assert (
+                self._number_decimated == last
+            ), "n_fft should be at least twice hop_length to stream decimated waveforms"
+            decimated.append(
+                engine.decimated_samples(
+                    self._history,
+                    last,
+                    end,
+                    self.number_samples,
+                    offset=self.number_samples - self._history.shape[-1],
+                )
+            )
+        if not decimated:
+            return waveforms[:, :0]
+        return torch.cat(decimated, dim=-1)
+
+    def _filter(self, waveforms: torch.Tensor) -> torch.Tensor:
+        """
+        Returns the (batch, time) waveforms low-passed by the biquad, starting from the
+        filter state left by the previous samples, its last inputs and outputs.
+
+        Normalized by a0, the biquad is y[n] = w[n] - a1 y[n - 1] - a2 y[n - 2] with w
+        the numerator convolved with the inputs. w is computed on the inputs preceded by
+        the last ones, the terms of the last outputs are added to its first samples and
+        the recursion is run by `torchaudio.functional.lfilter` with a unit numerator.
+        """
+        a_coeffs, b_coeffs = self.engine.biquad_coefficients(waveforms.dtype)
+        n_order = a_coeffs.shape[0]
+        if self._filter_inputs is None:
+            zeros = waveforms.new_zeros(waveforms.shape[0], n_order - 1)
+            self._filter_inputs, self._filter_outputs = zeros, zeros
+        number_samples = waveforms.shape[-1]
+        if number_samples == 0:
+            return waveforms
+        padded = torch.cat([self._filter_inputs, waveforms], dim=-1)
+        b_coeffs_flipped = (b_coeffs / a_coeffs[:1]).flip(0).view(1, 1, -1)
+        windows = F.conv1d(padded[:, None], b_coeffs_flipped)[:, 0]
+        a_coeffs_normalized = a_coeffs / a_coeffs[0]
+        # Oldest first, the last output is self._filter_outputs[:, -1]
+        for n in range(min(n_order - 1, number_samples)):
+            for k in range(n + 1, n_order):
+                windows[:, n] -= a_coeffs_normalized[k] * self._filter_outputs[:, n - k]
+        unit_b_coeffs = torch.zeros_like(a_coeffs)
+        unit_b_coeffs[0] = a_coeffs[0]
+        outputs = torchaudio.functional.lfilter(
+            windows, a_coeffs=a_coeffs, b_coeffs=unit_b_coeffs, clamp=False
+        )
+        self._filter_inputs = padded[:, -(n_order - 1) :]
+        # The state is the unclamped outputs, the clamp is only applied to the result
+        self._filter_outputs = torch.cat([self._filter_outputs, outputs], dim=-1)[
+            :, -(n_order - 1) :
+        ]
+        return torch.clamp(outputs, min=-1.0, max=1.0)
+
+    def _power(self, filtered: torch.Tensor, final: bool) -> torch.Tensor:
+        """
+        Returns the power of the STFT frames of the filtered (batch, time) samples that
+        are complete, all the remaining ones when final, reflect-padded at both ends of
+        the stream like `torch.stft` with center=True, unless already decimated.
+        """
+        n_fft = self.engine.stft_n_fft
+        hop_length = self.engine.stft_hop_length
+        pad = n_fft // 2
+        if self._frame_buffer is None:
+            self._frame_buffer = filtered[:, :0]
+            self._tail = filtered[:, :0]
+            # The decimated samples are already padded, see `SpectrogramEngine.decimate`
+            self._padded = self.engine.factor > 1
+        buffer = torch.cat([self._frame_buffer, filtered], dim=-1)
+        if self.engine.factor == 1:
+            self._tail = torch.cat([self._tail, filtered], dim=-1)[:, -(pad + 1) :]
+        if not self._padded:
+            if final:
+                # The whole stream is in the buffer
+                self._frame_buffer = buffer[:, :0]
+                return self.engine.power_spectrogram(buffer)
+            if buffer.shape[-1] <= pad:
+                self._frame_buffer = buffer
+                return buffer.new_zeros(buffer.shape[0], self.engine.max_freq_bin, 0)
+            buffer = torch.cat([buffer[:, 1 : pad + 1].flip(-1), buffer], dim=-1)
+            self._padded = True
+        if final and self.engine.factor == 1:
+            right_padding = self._tail[:, -(pad + 1) : -1].flip(-1)
+            buffer = torch.cat([buffer, right_padding], dim=-1)
+        number_frames = max((buffer.shape[-1] - n_fft) // hop_length + 1, 0)
+        self._frame_buffer = buffer[:, number_frames * hop_length :]
+        if number_frames == 0:
+            return buffer.new_zeros(buffer.shape[0], self.engine.max_freq_bin, 0)
+        end = (number_frames - 1) * hop_length + n_fft
+        return self.engine.power_spectrogram(buffer[:, :end], center=False)
+
+    def _spectrogram(self, block: torch.Tensor, final: bool) -> torch.Tensor:
+        """Returns the dB frames completed by the block, see `push` and `flush`."""
+        assert not self.closed, "The stream is closed, reset it to start a new one"
+        if self._shape is None:
+            self._shape, self._dtype = block.shape[:-1], block.dtype
+        assert (
+            block.shape[:-1] == self._shape
+        ), f"Expected blocks of dimension (*{tuple(self._shape)}, time)"
+        waveforms = block.reshape(math.prod(self._shape), block.shape[-1])
+        self.number_samples += waveforms.shape[-1]
+        if self.number_samples == waveforms.shape[-1] or self._held is not None:
+            if self._held is not None:
+                waveforms = torch.cat([self._held, waveforms], dim=-1)
+                self._held = None
+            if self._holds(waveforms):
+                if not final:
+                    self._held = waveforms
+                    return torch.zeros(
+                        self._shape + (self.engine.max_freq_bin, 0), dtype=block.dtype
+                    )
+                # The whole stream was held back
+                self.closed = True
+                spectrogram = self.engine.spectrogram(
+                    waveforms.reshape(self._shape + waveforms.shape[-1:])
+                )
+                self.number_frames += spectrogram.shape[-1]
+                return spectrogram
+        if self.engine.factor > 1:
+            filtered = self._decimate(waveforms, final=final)
+        else:
+            filtered = self._filter(waveforms)
+        power = self._power(filtered, final=final)
+        self.number_frames += power.shape[-1]
+        self.closed = final
+        spectrogram = power.reshape(self._shape + power.shape[-2:])
+        return torchaudio.functional.amplitude_to_DB(
+            spectrogram, multiplier=10.0, amin=1e-10, db_multiplier=0.0
+        )
+
+    def push(self, block: torch.Tensor) -> torch.Tensor:
+        """
+        Returns the dB frames completed by the next samples of the stream, a block of
+        dimension `(..., time)`, as a spectrogram of dimension
+        `(..., max_freq_bin, frames)` with possibly no frames.
+        """
+        return self._spectrogram(block, final=False)
+
+    def flush(self) -> torch.Tensor:
+        """
+        Returns the last dB frames of the stream, padded at its end, and closes it.
+        """
+        assert self._shape is not None, "No samples were pushed"
+        return self._spectrogram(
+            torch.zeros(self._shape + (0,), dtype=self._dtype), final=True
+        )
+
+
+def baseline_spectrogram(
+    waveform: torch.Tensor,
+    sample_rate: int,
+    n_fft: int,
+    hop_length: int,
+    freq_max: float,
+) -> torch.Tensor:
+    """
+    Returns the dB spectrogram of the waveform computed like the baseline implementation
+    of `waveform_to_spectrogram`, the one the models were trained on. Slower, it is the
+    reference of the parity checks of the decimation and of the STFT backends.
     """
     filtered_waveform = torchaudio.functional.lowpass_biquad(
         waveform=waveform, sample_rate=sample_rate, cutoff_freq=freq_max
     )
-    transform = T.Spectrogram(n_fft=n_fft, hop_length=hop_length, power=2)
+    transform = torchaudio.transforms.Spectrogram(
+        n_fft=n_fft, hop_length=hop_length, power=2
+    )
     spectrogram = transform(filtered_waveform)
     spectrogram_db = torchaudio.transforms.AmplitudeToDB()(spectrogram)
     frequencies = torch.linspace(0, sample_rate // 2, spectrogram_db.size(1))
     max_freq_bin = torch.searchsorted(frequencies, freq_max).item()
-    filtered_spectrogram_db = spectrogram_db[:, :max_freq_bin, :]
-    return filtered_spectrogram_db
+    return spectrogram_db[:, :max_freq_bin, :]
+
+
+def waveform_to_spectrogram(
+    waveform: torch.Tensor,
+    sample_rate: int,
+    n_fft: int,
+    hop_length: int,
+    freq_max: float,
+    decimate_waveform: bool = False,
+    stft_backend: str = "torch",
+) -> torch.Tensor:
+    """
+    Returns a spectrogram as a torch.Tensor given the provided arguments.
+    See torchaudio.transforms.Spectrogram for more details about the parameters.
+
+    Args:
+      waveform (torch.Tensor): audio waveform of dimension of `(..., time)`
+      sample_rate (int): sampling rate of the waveform, e.g. 44100 (Hz)
+      n_fft (int): Size of FFT
+      hop_length (int): Length of hop between STFT windows.
+      freq_max (float): cutoff frequency (Hz)
+      decimate_waveform (bool): downsample the waveform to about 4 * freq_max while
+        filtering it and run the STFT on fewer samples, with n_fft and hop_length
+        rescaled to keep the same time-frequency resolution, see
+        `SpectrogramEngine.decimate`.
+      stft_backend (str): torch, scipy, numpy, dft or auto, see `SpectrogramEngine`
+    """
+    engine = spectrogram_engine(
+        sample_rate=sample_rate,
+        n_fft=n_fft,
+        hop_length=hop_length,
+        freq_max=freq_max,
+        decimate_waveform=decimate_waveform,
+        stft_backend=stft_backend,
+    )
+    return engine.spectrogram(waveform)
 
 
 def normalize(x: np.ndarray, max_value: int = 255) -> np.ndarray:
@@ -87,6 +1042,8 @@ def waveform_to_np_image(
     freq_max: float,
     width: int,
     height: int,
+    decimate_waveform: bool = False,
+    stft_backend: str = "torch",
 ) -> np.ndarray:
     """
     Returns a numpy image of shape (height, width) that represents the waveform tensor as an image of its spectrogram.
@@ -100,19 +1057,231 @@ def waveform_to_np_image(
       freq_max (float): cutoff frequency (Hz)
       width (int): width of the generated image
       height (int): height of the generated image
+      decimate_waveform (bool): downsample the waveform before running the STFT, see `waveform_to_spectrogram`
+      stft_backend (str): torch, scipy, numpy, dft or auto, see `SpectrogramEngine`
     """
-    spectrogram = waveform_to_spectrogram(
-        waveform=waveform,
+    engine = spectrogram_engine(
         sample_rate=sample_rate,
         n_fft=n_fft,
         hop_length=hop_length,
         freq_max=freq_max,
+        width=width,
+        height=height,
+        decimate_waveform=decimate_waveform,
+        stft_backend=stft_backend,
     )
-    return spectrogram_tensor_to_np_image(
-        spectrogram=spectrogram,
+    return engine.np_image(waveform)
+
+
+def waveforms_to_images(
+    waveforms: torch.Tensor,
+    sample_rate: int,
+    n_fft: int,
+    hop_length: int,
+    freq_max: float,
+    width: int,
+    height: int,
+    channels: Optional[int] = 3,
+    decimate_waveform: bool = False,
+    stft_backend: str = "torch",
+) -> torch.Tensor:
+    """
+    Batched version of `waveform_to_np_image`: returns a contiguous float tensor of shape
+    (batch, channels, height, width) with values in [0, 1], ready to be fed to YOLO, or
+    the single-channel uint8 images of shape (batch, height, width) when channels is None.
+    See `SpectrogramEngine.images` and `SpectrogramEngine.uint8_images`.
+
+    Args:
+      waveforms (torch.Tensor): stack of audio waveforms of dimension of `(batch, time)`
+      sample_rate (int): sampling rate of the waveforms, e.g. 44100 (Hz)
+      n_fft (int): Size of FFT
+      hop_length (int): Length of hop between STFT windows.
+      freq_max (float): cutoff frequency (Hz)
+      width (int): width of the generated images
+      height (int): height of the generated images
+      channels (int): number of channels of the generated images, 1 or 3, None for uint8
+      decimate_waveform (bool): downsample the waveforms before running the STFT, see `waveform_to_spectrogram`
+      stft_backend (str): torch, scipy, numpy, dft or auto, see `SpectrogramEngine`
+    """
+    engine = spectrogram_engine(
+        sample_rate=sample_rate,
+        n_fft=n_fft,
+        hop_length=hop_length,
+        freq_max=freq_max,
+        width=width,
+        height=height,
+        decimate_waveform=decimate_waveform,
+        stft_backend=stft_backend,
+    )
+    if channels is None:
+        return engine.uint8_images(waveforms)
+    return engine.images(waveforms, channels=channels)
+
+
+def stack_waveforms_to_images(
+    waveforms: list[torch.Tensor],
+    sample_rate: int,
+    n_fft: int,
+    hop_length: int,
+    freq_max: float,
+    width: int,
+    height: int,
+    channels: Optional[int] = 3,
+    decimate_waveform: bool = False,
+    stft_backend: str = "torch",
+) -> torch.Tensor:
+    """
+    Returns the images of shape (batch, channels, height, width), or (batch, height, width)
+    uint8 images when channels is None, of a list of `(channel, time)`
+    waveforms such as the ones returned by `chunk`, using the first channel of each waveform.
+    Consecutive waveforms of the same length are stacked and processed by `waveforms_to_images`
+    in one call, shorter trailing clips are processed on their own.
+    """
+    images = []
+    start = 0
+    while start < len(waveforms):
+        end = start + 1
+        while end < len(waveforms) and waveforms[end].shape == waveforms[start].shape:
+            end += 1
+        images.append(
+            waveforms_to_images(
+                waveforms=torch.stack([y[0] for y in waveforms[start:end]]),
+                sample_rate=sample_rate,
+                n_fft=n_fft,
+                hop_length=hop_length,
+                freq_max=freq_max,
+                width=width,
+                height=height,
+                channels=channels,
+                decimate_waveform=decimate_waveform,
+                stft_backend=stft_backend,
+            )
+        )
+        start = end
+    return torch.cat(images)
+
+
+def images_to_np_images(images: torch.Tensor) -> list[np.ndarray]:
+    """
+    Returns the list of uint8 numpy images of shape (height, width) of a batch of images
+    generated by `waveforms_to_images`, either (B, C, H, W) floats or (B, H, W) uint8.
+    """
+    if images.dtype == torch.uint8:
+        return list(images.cpu().numpy())
+    arrays = (images[:, 0] * 255).round().to(torch.uint8).numpy()
+    return list(arrays)
+
+
+def sliced_spectrograms(
+    engine: SpectrogramEngine,
+    waveform: torch.Tensor,
+    starts: list[int],
+    window_num_samples: int,
+) -> Iterator[torch.Tensor]:
+    """
+    Yields the dB spectrograms of the clips of window_num_samples samples at starts of
+    the `(channel, time)` waveform, the same as `SpectrogramEngine.spectrogram` on each
+    clip. The starts are sorted and a multiple of hop_length apart, so that the frames
+    of the clips are on the frame grid of one spectrogram of the samples they cover.
+
+    The frames away from the ends of each clip are sliced out of that spectrogram, the
+    edge frames, see `SpectrogramEngine.edge_frames`, are computed from the start and
+    the end of the clip.
+    """
+    hop_length = engine.hop_length
+    end = min(starts[-1] + window_num_samples, waveform.shape[-1])
+    spectrogram = None
+    if len(starts) > 1:
+        spectrogram = engine.spectrogram(waveform[:, starts[0] : end])
+    for start in starts:
+        clip_waveform = waveform[:, start : start + window_num_samples]
+        head, tail = engine.edge_frames(clip_waveform.shape[-1])
+        if spectrogram is None or head >= tail:
+            yield engine.spectrogram(clip_waveform)
+            continue
+        head_num_samples = (
+            head * hop_length + engine.n_fft // 2 + engine.antialiasing_width
+        )
+        frame_start = (start - starts[0]) // hop_length
+        yield torch.cat(
+            [
+                engine.spectrogram(clip_waveform[:, :head_num_samples])[..., :head],
+                spectrogram[..., frame_start + head : frame_start + tail],
+                engine.spectrogram(
+                    clip_waveform[:, (tail - head) * hop_length :]
+                )[..., head:],
+            ],
+            dim=-1,
+        )
+
+
+def sliced_waveform_to_np_images(
+    waveform: torch.Tensor,
+    sample_rate: int,
+    offsets: list[float],
+    duration: float,
+    n_fft: int,
+    hop_length: int,
+    freq_max: float,
+    width: int,
+    height: int,
+    block_size: Optional[int] = None,
+    decimate_waveform: bool = False,
+    stft_backend: str = "torch",
+) -> Iterator[np.ndarray]:
+    """
+    Yields numpy images of shape (height, width), one per offset, like `waveform_to_np_image` would
+    on each clip. Within a block of `block_size` consecutive windows (the whole waveform when None),
+    the consecutive windows starting a multiple of hop_length samples apart share the low-passed dB
+    spectrogram of the samples they cover, computed once, see `sliced_spectrograms`. The other windows
+    are computed on their own, so use offsets on multiples of hop_length / sample_rate seconds, ie.
+    a `duration - overlap` multiple of it, to filter and FFT the overlapping audio only once.
+
+    Args:
+      waveform (torch.Tensor): audio waveform of dimension of `(channel, time)`
+      sample_rate (int): sampling rate of the waveform, e.g. 44100 (Hz)
+      offsets (list[float]): sorted offsets in seconds of the windows
+      duration (float): time in seconds of each window
+      n_fft (int): Size of FFT
+      hop_length (int): Length of hop between STFT windows.
+      freq_max (float): cutoff frequency (Hz)
+      width (int): width of the generated images
+      height (int): height of the generated images
+      block_size (int): number of windows sharing one spectrogram computation.
+      decimate_waveform (bool): downsample the waveform before running the STFT, see `waveform_to_spectrogram`
+      stft_backend (str): torch, scipy, numpy, dft or auto, see `SpectrogramEngine`
+    """
+    engine = spectrogram_engine(
+        sample_rate=sample_rate,
+        n_fft=n_fft,
+        hop_length=hop_length,
+        freq_max=freq_max,
         width=width,
         height=height,
+        decimate_waveform=decimate_waveform,
+        stft_backend=stft_backend,
     )
+    window_num_samples = int(duration * sample_rate)
+    starts = [int(offset * sample_rate) for offset in offsets]
+    block_size = block_size or max(len(starts), 1)
+    for i in range(0, len(starts), block_size):
+        block_starts = starts[i : i + block_size]
+        run_start = 0
+        while run_start < len(block_starts):
+            run_end = run_start + 1
+            while (
+                run_end < len(block_starts)
+                and (block_starts[run_end] - block_starts[run_start]) % hop_length == 0
+            ):
+                run_end += 1
+            for spectrogram in sliced_spectrograms(
+                engine=engine,
+                waveform=waveform,
+                starts=block_starts[run_start:run_end],
+                window_num_samples=window_num_samples,
+            ):
+                yield engine.spectrogram_to_np_image(spectrogram)
+            run_start = run_end
 
 
 def chunk(
@@ -0,0 +1,140 @@
+"""
+Synthetic long recordings with elephant-like rumbles injected at known times, to benchmark the pipeline without the Cornell data.
+"""
+
+import math
+import random
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import soundfile
+from scipy.signal import lfilter
+
+
+def rumble_sweep(
+    sample_rate: int,
+    duration: float,
+    freq_start: float,
+    freq_end: float,
+    number_harmonics: int = 3,
+) -> np.ndarray:
+    """
+    Returns a rumble-like harmonic sweep of `duration` seconds: a fundamental gliding
+    linearly from freq_start to freq_end (Hz) and its harmonics with decreasing
+    amplitudes, shaped by a Hann envelope. Its peak amplitude is 1.
+    """
+    n = int(duration * sample_rate)
+    freqs = np.linspace(freq_start, freq_end, n)
+    phase = 2 * np.pi * np.cumsum(freqs) / sample_rate
+    sweep = sum(
+        np.sin(harmonic * phase) / harmonic
+        for harmonic in range(1, number_harmonics + 1)
+    )
+    sweep = sweep * np.hanning(n)
+    return (sweep / max(np.abs(sweep).max(), 1e-12)).astype(np.float32)
+
+
+def synthetic_rumbles(
+    total_duration: float,
+    rumbles_per_hour: float = 20.0,
+    duration_range: tuple[float, float] = (2.0, 6.0),
+    freq_range: tuple[float, float] = (10.0, 30.0),
+    random_seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Returns the rumbles to inject in a recording of total_duration seconds, at random
+    non overlapping times. The dataframe contains the columns t_start, t_end (s) and
+    freq_start, freq_end (Hz) of the fundamental of each sweep, sorted by t_start.
+    """
+    rng = random.Random(random_seed)
+    duration_min, duration_max = duration_range
+    number_rumbles = int(total_duration / 3600 * rumbles_per_hour)
+    # One rumble per slot so that they never overlap
+    slot_duration = total_duration / max(number_rumbles, 1)
+    assert slot_duration > duration_max, "too many rumbles for the total_duration"
+    rumbles = []
+    for i in range(number_rumbles):
+        duration = rng.uniform(duration_min, duration_max)
+        t_start = i * slot_duration + rng.uniform(0, slot_duration - duration)
+        rumbles.append(
+            {
+                "t_start": t_start,
+                "t_end": t_start + duration,
+                "freq_start": rng.uniform(*freq_range),
+                "freq_end": rng.uniform(*freq_range),
+            }
+        )
+    return pd.DataFrame(
+        rumbles, columns=["t_start", "t_end", "freq_start", "freq_end"]
+    )
+
+
+def write_synthetic_recording(
+    filepath: Path,
+    total_duration: float,
+    sample_rate: int,
+    rumbles_per_hour: float = 20.0,
+    snr_db: float = 6.0,
+    block_duration: float = 600.0,
+    random_seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Writes a 16-bit PCM WAV recording of total_duration seconds at sample_rate to
+    filepath and returns its rumbles, see `synthetic_rumbles`.
+
+    The background is white noise plus low frequency (brown-like) noise, and each
+    rumble sweep is added snr_db above the noise level. The recording is generated and
+    written in blocks of block_duration seconds, so memory stays flat whatever its
+    length, and it is identical for a given random_seed.
+    """
+    df_rumbles = synthetic_rumbles(
+        total_duration=total_duration,
+        rumbles_per_hour=rumbles_per_hour,
+        random_seed=random_seed,
+    )
+    # Separate streams for the white and brown noise make the recording independent of
+    # block_duration
+    rng_white, rng_brown = [
+        np.random.default_rng(seed)
+        for seed in np.random.SeedSequence(random_seed).spawn(2)
+    ]
+    noise_std = 0.05
+    rumble_amplitude = noise_std * math.sqrt(2) * 10 ** (snr_db / 20)
+    # Leaky integrator of white noise, its state is carried across blocks
+    b, a = [0.02], [1.0, -0.98]
+    zi = np.zeros(1)
+
+    num_frames = int(total_duration * sample_rate)
+    block_num_frames = int(block_duration * sample_rate)
+    with soundfile.SoundFile(
+        filepath,
+        mode="w",
+        samplerate=sample_rate,
+        channels=1,
+        subtype="PCM_16",
+    ) as f:
+        for block_start in range(0, num_frames, block_num_frames):
+            block_end = min(block_start + block_num_frames, num_frames)
+            white = rng_white.normal(0.0, noise_std, block_end - block_start)
+            brown, zi = lfilter(
+                b, a, rng_brown.normal(0.0, noise_std, len(white)), zi=zi
+            )
+            block = (white + brown).astype(np.float32)
+            for rumble in df_rumbles.itertuples():
+                start = int(rumble.t_start * sample_rate)
+                end = int(rumble.t_end * sample_rate)
+                if end <= block_start or start >= block_end:
+                    continue
+                sweep = rumble_amplitude * rumble_sweep(
+                    sample_rate=sample_rate,
+                    duration=rumble.t_end - rumble.t_start,
+                    freq_start=rumble.freq_start,
+                    freq_end=rumble.freq_end,
+                )
+                lo, hi = max(start, block_start), min(start + len(sweep), block_end)
+                block[lo - block_start : hi - block_start] += sweep[
+                    lo - start : hi - start
+                ]
+            f.write(np.clip(block, -1.0, 1.0))
+    return df_rumbles
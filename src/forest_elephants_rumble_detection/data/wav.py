@@ -0,0 +1,179 @@
+"""
+Random access to the samples of WAV files through a memory map of their PCM payload.
+"""
+
+import struct
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format, bits per sample) -> numpy dtype of a sample in the file, 24 bit samples are
+# stored as 3 bytes and assembled when converted to float
+DTYPES = {
+    (WAVE_FORMAT_PCM, 8): np.dtype("u1"),
+    (WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+    (WAVE_FORMAT_PCM, 24): np.dtype("u1"),
+    (WAVE_FORMAT_PCM, 32): np.dtype("<i4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype("<f8"),
+}
+
+
+def parse_header(filepath: Path) -> dict:
+    """
+    Returns the format, number of channels, sample rate, bits per sample and the offset
+    and size in bytes of the data chunk of a RIFF WAV file. Raises a ValueError when the
+    file is not a WAV file with a supported sample format.
+    """
+    file_size = Path(filepath).stat().st_size
+    header = {}
+    with open(filepath, "rb") as f:
+        riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError(f"{filepath} is not a RIFF WAV file")
+        while (chunk_header := f.read(8)) and len(chunk_header) == 8:
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                audio_format, num_channels, sample_rate, _, block_align, bits = (
+                    struct.unpack("<HHIIHH", fmt[:16])
+                )
+                if audio_format == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    # The format is the first two bytes of the sub format GUID
+                    (audio_format,) = struct.unpack("<H", fmt[24:26])
+                header.update(
+                    audio_format=audio_format,
+                    num_channels=num_channels,
+                    sample_rate=sample_rate,
+                    block_align=block_align,
+                    bits_per_sample=bits,
+                )
+                f.seek(chunk_size % 2, 1)
+            elif chunk_id == b"data":
+                data_offset = f.tell()
+                # The size of streamed or truncated recordings is unreliable
+                data_size = min(chunk_size, file_size - data_offset)
+                header.update(data_offset=data_offset, data_size=data_size)
+                break
+            else:
+                # Chunks are padded to an even size
+                f.seek(chunk_size + chunk_size % 2, 1)
+    if "audio_format" not in header or "data_offset" not in header:
+        raise ValueError(f"{filepath} has no fmt or data chunk")
+    key = (header["audio_format"], header["bits_per_sample"])
+    if key not in DTYPES:
+        raise ValueError(f"{filepath} has an unsupported sample format {key}")
+    return header
+
+
+class WavReader:
+    """
+    Reads windows of a WAV file without decoding it: the header is parsed once and the
+    PCM payload is memory-mapped, so reading a window at any offset only touches the
+    pages of that window.
+
+    `read` and `clip` return zero-copy (frames, channels) views of the raw samples, that
+    are converted to float (channels, frames) arrays only when needed with `to_float`,
+    with the same scaling as torchaudio.load.
+    """
+
+    def __init__(self, filepath: Path):
+        header = parse_header(filepath)
+        self.filepath = Path(filepath)
+        self.sample_rate = header["sample_rate"]
+        self.num_channels = header["num_channels"]
+        self.bits_per_sample = header["bits_per_sample"]
+        self.num_frames = header["data_size"] // header["block_align"]
+        dtype = DTYPES[(header["audio_format"], self.bits_per_sample)]
+        shape = (self.num_frames, self.num_channels)
+        if self.bits_per_sample == 24:
+            shape = shape + (3,)
+        if self.num_frames == 0:
+            self._samples = np.empty(shape, dtype=dtype)
+        else:
+            self._samples = np.memmap(
+                self.filepath,
+                dtype=dtype,
+                mode="r",
+                offset=header["data_offset"],
+                shape=shape,
+            )
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(channels, frames), the shape of the decoded waveform."""
+        return self.num_channels, self.num_frames
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds."""
+        return self.num_frames / self.sample_rate
+
+    def read(
+        self, frame_offset: int = 0, num_frames: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Returns a view of the raw samples of the num_frames frames starting at
+        frame_offset, all of them until the end of the file when num_frames is None.
+        The window is truncated at the end of the file.
+        """
+        start = min(max(frame_offset, 0), self.num_frames)
+        end = (
+            self.num_frames
+            if num_frames is None
+            else min(start + num_frames, self.num_frames)
+        )
+        return self._samples[start:end]
+
+    def clip(self, offset: float, duration: float) -> np.ndarray:
+        """
+        Returns a view of the raw samples of the window of `duration` seconds at `offset`
+        in seconds, with the same frame rounding as `clip` on a decoded waveform.
+        """
+        return self.read(
+            frame_offset=int(offset * self.sample_rate),
+            num_frames=int(duration * self.sample_rate),
+        )
+
+    def to_float(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Returns the raw samples returned by `read` or `clip` as a contiguous float32 array
+        of shape (channels, frames) with values in [-1, 1].
+        """
+        if self.bits_per_sample == 24:
+            samples = samples.astype(np.int32)
+            samples = (
+                samples[..., 0] << 8 | samples[..., 1] << 16 | samples[..., 2] << 24
+            )
+        # Always a copy, the float32 samples of a mono file would be a view of the
+        # read-only memory map
+        x = np.array(samples.T, dtype=np.float32, order="C")
+        if samples.dtype == np.uint8:
+            x -= 128
+            x *= 1 / 128
+        elif samples.dtype.kind == "i":
+            x *= 1 / 2 ** (8 * samples.dtype.itemsize - 1)
+        return x
+
+    def read_float(
+        self, frame_offset: int = 0, num_frames: Optional[int] = None
+    ) -> np.ndarray:
+        """Returns `read` converted to float, see `to_float`."""
+        samples = self.read(frame_offset=frame_offset, num_frames=num_frames)
+        return self.to_float(samples)
+
+
+def open_wav(filepath: Path) -> Optional[WavReader]:
+    """
+    Returns a WavReader of the filepath, or None when it is not a WAV file with a
+    supported sample format and needs to be decoded.
+    """
+    try:
+        return WavReader(filepath)
+    except (ValueError, struct.error):
+        return None
@@ -0,0 +1,158 @@
+"""
+Rendering and saving of the debug spectrograms and predictions off the critical path of the inference.
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+from ultralytics.engine.results import Results
+
+# BGR color of the boxes, the ultralytics color of the first class
+BOX_COLOR = (56, 56, 255)
+
+
+def draw_boxes(
+    image: np.ndarray,
+    xyxy: np.ndarray,
+    labels: list[str],
+    color: tuple[int, int, int] = BOX_COLOR,
+) -> np.ndarray:
+    """
+    Returns a BGR copy of the uint8 image, grayscale (H, W) or (H, W, 3), with the boxes
+    xyxy (pixels) and their labels drawn on it, in the style of the ultralytics plots.
+    """
+    if image.ndim == 2:
+        canvas = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    else:
+        canvas = np.array(image, order="C")
+    line_width = max(round(sum(canvas.shape[:2]) / 2 * 0.003), 2)
+    font_scale = line_width / 3
+    font_thickness = max(line_width - 1, 1)
+    for (x1, y1, x2, y2), label in zip(xyxy.round().astype(int), labels):
+        cv2.rectangle(
+            canvas, (x1, y1), (x2, y2), color, line_width, lineType=cv2.LINE_AA
+        )
+        (w, h), _ = cv2.getTextSize(
+            label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, font_thickness
+        )
+        # Label above the box, or inside when the box touches the top of the image
+        outside = y1 - h >= 3
+        y_text = y1 - 2 if outside else y1 + h + 2
+        cv2.rectangle(
+            canvas,
+            (x1, y1),
+            (x1 + w, y1 - h - 3 if outside else y1 + h + 3),
+            color,
+            -1,
+            lineType=cv2.LINE_AA,
+        )
+        cv2.putText(
+            canvas,
+            label,
+            (x1, y_text),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            font_scale,
+            (255, 255, 255),
+            font_thickness,
+            lineType=cv2.LINE_AA,
+        )
+    return canvas
+
+
+def render_prediction(prediction: Results) -> np.ndarray:
+    """
+    Returns the BGR image of a yolov8 prediction with its boxes, labelled with their
+    class and confidence, as `Results.save` would render it.
+    """
+    boxes = prediction.boxes
+    labels = [
+        f"{prediction.names[int(cls)]} {conf:.2f}"
+        for cls, conf in zip(boxes.cls.tolist(), boxes.conf.tolist())
+    ]
+    return draw_boxes(
+        prediction.orig_img, xyxy=boxes.xyxy.cpu().numpy(), labels=labels
+    )
+
+
+def write_png(
+    filepath: Path,
+    image: np.ndarray,
+    compression_level: Optional[int] = None,
+) -> None:
+    """
+    Writes the uint8 image to filepath as a PNG. The compression level goes from 0
+    (largest) to 9 (slowest, smallest). When None, the OpenCV default is used: level 1
+    with the run-length strategy, the fastest one on the spectrograms.
+    """
+    params = []
+    if compression_level is not None:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, compression_level]
+    ok = cv2.imwrite(str(filepath), image, params)
+    assert ok, f"Could not write {filepath}"
+
+
+class ArtifactWriter:
+    """
+    Renders and writes the spectrograms and predictions in a pool of background threads,
+    so that saving them overlaps with the inference. OpenCV releases the GIL while
+    drawing and encoding the PNGs.
+
+    At most queue_size artifacts are pending at once: submitting more blocks until some
+    are written, which bounds the memory held by the queue. `close` waits for all the
+    pending artifacts and raises the first error of the writes, if any.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        queue_size: int = 64,
+        compression_level: Optional[int] = None,
+    ):
+        assert compression_level is None or (
+            0 <= compression_level <= 9
+        ), "compression_level should be in [0, 9]"
+        self.compression_level = compression_level
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="artifact_writer"
+        )
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._errors: list[BaseException] = []
+
+    def _done(self, future: Future) -> None:
+        self._slots.release()
+        if future.exception() is not None:
+            self._errors.append(future.exception())
+
+    def _submit(self, fn: Callable, *args) -> None:
+        self._slots.acquire()
+        self._executor.submit(fn, *args).add_done_callback(self._done)
+
+    def save_spectrogram(self, image: np.ndarray, filepath: Path) -> None:
+        """Queues the write of the uint8 spectrogram image to filepath."""
+        self._submit(write_png, filepath, image, self.compression_level)
+
+    def save_prediction(self, prediction: Results, filepath: Path) -> None:
+        """Queues the rendering of the prediction and its write to filepath."""
+
+        def fn():
+            write_png(filepath, render_prediction(prediction), self.compression_level)
+
+        self._submit(fn)
+
+    def close(self) -> None:
+        """Waits for the pending artifacts to be written and stops the threads."""
+        self._executor.shutdown(wait=True)
+        if self._errors:
+            logging.error(f"{len(self._errors)} artifacts could not be written")
+            raise self._errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
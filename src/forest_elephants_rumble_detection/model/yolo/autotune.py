@@ -0,0 +1,274 @@
+"""
+Calibration of the batch size, torch threads and number of worker processes of the inference pipeline on the current machine.
+"""
+
+import logging
+import multiprocessing
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import psutil
+import torch
+
+from forest_elephants_rumble_detection.model.yolo.backend import load_model, warmup
+from forest_elephants_rumble_detection.utils import yaml_read, yaml_write
+
+MACHINE_PROFILE_FILEPATH = (
+    Path.home()
+    / ".cache"
+    / "forest_elephants_rumble_detection"
+    / "machine_profile.yaml"
+)
+
+# Settings used when the machine was not calibrated
+DEFAULT_SETTINGS = {"batch_size": 64, "num_workers": 1, "threads_per_worker": None}
+
+
+def machine_fingerprint() -> dict:
+    """Returns what identifies the machine a profile was calibrated on."""
+    return {
+        "hostname": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "memory_total_mb": psutil.virtual_memory().total // 2**20,
+    }
+
+
+def load_machine_profile(
+    filepath: Path = MACHINE_PROFILE_FILEPATH,
+    backend: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Returns the machine profile saved at filepath by `scripts/model/yolov8/autotune.py`,
+    or None when there is none, when it was calibrated on another machine or, when
+    provided, for another backend.
+    """
+    filepath = Path(filepath)
+    if not filepath.exists():
+        return None
+    profile = yaml_read(filepath)
+    if profile.get("machine") != machine_fingerprint():
+        logging.warning(f"Ignoring the machine profile {filepath} of another machine")
+        return None
+    if backend is not None and profile.get("backend") != backend:
+        logging.info(f"Ignoring the machine profile {filepath} of another backend")
+        return None
+    return profile
+
+
+def machine_settings(
+    filepath: Optional[Path] = None,
+    backend: Optional[str] = None,
+) -> dict:
+    """
+    Returns the batch_size, num_workers and threads_per_worker of the machine profile at
+    filepath, see `load_machine_profile`, or the DEFAULT_SETTINGS when filepath is None
+    or the profile does not apply. The profiles are opt-in, eg. MACHINE_PROFILE_FILEPATH
+    once saved by `save_machine_profile`.
+    """
+    profile = None
+    if filepath is not None:
+        profile = load_machine_profile(filepath, backend=backend)
+    if profile is None:
+        return dict(DEFAULT_SETTINGS)
+    return {key: profile[key] for key in DEFAULT_SETTINGS}
+
+
+def candidate_workers(
+    cpu_count: int,
+    num_workers: Optional[list[int]] = None,
+) -> list[Tuple[int, int]]:
+    """
+    Returns the (num_workers, threads_per_worker) pairs to try: all the CPUs split
+    between the workers, and half of them to leave room to the hyperthreads, with
+    num_workers powers of 2 up to cpu_count by default.
+    """
+    if num_workers is None:
+        num_workers = [2**i for i in range(cpu_count.bit_length()) if 2**i <= cpu_count]
+    pairs = []
+    for workers in num_workers:
+        for threads in [cpu_count // workers, cpu_count // (2 * workers)]:
+            if threads >= 1 and (workers, threads) not in pairs:
+                pairs.append((workers, threads))
+    return pairs
+
+
+# Model and config of the trial worker processes
+_trial_state: dict = {}
+
+
+def _init_trial_worker(
+    model_weights_filepath: Path,
+    threads_per_worker: int,
+    backend: str,
+    config: dict,
+) -> None:
+    """Sets the torch threads of a trial worker process and loads its model once."""
+    torch.set_num_threads(threads_per_worker)
+    imgsz = (config["height"], config["width"])
+    _trial_state["model"] = warmup(
+        load_model(model_weights_filepath, backend=backend, imgsz=imgsz), imgsz=imgsz
+    )
+    _trial_state["config"] = config
+
+
+def _trial_worker(
+    batch_size: int,
+    number_batches: int,
+    sample_rate: int,
+    spectrogram_method: str,
+) -> dict:
+    """
+    Runs the spectrogram generation and the model on number_batches batches of
+    synthetic noise windows, after a warmup batch, and returns the number of windows
+    per second and the peak RSS of the worker process.
+    """
+    # Imported here as predict imports this module, and resource is not available on
+    # Windows where the GUI may run
+    import resource
+
+    from forest_elephants_rumble_detection.model.yolo.predict import (
+        predict_images,
+        predict_tensor,
+        spectrogram_batches,
+    )
+
+    model, config = _trial_state["model"], _trial_state["config"]
+    generator = torch.Generator().manual_seed(0)
+    number_frames = int(config["duration"] * sample_rate)
+    # Generated lazily like the clips streamed from an audio file
+    waveforms = (
+        0.05 * torch.randn(1, number_frames, generator=generator)
+        for _ in range(batch_size * (number_batches + 1))
+    )
+    batches = spectrogram_batches(
+        waveform=None,
+        sample_rate=sample_rate,
+        duration=config["duration"],
+        overlap=0.0,
+        width=config["width"],
+        height=config["height"],
+        freq_max=config["freq_max"],
+        n_fft=config["n_fft"],
+        hop_length=config["hop_length"],
+        batch_size=batch_size,
+        spectrogram_method=spectrogram_method,
+        waveforms=waveforms,
+    )
+
+    def predict(batch):
+        if isinstance(batch, torch.Tensor):
+            return predict_tensor(model, batch)
+        return predict_images(model, batch, verbose=False)
+
+    predict(next(batches))
+    start_time = time.perf_counter()
+    for batch in batches:
+        predict(batch)
+    elapsed_time = time.perf_counter() - start_time
+    return {
+        "windows_per_second": batch_size * number_batches / elapsed_time,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_trials(
+    model_weights_filepath: Path,
+    config: dict,
+    backend: str = "pytorch",
+    batch_sizes: Sequence[int] = (8, 16, 32, 64, 128),
+    num_workers: Optional[list[int]] = None,
+    number_batches: int = 2,
+    sample_rate: int = 8000,
+    spectrogram_method: str = "clip",
+) -> list[dict]:
+    """
+    Runs a trial workload for each combination of batch size and (num_workers,
+    threads_per_worker), see `candidate_workers`, and returns their throughput in
+    windows per second over all the workers and their peak memory, the sum of the peak
+    RSS of the workers.
+
+    The workers of a combination run their trials concurrently, as they would on
+    different audio files with `parallel_pipeline`, and are reused for the increasing
+    batch sizes.
+    """
+    trials = []
+    for workers, threads in candidate_workers(os.cpu_count() or 1, num_workers):
+        logging.info(f"Trials with {workers} workers of {threads} threads")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_trial_worker,
+            initargs=(model_weights_filepath, threads, backend, config),
+        ) as executor:
+            for batch_size in sorted(batch_sizes):
+                futures = [
+                    executor.submit(
+                        _trial_worker,
+                        batch_size,
+                        number_batches,
+                        sample_rate,
+                        spectrogram_method,
+                    )
+                    for _ in range(workers)
+                ]
+                results = [future.result() for future in futures]
+                trial = {
+                    "batch_size": batch_size,
+                    "num_workers": workers,
+                    "threads_per_worker": threads,
+                    "windows_per_second": sum(
+                        result["windows_per_second"] for result in results
+                    ),
+                    "peak_rss_mb": sum(result["peak_rss_mb"] for result in results),
+                }
+                logging.info(trial)
+                trials.append(trial)
+    return trials
+
+
+def select_trial(trials: list[dict], memory_budget_mb: float) -> dict:
+    """
+    Returns the trial with the highest throughput within the memory budget, the one
+    with the fewest workers and smallest batch among equal throughputs.
+    """
+    candidates = [trial for trial in trials if trial["peak_rss_mb"] <= memory_budget_mb]
+    assert candidates, f"no trial fits in the memory budget of {memory_budget_mb}MB"
+    return max(
+        candidates,
+        key=lambda trial: (
+            round(trial["windows_per_second"], 2),
+            -trial["num_workers"],
+            -trial["batch_size"],
+        ),
+    )
+
+
+def save_machine_profile(
+    trials: list[dict],
+    memory_budget_mb: float,
+    backend: str,
+    filepath: Path = MACHINE_PROFILE_FILEPATH,
+) -> dict:
+    """
+    Saves the settings of the best trial, see `select_trial`, as the machine profile at
+    filepath along with all the trials and returns it.
+    """
+    best = select_trial(trials, memory_budget_mb=memory_budget_mb)
+    profile = {
+        "machine": machine_fingerprint(),
+        "backend": backend,
+        "memory_budget_mb": memory_budget_mb,
+        **{key: best[key] for key in DEFAULT_SETTINGS},
+        "windows_per_second": best["windows_per_second"],
+        "peak_rss_mb": best["peak_rss_mb"],
+        "trials": trials,
+    }
+    filepath = Path(filepath)
+    filepath.parent.mkdir(exist_ok=True, parents=True)
+    yaml_write(filepath, profile)
+    return profile
@@ -0,0 +1,206 @@
+"""
+Inference backends for trained YOLO models: PyTorch weights or graphs exported to faster CPU runtimes.
+"""
+
+import logging
+import random
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from ultralytics import YOLO
+
+# Backend name -> ultralytics export format
+BACKENDS = {
+    "pytorch": None,
+    "onnx": "onnx",
+    "openvino": "openvino",
+    "onnx_int8": "onnx",
+}
+
+# Backends obtained by post-training quantization, see `quantize`
+QUANTIZED_BACKENDS = ["onnx_int8"]
+
+
+def exported_model_path(weights_filepath: Path, backend: str) -> Path:
+    """
+    Returns the path of the model exported for `backend` from the PyTorch weights_filepath,
+    following the ultralytics naming, eg. best.pt -> best.onnx, best_int8.onnx or
+    best_openvino_model/.
+    """
+    assert backend in BACKENDS, f"backend should be in {list(BACKENDS.keys())}"
+    weights_filepath = Path(weights_filepath)
+    if backend == "pytorch":
+        return weights_filepath
+    elif backend == "onnx":
+        return weights_filepath.with_suffix(".onnx")
+    elif backend == "onnx_int8":
+        return weights_filepath.parent / f"{weights_filepath.stem}_int8.onnx"
+    else:
+        return weights_filepath.parent / f"{weights_filepath.stem}_openvino_model"
+
+
+def export(
+    weights_filepath: Path,
+    backend: str,
+    imgsz: Tuple[int, int],
+) -> Path:
+    """
+    Exports the PyTorch weights_filepath to the `backend` format for images of size
+    imgsz=(height, width), with a dynamic batch dimension. Returns the exported path.
+    """
+    assert backend in BACKENDS, f"backend should be in {list(BACKENDS.keys())}"
+    assert backend != "pytorch", "nothing to export for the pytorch backend"
+    assert (
+        backend not in QUANTIZED_BACKENDS
+    ), f"the {backend} model needs calibration data, use `quantize`"
+    model = YOLO(weights_filepath)
+    exported = model.export(
+        format=BACKENDS[backend],
+        imgsz=list(imgsz),
+        dynamic=True,
+    )
+    return Path(exported)
+
+
+def load_model(
+    weights_filepath: Path,
+    backend: str = "pytorch",
+    imgsz: Optional[Tuple[int, int]] = None,
+) -> YOLO:
+    """
+    Loads the model for the given backend from the PyTorch weights_filepath. The exported
+    model is expected next to it, see `export`. The returned YOLO exposes the same predict
+    API and postprocessing whatever the backend.
+
+    imgsz=(height, width) sets the inference image size, which avoids padding the
+    spectrograms to squares with the exported graphs.
+    """
+    model = YOLO(
+        exported_model_path(weights_filepath, backend=backend),
+        task="detect",
+    )
+    if imgsz is not None:
+        model.overrides["imgsz"] = list(imgsz)
+    return model
+
+
+def warmup(model: YOLO, imgsz: Tuple[int, int]) -> YOLO:
+    """
+    Runs the model once on a blank image of size imgsz=(height, width) so that the
+    predictor is set up and the first spectrograms do not pay for it. Returns the model.
+    """
+    height, width = imgsz
+    model.predict(Image.new("RGB", (width, height)), verbose=False)
+    return model
+
+
+def calibration_image_filepaths(
+    input_dir_yolov8_dataset: Path,
+    split: str = "train",
+    k: int = 300,
+    random_seed: int = 0,
+) -> list[Path]:
+    """
+    Returns a random sample of k spectrogram filepaths from the split of a yolov8
+    dataset, eg. data/03_model_input/yolov8/full/, to calibrate the quantization.
+    """
+    assert split in ["train", "val", "test"], "split should be in {train, val, test}"
+    filepaths = sorted((Path(input_dir_yolov8_dataset) / split / "images").glob("*.png"))
+    random.Random(random_seed).shuffle(filepaths)
+    return filepaths[:k]
+
+
+def _calibration_arrays(
+    image_filepaths: list[Path],
+    imgsz: Tuple[int, int],
+) -> Iterator[np.ndarray]:
+    """
+    Yields the image_filepaths as (1, 3, height, width) float32 arrays in [0, 1], ie.
+    the input of the exported graphs.
+    """
+    height, width = imgsz
+    for image_filepath in image_filepaths:
+        image = Image.open(image_filepath).convert("RGB")
+        if image.size != (width, height):
+            image = image.resize((width, height), Image.BILINEAR)
+        arr = np.asarray(image, dtype=np.float32) / 255.0
+        yield arr.transpose(2, 0, 1)[None]
+
+
+def quantize(
+    weights_filepath: Path,
+    calibration_filepaths: list[Path],
+    imgsz: Tuple[int, int],
+) -> Path:
+    """
+    Post-training static INT8 quantization of the PyTorch weights_filepath for CPU
+    inference with onnxruntime. The activation ranges are calibrated on the
+    calibration_filepaths spectrograms of size imgsz=(height, width).
+
+    The convolutions are quantized, the box decoding of the detection head is kept in
+    float to preserve the box coordinates. Returns the path of the quantized model,
+    loaded with `load_model(weights_filepath, backend="onnx_int8")`.
+    """
+    # onnxruntime is an optional dependency, only needed to quantize
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+
+    class SpectrogramDataReader(CalibrationDataReader):
+        def __init__(self, input_name: str):
+            self.input_name = input_name
+            self.arrays = _calibration_arrays(calibration_filepaths, imgsz=imgsz)
+
+        def get_next(self) -> Optional[dict]:
+            arr = next(self.arrays, None)
+            return None if arr is None else {self.input_name: arr}
+
+    assert len(calibration_filepaths) > 0, "calibration_filepaths should not be empty"
+    onnx_filepath = exported_model_path(weights_filepath, backend="onnx")
+    if not onnx_filepath.exists():
+        export(weights_filepath, backend="onnx", imgsz=imgsz)
+    onnx_model = onnx.load(onnx_filepath)
+    input_name = onnx_model.graph.input[0].name
+
+    # The Detect head is the last module of the network, eg. /model.22/
+    head_index = max(
+        int(node.name.split("/")[1].split(".")[1])
+        for node in onnx_model.graph.node
+        if node.name.startswith("/model.")
+    )
+    nodes_to_exclude = [
+        node.name
+        for node in onnx_model.graph.node
+        if node.name.startswith(f"/model.{head_index}/")
+        and (node.op_type != "Conv" or "/dfl/" in node.name)
+    ]
+    logging.info(
+        f"Calibrating on {len(calibration_filepaths)} spectrograms, keeping {len(nodes_to_exclude)} detection head nodes in float"
+    )
+
+    quantized_filepath = exported_model_path(weights_filepath, backend="onnx_int8")
+    quantize_static(
+        model_input=onnx_filepath,
+        model_output=quantized_filepath,
+        calibration_data_reader=SpectrogramDataReader(input_name),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=nodes_to_exclude,
+    )
+    # Keeps the ultralytics metadata (names, stride, imgsz) used by YOLO to load it
+    quantized_model = onnx.load(quantized_filepath)
+    onnx.helper.set_model_props(
+        quantized_model, {p.key: p.value for p in onnx_model.metadata_props}
+    )
+    onnx.save(quantized_model, quantized_filepath)
+    return quantized_filepath
@@ -0,0 +1,159 @@
+"""
+Window-level checkpoints of the inference on long audio files, to resume it after a crash.
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class Checkpoint:
+    """
+    Checkpoint of the inference on one audio file, stored in dirpath:
+      detections.csv: the detections of the completed windows, one row per box,
+        appended at each flush.
+      state.json: the inference parameters, the number of completed windows, their
+        energy gate scores, the size and dtypes of detections.csv, replaced atomically
+        after the detections are appended.
+
+    A checkpoint saved with other parameters is discarded. The bytes appended to
+    detections.csv after the last state was written, ie. by a flush that did not
+    complete, are truncated when loading.
+
+    The windows are flushed every `interval` seconds and always completed in whole
+    batches, so that a resumed inference processes the same batches and produces the
+    same detections.
+    """
+
+    def __init__(self, dirpath: Path, params: dict, interval: float = 300.0):
+        self.dirpath = Path(dirpath)
+        self.params = params
+        self.interval = interval
+        self.completed_windows = 0
+        self.scores = np.empty(0)
+        self._columns: dict[str, list[np.ndarray]] = {}
+        self._pending_windows = 0
+        self._pending_rows: list[dict[str, np.ndarray]] = []
+        self._pending_scores: list[np.ndarray] = []
+        self._csv_size = 0
+        self._dtypes: dict[str, str] = {}
+        self._last_flush_time = time.monotonic()
+        self._load()
+
+    @property
+    def state_filepath(self) -> Path:
+        return self.dirpath / "state.json"
+
+    @property
+    def detections_filepath(self) -> Path:
+        return self.dirpath / "detections.csv"
+
+    def _load(self) -> None:
+        if not self.state_filepath.exists():
+            return
+        with open(self.state_filepath) as f:
+            state = json.load(f)
+        if state["params"] != self.params:
+            logging.warning(
+                f"Discarding the checkpoint {self.dirpath} saved with other parameters"
+            )
+            self.remove()
+            return
+        self.completed_windows = state["completed_windows"]
+        self.scores = np.array(state["scores"], dtype=np.float64)
+        self._csv_size = state["csv_size"]
+        self._dtypes = state["dtypes"]
+        if self._csv_size > 0:
+            with open(self.detections_filepath, "r+b") as f:
+                f.truncate(self._csv_size)
+            # The floats are written with their shortest exact representation
+            df = pd.read_csv(
+                self.detections_filepath, float_precision="round_trip"
+            ).astype(self._dtypes)
+            self._columns = {column: [df[column].to_numpy()] for column in df.columns}
+        logging.info(
+            f"Resuming from the checkpoint {self.dirpath} after {self.completed_windows} windows"
+        )
+
+    def update(
+        self,
+        columns: dict[str, np.ndarray],
+        number_windows: int,
+        scores: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Adds the detections of the next number_windows completed windows, as 1D
+        columns, and the energy gate scores of the windows if any. Flushes them when
+        the interval has elapsed.
+        """
+        self._pending_rows.append(columns)
+        self._pending_windows += number_windows
+        if scores is not None:
+            self._pending_scores.append(scores)
+        if time.monotonic() - self._last_flush_time >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Saves the pending windows."""
+        if self._pending_windows == 0:
+            return
+        self.dirpath.mkdir(exist_ok=True, parents=True)
+        df = pd.DataFrame(
+            {
+                column: np.concatenate([rows[column] for rows in self._pending_rows])
+                for column in self._pending_rows[0]
+            }
+        )
+        # Overwrites the detections left by a first flush that did not complete
+        mode = "ab" if self._csv_size > 0 else "wb"
+        with open(self.detections_filepath, mode) as f:
+            df.to_csv(f, header=self._csv_size == 0, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+            self._csv_size = f.tell()
+        self._dtypes = {column: str(dtype) for column, dtype in df.dtypes.items()}
+        for column in df.columns:
+            self._columns.setdefault(column, []).append(df[column].to_numpy())
+        self.completed_windows += self._pending_windows
+        self.scores = np.concatenate([self.scores, *self._pending_scores])
+        state = {
+            "params": self.params,
+            "completed_windows": self.completed_windows,
+            "scores": self.scores.tolist(),
+            "csv_size": self._csv_size,
+            "dtypes": self._dtypes,
+        }
+        tmp_filepath = self.state_filepath.with_suffix(".tmp")
+        with open(tmp_filepath, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filepath, self.state_filepath)
+        self._pending_rows, self._pending_scores = [], []
+        self._pending_windows = 0
+        self._last_flush_time = time.monotonic()
+
+    def detections(self) -> dict[str, np.ndarray]:
+        """
+        Returns the columns of the detections of all the flushed windows, in the order
+        of the windows, with their original dtypes.
+        """
+        return {
+            column: np.concatenate(arrays) for column, arrays in self._columns.items()
+        }
+
+    def remove(self) -> None:
+        """Deletes the checkpoint from disk."""
+        shutil.rmtree(self.dirpath, ignore_errors=True)
+        self.completed_windows = 0
+        self.scores = np.empty(0)
+        self._columns = {}
+        self._csv_size = 0
+        self._dtypes = {}
@@ -3,6 +3,7 @@ Evaluation of YOLO models.
 """
 
 from pathlib import Path
+from typing import Optional
 
 from ultralytics import YOLO
 from ultralytics.utils.metrics import DetMetrics
@@ -18,14 +19,20 @@ def evaluate(
     split: str = "test",
     save_json: bool = False,
     save_hybrid: bool = False,
+    data: Optional[Path] = None,
 ) -> DetMetrics:
     """Evaluates the model on the split (train, val.
 
     or test) and returns a DetMetrics object.
+
+    data is the data.yaml of the yolov8 dataset, it defaults to the training dataset
+    of the model and is required for exported models (onnx, openvino).
     """
     assert split in ["train", "val", "test"], "split should be in {train, val, test}"
+    kwargs = {} if data is None else {"data": str(data)}
     return model.val(
         split=split,
         save_json=save_json,
         save_hybrid=save_hybrid,
+        **kwargs,
     )
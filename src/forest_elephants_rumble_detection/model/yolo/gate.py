@@ -0,0 +1,94 @@
+"""
+Cheap pre-screening of the spectrograms on their infrasonic energy, to skip the ones without rumbles before running the YOLO model.
+"""
+
+from typing import Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+# Frequency band (Hz) of the fundamental of the rumbles
+INFRASONIC_BAND = (10.0, 50.0)
+
+
+def band_rows(
+    height: int,
+    freq_max: float,
+    freq_band: Tuple[float, float] = INFRASONIC_BAND,
+) -> Tuple[int, int]:
+    """
+    Returns the rows [row_start, row_end) of a spectrogram image of the given height
+    covering the freq_band. The images are flipped: row 0 is freq_max and the last row is
+    0 Hz.
+    """
+    freq_low, freq_high = freq_band
+    row_start = int(np.floor(height * (1.0 - min(freq_high, freq_max) / freq_max)))
+    row_end = int(np.ceil(height * (1.0 - freq_low / freq_max)))
+    return row_start, max(row_end, row_start + 1)
+
+
+def to_np_batch(batch: list[Image.Image] | torch.Tensor) -> np.ndarray:
+    """
+    Returns the spectrograms of a batch, either a list of PIL images, a (B, H, W) uint8
+    tensor or a (B, C, H, W) tensor with values in [0, 1], as a (B, H, W) float array in
+    the 0-255 range.
+    """
+    if isinstance(batch, torch.Tensor) and batch.dtype == torch.uint8:
+        return batch.cpu().numpy().astype(np.float32)
+    if isinstance(batch, torch.Tensor):
+        return batch[:, 0].cpu().numpy().astype(np.float32) * 255.0
+    return np.stack([np.asarray(image, dtype=np.float32) for image in batch])
+
+
+def infrasonic_scores(
+    batch: list[Image.Image] | torch.Tensor,
+    freq_max: float,
+    freq_band: Tuple[float, float] = INFRASONIC_BAND,
+    smoothing: int = 8,
+) -> np.ndarray:
+    """
+    Returns one score per spectrogram of the batch measuring how much energy stands out
+    in the freq_band over time: the band energy is averaged over the band rows for each
+    time column, smoothed over `smoothing` columns (about 2s for 640 columns spanning
+    164s), and the score is its maximum above its median.
+
+    The scores are computed on the already normalized spectrogram images.
+    """
+    arrs = to_np_batch(batch)
+    row_start, row_end = band_rows(arrs.shape[1], freq_max=freq_max, freq_band=freq_band)
+    band_energy = arrs[:, row_start:row_end, :].mean(axis=1)
+    if smoothing > 1:
+        kernel = np.ones(smoothing, dtype=np.float32) / smoothing
+        band_energy = np.stack(
+            [np.convolve(energy, kernel, mode="valid") for energy in band_energy]
+        )
+    return band_energy.max(axis=1) - np.median(band_energy, axis=1)
+
+
+def adaptive_threshold(scores: np.ndarray, k: float) -> float:
+    """
+    Returns the threshold k robust standard deviations (scaled median absolute deviation)
+    above the median of the scores of an audio file.
+    """
+    median = np.median(scores)
+    mad = 1.4826 * np.median(np.abs(scores - median))
+    return float(median + k * mad)
+
+
+def gate(
+    batch_scores: np.ndarray,
+    file_scores: np.ndarray,
+    k: float,
+    min_windows: int = 16,
+) -> np.ndarray:
+    """
+    Returns the boolean mask of the spectrograms of a batch to send to the detector.
+
+    file_scores are all the scores of the audio file seen so far, including batch_scores,
+    from which the threshold is adapted. Until min_windows scores are available the
+    threshold is not reliable and all the spectrograms pass.
+    """
+    if len(file_scores) < min_windows:
+        return np.ones(len(batch_scores), dtype=bool)
+    return batch_scores >= adaptive_threshold(file_scores, k=k)
@@ -0,0 +1,113 @@
+"""
+Merging of the duplicated detections of a rumble that spans the overlap of two subsequent spectrograms.
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+
+MERGE_STRATEGIES = ["suppress", "union"]
+
+
+def box_iou(
+    t_start_a: float,
+    t_end_a: float,
+    freq_start_a: float,
+    freq_end_a: float,
+    t_start_b: float,
+    t_end_b: float,
+    freq_start_b: float,
+    freq_end_b: float,
+) -> float:
+    """Returns the intersection over union of two boxes in the time x frequency plane."""
+    dt = min(t_end_a, t_end_b) - max(t_start_a, t_start_b)
+    df = min(freq_end_a, freq_end_b) - max(freq_start_a, freq_start_b)
+    if dt <= 0 or df <= 0:
+        return 0.0
+    intersection = dt * df
+    area_a = (t_end_a - t_start_a) * (freq_end_a - freq_start_a)
+    area_b = (t_end_b - t_start_b) * (freq_end_b - freq_start_b)
+    return intersection / (area_a + area_b - intersection)
+
+
+def merge_detections(
+    df: pd.DataFrame,
+    iou_threshold: float = 0.5,
+    strategy: str = "suppress",
+) -> pd.DataFrame:
+    """
+    Merges the detections of df (columns probability, freq_start, freq_end, t_start and
+    t_end in absolute time) that overlap with an IoU >= iou_threshold, typically the same
+    rumble reported by two subsequent overlapping spectrograms.
+
+    The detections are sorted by t_start and swept once: a cluster stays active while
+    its box can still overlap the upcoming detections, ie. until the sweep passes its
+    t_end, so each detection is only compared to the few active clusters. This runs in
+    O(n log n) instead of the O(n^2) pairwise comparisons.
+
+    Each cluster is matched on the box of its most confident detection.
+    strategy="suppress" keeps that box, strategy="union" extends it to the time and
+    frequency extent of all the detections of the cluster.
+    Returns the merged detections sorted by t_start.
+    """
+    assert strategy in MERGE_STRATEGIES, f"strategy should be in {MERGE_STRATEGIES}"
+    assert 0.0 < iou_threshold <= 1.0, "iou_threshold should be in (0, 1]"
+    if len(df) == 0:
+        return df.copy()
+
+    df = df.sort_values("t_start", kind="stable").reset_index(drop=True)
+    probability = df["probability"].to_numpy()
+    t_start = df["t_start"].to_numpy()
+    t_end = df["t_end"].to_numpy()
+    freq_start = df["freq_start"].to_numpy()
+    freq_end = df["freq_end"].to_numpy()
+
+    # Per cluster: most confident detection and extent of all its detections
+    representatives = []
+    extents = []
+    active = set()
+    # (t_end of the representative, cluster), outdated entries are skipped when popped
+    heap = []
+    for i in range(len(df)):
+        while heap and heap[0][0] <= t_start[i]:
+            t_end_cluster, cluster = heapq.heappop(heap)
+            if t_end_cluster == t_end[representatives[cluster]]:
+                active.discard(cluster)
+
+        best_cluster, best_iou = None, iou_threshold
+        for cluster in active:
+            j = representatives[cluster]
+            iou = box_iou(
+                t_start[j],
+                t_end[j],
+                freq_start[j],
+                freq_end[j],
+                t_start[i],
+                t_end[i],
+                freq_start[i],
+                freq_end[i],
+            )
+            if iou >= best_iou:
+                best_cluster, best_iou = cluster, iou
+
+        if best_cluster is None:
+            cluster = len(representatives)
+            representatives.append(i)
+            extents.append([t_start[i], t_end[i], freq_start[i], freq_end[i]])
+            active.add(cluster)
+            heapq.heappush(heap, (t_end[i], cluster))
+        else:
+            extent = extents[best_cluster]
+            extent[0] = min(extent[0], t_start[i])
+            extent[1] = max(extent[1], t_end[i])
+            extent[2] = min(extent[2], freq_start[i])
+            extent[3] = max(extent[3], freq_end[i])
+            if probability[i] > probability[representatives[best_cluster]]:
+                representatives[best_cluster] = i
+                heapq.heappush(heap, (t_end[i], best_cluster))
+
+    df_merged = df.iloc[representatives].copy()
+    if strategy == "union":
+        df_merged[["t_start", "t_end", "freq_start", "freq_end"]] = np.array(extents)
+    return df_merged.sort_values("t_start", kind="stable").reset_index(drop=True)
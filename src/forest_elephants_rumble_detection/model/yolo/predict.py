@@ -2,22 +2,45 @@
 Inference and prediction for trained YOLO models.
 """
 
+import itertools
 import logging
 import math
+import multiprocessing
+import os
+import queue
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Tuple
+from typing import Iterable, Iterator, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import torch
 import torchaudio
 from PIL import Image
 from tqdm import tqdm
 from ultralytics import YOLO
+from ultralytics.engine.results import Results
+from ultralytics.utils import ops
 
 from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
-    waveform_to_np_image,
+    clip,
+    images_to_np_images,
+    sliced_waveform_to_np_images,
+    spectrogram_engine,
+    stack_waveforms_to_images,
 )
+from forest_elephants_rumble_detection.data.wav import open_wav
+from forest_elephants_rumble_detection.model.yolo.artifacts import ArtifactWriter
+from forest_elephants_rumble_detection.model.yolo.autotune import DEFAULT_SETTINGS
+from forest_elephants_rumble_detection.model.yolo.backend import load_model
+from forest_elephants_rumble_detection.model.yolo.checkpoint import Checkpoint
+from forest_elephants_rumble_detection.model.yolo.gate import gate, infrasonic_scores
+from forest_elephants_rumble_detection.model.yolo.merge import merge_detections
+from forest_elephants_rumble_detection.timing import StageTimer
+
+SPECTROGRAM_METHODS = ["clip", "sliced", "batched"]
 
 
 def batch_sequence(xs: list, batch_size: int):
@@ -28,18 +51,23 @@ def batch_sequence(xs: list, batch_size: int):
         yield xs[i : i + batch_size]
 
 
-def clip(
-    waveform: torch.Tensor,
-    offset: float,
-    duration: float,
-    sample_rate: int,
-) -> torch.Tensor:
+def batch_iterable(xs: Iterable, batch_size: int) -> Iterator[list]:
     """
-    Returns a clipped waveform of `duration` seconds at `offset` in seconds.
+    Yields successive n-sized batches from the iterable xs, lazily.
     """
-    offset_frames_start = int(offset * sample_rate)
-    offset_frames_end = offset_frames_start + int(duration * sample_rate)
-    return waveform[:, offset_frames_start:offset_frames_end]
+    iterator = iter(xs)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def chunk_offsets(total_seconds: float, duration: float, overlap: float) -> list[float]:
+    """
+    Returns the offsets in seconds of the overlapping clips generated by `chunk`.
+    """
+    number_spectrograms = total_seconds / (duration - overlap)
+    return [
+        idx * (duration - overlap) for idx in range(0, math.floor(number_spectrograms))
+    ]
 
 
 def chunk(
@@ -53,10 +81,9 @@ def chunk(
     duration and the specified overlap in seconds.
     """
     total_seconds = waveform.shape[1] / sample_rate
-    number_spectrograms = total_seconds / (duration - overlap)
-    offsets = [
-        idx * (duration - overlap) for idx in range(0, math.floor(number_spectrograms))
-    ]
+    offsets = chunk_offsets(
+        total_seconds=total_seconds, duration=duration, overlap=overlap
+    )
     return [
         clip(
             waveform=waveform,
@@ -68,12 +95,147 @@ def chunk(
     ]
 
 
+def to_pil_images(batch: list[Image.Image] | torch.Tensor) -> list[Image.Image]:
+    """
+    Returns the batch as a list of PIL images, converting (B, C, H, W) image tensors if needed.
+    """
+    if isinstance(batch, torch.Tensor):
+        return [Image.fromarray(arr) for arr in images_to_np_images(batch)]
+    return batch
+
+
+def to_np_images(batch: list[Image.Image] | torch.Tensor) -> list[np.ndarray]:
+    """
+    Returns the batch as a list of uint8 numpy images of shape (height, width).
+    """
+    if isinstance(batch, torch.Tensor):
+        return images_to_np_images(batch)
+    return [np.asarray(image) for image in batch]
+
+
+def gray_views(arrs: list[np.ndarray]) -> list[np.ndarray]:
+    """
+    Returns read-only (H, W, 3) views of the uint8 (H, W) spectrograms, without copying,
+    used as the original images of the results when plotting them.
+    """
+    return [np.broadcast_to(arr[..., None], (*arr.shape, 3)) for arr in arrs]
+
+
+def predict_images(
+    model: YOLO, images: list[Image.Image], verbose: bool
+) -> list[Results]:
+    """
+    Runs `model.predict` on the grayscale PIL images. The 3-channel copies of the images
+    made by ultralytics only live for the batch: the results keep views of the
+    single-channel images instead.
+    """
+    predictions = model.predict(images, verbose=verbose)
+    for prediction, orig_img in zip(
+        predictions, gray_views([np.asarray(image) for image in images])
+    ):
+        prediction.orig_img = orig_img
+    return predictions
+
+
+def predict_tensor(model: YOLO, images: torch.Tensor) -> list[Results]:
+    """
+    Runs the model on a batch of already normalized images of shape (B, 3, H, W) with values
+    in [0, 1], eg. generated by `waveforms_to_images`, or of single-channel uint8 images of
+    shape (B, H, W), at their native geometry (640x256 for the rumble spectrograms): no PIL
+    conversion, letterboxing, resizing or padding.
+    H and W should be multiples of the model stride (32).
+
+    The uint8 images are only expanded to 3 float channels in the model input tensor.
+
+    Returns the same ultralytics Results as `model.predict`, using the default predict
+    arguments (conf, iou, max_det) of the model.
+    """
+    x = images
+    if x.dtype == torch.uint8:
+        x = (x.unsqueeze(1) / 255).expand(-1, 3, -1, -1).contiguous()
+    if model.predictor is None:
+        # Sets up and warms up the predictor and its AutoBackend model only once, on a
+        # float image: ultralytics does not accept uint8 tensors
+        model.predict(x[:1].float(), verbose=False)
+    predictor = model.predictor
+    backend = predictor.model
+    with torch.inference_mode():
+        x = x.to(predictor.device)
+        x = x.half() if backend.fp16 else x.float()
+        preds = ops.non_max_suppression(
+            backend(x),
+            predictor.args.conf,
+            predictor.args.iou,
+            agnostic=predictor.args.agnostic_nms,
+            max_det=predictor.args.max_det,
+            classes=predictor.args.classes,
+        )
+        for pred in preds:
+            # Same geometry as the input images, the boxes only need to be clipped
+            ops.clip_boxes(pred[:, :4], images.shape[-2:])
+    orig_imgs = gray_views(images_to_np_images(images))
+    return [
+        Results(
+            orig_imgs[i],
+            path=f"image{i}.png",
+            names=backend.names,
+            boxes=pred,
+        )
+        for i, pred in enumerate(preds)
+    ]
+
+
+def predict_gated(
+    model: YOLO,
+    batch: list[Image.Image] | torch.Tensor,
+    mask: np.ndarray,
+    start: int,
+    verbose: bool,
+) -> list[Results]:
+    """
+    Runs the model only on the spectrograms of the batch selected by the boolean mask and
+    returns one Results per spectrogram, empty for the skipped ones, so that the indices
+    of the results still match the spectrograms. start is the index of the first
+    spectrogram of the batch in the audio file.
+    """
+    if isinstance(batch, torch.Tensor):
+        selected = batch[torch.from_numpy(mask)]
+        predictions = predict_tensor(model, selected) if len(selected) > 0 else []
+        arrs = images_to_np_images(batch)
+    else:
+        selected = [image for image, keep in zip(batch, mask) if keep]
+        predictions = []
+        if selected:
+            predictions = predict_images(model, selected, verbose=verbose)
+        arrs = [np.asarray(image) for image in batch]
+    predictions = iter(predictions)
+    results = []
+    for i, (orig_img, keep) in enumerate(zip(gray_views(arrs), mask), start=start):
+        if keep:
+            results.append(next(predictions))
+        else:
+            results.append(
+                Results(
+                    orig_img,
+                    path=f"image{i}.png",
+                    names=model.names,
+                    boxes=torch.zeros((0, 6)),
+                )
+            )
+    return results
+
+
 def load_audio(audio_filepath: Path) -> Tuple[torch.Tensor, int]:
     """
     Loads an audio_filepath and returns the waveform and sample_rate of the file.
     """
     start_time = time.time()
-    waveform, sample_rate = torchaudio.load(audio_filepath)
+    reader = open_wav(audio_filepath)
+    if reader is None:
+        waveform, sample_rate = torchaudio.load(audio_filepath)
+    else:
+        waveform = torch.from_numpy(reader.read_float())
+        sample_rate = reader.sample_rate
     end_time = time.time()
     elapsed_time = end_time - start_time
     logging.info(
@@ -82,6 +244,230 @@ def load_audio(audio_filepath: Path) -> Tuple[torch.Tensor, int]:
     return waveform, sample_rate
 
 
+def audio_info(audio_filepath: Path) -> Tuple[int, int]:
+    """
+    Returns the sample_rate and the number of frames of the audio_filepath without decoding it.
+    """
+    reader = open_wav(audio_filepath)
+    if reader is not None:
+        return reader.sample_rate, reader.num_frames
+    metadata = torchaudio.info(audio_filepath)
+    return metadata.sample_rate, metadata.num_frames
+
+
+def stream_chunks(
+    audio_filepath: Path,
+    duration: float,
+    overlap: float,
+    block_duration: float = 3600.0,
+    start_window: int = 0,
+) -> Iterator[torch.Tensor]:
+    """
+    Yields the same overlapping clips as `chunk` on the fully loaded audio_filepath, lazily,
+    from the clip of index start_window.
+    The file is read in sequential blocks of `block_duration` seconds and only the samples
+    not yet consumed by the clips (ie. the overlap) are carried over from one block to the
+    next, so memory stays flat regardless of the file length.
+    PCM WAV files are memory-mapped instead and each clip is read directly, see `WavReader`.
+    """
+    sample_rate, num_frames = audio_info(audio_filepath)
+    offsets = chunk_offsets(
+        total_seconds=num_frames / sample_rate, duration=duration, overlap=overlap
+    )[start_window:]
+    reader = open_wav(audio_filepath)
+    if reader is not None:
+        for offset in offsets:
+            yield clip(
+                waveform=reader,
+                offset=offset,
+                duration=duration,
+                sample_rate=sample_rate,
+            )
+        return
+    clip_num_frames = int(duration * sample_rate)
+    block_num_frames = max(int(block_duration * sample_rate), clip_num_frames)
+    buffer: Optional[torch.Tensor] = None
+    buffer_start = int(offsets[0] * sample_rate) if offsets else 0
+    for offset in offsets:
+        start = int(offset * sample_rate)
+        end = min(start + clip_num_frames, num_frames)
+        if buffer is not None and start > buffer_start:
+            buffer = buffer[:, start - buffer_start :]
+            buffer_start = start
+        buffer_end = buffer_start if buffer is None else buffer_start + buffer.shape[1]
+        while buffer_end < end:
+            block, _ = torchaudio.load(
+                audio_filepath, frame_offset=buffer_end, num_frames=block_num_frames
+            )
+            if block.shape[1] == 0:
+                break
+            if buffer is None:
+                buffer, buffer_start = block, buffer_end
+            else:
+                buffer = torch.cat([buffer, block], dim=1)
+            buffer_end += block.shape[1]
+        yield buffer[:, start - buffer_start : end - buffer_start]
+
+
+def spectrogram_batches(
+    waveform: Optional[torch.Tensor],
+    sample_rate: int,
+    duration: float,
+    overlap: float,
+    width: int,
+    height: int,
+    freq_max: float,
+    n_fft: int,
+    hop_length: int,
+    batch_size: int,
+    spectrogram_method: str = "clip",
+    spectrogram_block_size: Optional[int] = None,
+    decimate_waveform: bool = False,
+    stft_backend: str = "torch",
+    waveforms: Optional[Iterable[torch.Tensor]] = None,
+    timer: Optional[StageTimer] = None,
+    start_window: int = 0,
+) -> Iterator[list[Image.Image] | torch.Tensor]:
+    """
+    Yields batches of spectrogram images of the overlapping clips of the waveform, lazily.
+    A batch is a list of grayscale PIL images, or a (B, H, W) uint8 tensor with the batched
+    method: the windows stay single-channel uint8 until the model input.
+    See `inference` for the spectrogram_method values.
+
+    When provided, `waveforms` are the clips to use instead of chunking `waveform`, eg. the
+    ones yielded by `stream_chunks`. The sliced method requires the full waveform.
+    The stages of each batch are recorded by the timer, when provided.
+
+    The spectrograms start at the clip of index start_window, `waveforms` should start
+    there too. With the sliced method, the block containing start_window is computed
+    entirely to get the same spectrograms.
+    """
+    timer = timer if timer is not None else StageTimer(enabled=False)
+    assert (
+        spectrogram_method in SPECTROGRAM_METHODS
+    ), f"spectrogram_method should be in {SPECTROGRAM_METHODS}"
+    assert (
+        waveforms is None or spectrogram_method != "sliced"
+    ), "the sliced spectrogram_method requires the full waveform"
+    if spectrogram_method == "sliced":
+        offsets = chunk_offsets(
+            total_seconds=waveform.shape[1] / sample_rate,
+            duration=duration,
+            overlap=overlap,
+        )
+        block_size = spectrogram_block_size or max(len(offsets), 1)
+        first_window = start_window // block_size * block_size
+        arrays = sliced_waveform_to_np_images(
+            waveform=waveform,
+            sample_rate=sample_rate,
+            offsets=offsets[first_window:],
+            duration=duration,
+            n_fft=n_fft,
+            hop_length=hop_length,
+            freq_max=freq_max,
+            width=width,
+            height=height,
+            block_size=spectrogram_block_size,
+            decimate_waveform=decimate_waveform,
+            stft_backend=stft_backend,
+        )
+        arrays = itertools.islice(arrays, start_window - first_window, None)
+        images = (Image.fromarray(arr) for arr in arrays)
+        yield from timer.iterate(
+            batch_iterable(images, batch_size=batch_size), stage="spectrogram"
+        )
+        return
+
+    engine = spectrogram_engine(
+        sample_rate=sample_rate,
+        n_fft=n_fft,
+        hop_length=hop_length,
+        freq_max=freq_max,
+        width=width,
+        height=height,
+        decimate_waveform=decimate_waveform,
+        stft_backend=stft_backend,
+    )
+    # The streamed clips are read from the file as the batches are pulled
+    chunk_stage = "chunking" if waveforms is None else "decode"
+    if waveforms is None:
+        with timer.stage("chunking"):
+            waveforms = chunk(
+                waveform=waveform,
+                sample_rate=sample_rate,
+                duration=duration,
+                overlap=overlap,
+            )[start_window:]
+    batches = timer.iterate(
+        batch_iterable(waveforms, batch_size=batch_size), stage=chunk_stage
+    )
+    for i, batch in enumerate(batches):
+        if spectrogram_method == "batched":
+            with timer.stage("spectrogram", batch=i):
+                images = stack_waveforms_to_images(
+                    waveforms=batch,
+                    sample_rate=sample_rate,
+                    n_fft=n_fft,
+                    hop_length=hop_length,
+                    freq_max=freq_max,
+                    width=width,
+                    height=height,
+                    channels=None,
+                    decimate_waveform=decimate_waveform,
+                    stft_backend=stft_backend,
+                )
+        else:
+            with timer.stage("stft", batch=i):
+                spectrograms = [engine.spectrogram(y) for y in batch]
+            with timer.stage("image", batch=i):
+                images = [
+                    Image.fromarray(engine.spectrogram_to_np_image(spectrogram))
+                    for spectrogram in spectrograms
+                ]
+        yield images
+
+
+def prefetch(iterable: Iterable, queue_depth: int) -> Iterator:
+    """
+    Yields the items of `iterable`, produced ahead of time by a background thread.
+    At most `queue_depth` items wait in the bounded queue, which caps the memory used.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    items: queue.Queue = queue.Queue(maxsize=max(queue_depth, 1))
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                items.put(item)
+            items.put(done)
+        except BaseException as e:
+            items.put(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblocks the producer if it is waiting on a full queue
+        while producer.is_alive():
+            try:
+                items.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
+
+
 def inference(
     model: YOLO,
     audio_filepath: Path,
@@ -97,55 +483,188 @@ def inference(
     save_spectrograms: bool,
     save_predictions: bool,
     verbose: bool,
+    spectrogram_method: str = "clip",
+    spectrogram_block_size: Optional[int] = None,
+    decimate_waveform: bool = False,
+    stft_backend: str = "torch",
+    pipelined: bool = False,
+    queue_depth: int = 2,
+    streaming: bool = False,
+    block_duration: float = 3600.0,
+    energy_gate: bool = False,
+    energy_gate_k: float = 1.0,
+    timer: Optional[StageTimer] = None,
+    artifact_writer: Optional[ArtifactWriter] = None,
+    checkpoint: Optional[Checkpoint] = None,
 ) -> list:
     """
     Inference entry point for running on an entire audio_filepath sound file.
+
+    spectrogram_method:
+      clip: one spectrogram computed for each overlapping clip.
+      sliced: one spectrogram computed for the whole waveform, or per block of
+        `spectrogram_block_size` clips, and each clip is sliced out of it. Only the
+        clips starting a multiple of hop_length samples apart share it, the other
+        ones are computed on their own, see `sliced_waveform_to_np_images`.
+      batched: spectrograms computed with vectorized tensor ops for each batch
+        of clips, kept as (B, H, W) uint8 tensors and fed to the model with `predict_tensor`.
+    decimate_waveform: downsample the waveform close to 4 * freq_max before running the STFT.
+    stft_backend: torch, scipy or numpy to run a full FFT, dft to only compute the
+      frequency bins below freq_max, auto to pick the fastest one on the host, see
+      `SpectrogramEngine` and scripts/benchmark/stft.py.
+    pipelined: generate the spectrogram batches in a background thread while the
+      model runs on the previous batch, with at most `queue_depth` batches waiting.
+    streaming: read the audio file lazily in blocks of `block_duration` seconds instead
+      of loading it entirely in memory, see `stream_chunks`.
+    energy_gate: only run the model on the spectrograms whose infrasonic energy score is
+      `energy_gate_k` robust standard deviations above the median score of the file, see
+      `model/yolo/gate.py`. The skipped spectrograms get empty predictions.
+    timer: records the time spent in each stage, see `StageTimer`.
+    artifact_writer: writes the spectrograms and predictions saved with save_spectrograms
+      and save_predictions in background threads, one is created for the file if None.
+    checkpoint: the boxes of each batch are added to the checkpoint, and the inference
+      resumes after its completed windows. Only the predictions of the remaining windows
+      are returned, the checkpoint holds the boxes of all of them, see `box_arrays`.
     """
-    logging.info(f"Loading audio filepath {audio_filepath}")
-    # waveform, sample_rate = torchaudio.load(audio_filepath)
-    waveform, sample_rate = load_audio(audio_filepath)
-    waveforms = chunk(
+    timer = timer if timer is not None else StageTimer(enabled=False)
+    start_window = checkpoint.completed_windows if checkpoint is not None else 0
+    if start_window > 0:
+        sample_rate, num_frames = audio_info(audio_filepath)
+        offsets = chunk_offsets(
+            total_seconds=num_frames / sample_rate, duration=duration, overlap=overlap
+        )
+        if start_window >= len(offsets):
+            logging.info(f"Audio filepath {audio_filepath} already analyzed")
+            return []
+    if streaming:
+        logging.info(f"Streaming audio filepath {audio_filepath}")
+        sample_rate, num_frames = audio_info(audio_filepath)
+        waveform = None
+        waveforms = stream_chunks(
+            audio_filepath=audio_filepath,
+            duration=duration,
+            overlap=overlap,
+            block_duration=block_duration,
+            start_window=start_window,
+        )
+    else:
+        logging.info(f"Loading audio filepath {audio_filepath}")
+        # waveform, sample_rate = torchaudio.load(audio_filepath)
+        with timer.stage("decode"):
+            waveform, sample_rate = load_audio(audio_filepath)
+        num_frames = waveform.shape[1]
+        waveforms = None
+    number_spectrograms = len(
+        chunk_offsets(
+            total_seconds=num_frames / sample_rate,
+            duration=duration,
+            overlap=overlap,
+        )
+    )
+    number_batches = math.ceil((number_spectrograms - start_window) / batch_size)
+    logging.info(
+        f"Generating {number_spectrograms - start_window} spectrograms with the {spectrogram_method} method"
+    )
+    batches = spectrogram_batches(
         waveform=waveform,
         sample_rate=sample_rate,
         duration=duration,
         overlap=overlap,
+        width=width,
+        height=height,
+        freq_max=freq_max,
+        n_fft=n_fft,
+        hop_length=hop_length,
+        batch_size=batch_size,
+        spectrogram_method=spectrogram_method,
+        spectrogram_block_size=spectrogram_block_size,
+        decimate_waveform=decimate_waveform,
+        stft_backend=stft_backend,
+        waveforms=waveforms,
+        timer=timer,
+        start_window=start_window,
     )
-    logging.info(f"Chunking the waveform into {len(waveforms)} overlapping clips")
-    logging.info(f"Generating {len(waveforms)} spectrograms")
-    images = [
-        Image.fromarray(
-            waveform_to_np_image(
-                waveform=y,
-                sample_rate=sample_rate,
-                n_fft=n_fft,
-                hop_length=hop_length,
-                freq_max=freq_max,
-                width=width,
-                height=height,
-            )
-        )
-        for y in tqdm(waveforms)
-    ]
+    if pipelined:
+        batches = prefetch(batches, queue_depth=queue_depth)
+
+    save_dir_spectrograms = output_dir / "spectrograms"
     if save_spectrograms:
-        save_dir = output_dir / "spectrograms"
-        logging.info(f"Saving spectrograms in {save_dir}")
-        save_dir.mkdir(exist_ok=True, parents=True)
-        for i, image in tqdm(enumerate(images), total=len(images)):
-            image.save(save_dir / f"spectrogram_{i}.png")
+        logging.info(f"Saving spectrograms in {save_dir_spectrograms}")
+        save_dir_spectrograms.mkdir(exist_ok=True, parents=True)
+    save_dir = output_dir / "predictions"
+    if save_predictions:
+        logging.info(f"Saving predictions in {save_dir}")
+        save_dir.mkdir(parents=True, exist_ok=True)
+    owns_artifact_writer = artifact_writer is None and (
+        save_spectrograms or save_predictions
+    )
+    if owns_artifact_writer:
+        artifact_writer = ArtifactWriter()
 
     results = []
+    file_scores = checkpoint.scores if checkpoint is not None else np.empty(0)
+    number_skipped = 0
 
-    batches = list(batch_sequence(images, batch_size=batch_size))
-    logging.info(f"Running inference on the spectrograms, {len(batches)} batches")
-    for batch in tqdm(batches):
-        results.extend(model.predict(batch, verbose=verbose))
+    logging.info(f"Running inference on the spectrograms, {number_batches} batches")
+    for batch_index, batch in enumerate(tqdm(batches, total=number_batches)):
+        # Index of the first spectrogram of the batch in the audio file
+        start = start_window + len(results)
+        if save_spectrograms:
+            with timer.stage("writing", batch=batch_index):
+                for i, arr in enumerate(to_np_images(batch), start=start):
+                    artifact_writer.save_spectrogram(
+                        arr, save_dir_spectrograms / f"spectrogram_{i}.png"
+                    )
+        if energy_gate:
+            with timer.stage("gate", batch=batch_index):
+                batch_scores = infrasonic_scores(batch, freq_max=freq_max)
+                file_scores = np.concatenate([file_scores, batch_scores])
+                mask = gate(batch_scores, file_scores=file_scores, k=energy_gate_k)
+            number_skipped += int((~mask).sum())
+            with timer.stage("forward", batch=batch_index):
+                predictions = predict_gated(
+                    model,
+                    batch,
+                    mask=mask,
+                    start=start,
+                    verbose=verbose,
+                )
+        elif isinstance(batch, torch.Tensor):
+            with timer.stage("forward", batch=batch_index):
+                predictions = predict_tensor(model, batch)
+        else:
+            with timer.stage("forward", batch=batch_index):
+                predictions = predict_images(model, batch, verbose=verbose)
+        if save_predictions:
+            with timer.stage("writing", batch=batch_index):
+                for i, prediction in enumerate(predictions, start=start):
+                    artifact_writer.save_prediction(
+                        prediction, save_dir / f"prediction_{i}.png"
+                    )
+        if checkpoint is not None:
+            arrays = box_arrays(predictions, start=start)
+            checkpoint.update(
+                {
+                    "idx": arrays["idxs"],
+                    **{k: arrays["xyxyn"][:, i] for i, k in enumerate(BOX_COLUMNS)},
+                    "conf": arrays["conf"],
+                },
+                number_windows=len(predictions),
+                scores=batch_scores if energy_gate else None,
+            )
+        results.extend(predictions)
 
-    if save_predictions:
-        save_dir = output_dir / "predictions"
-        save_dir.mkdir(parents=True, exist_ok=True)
-        logging.info(f"Saving predictions in {save_dir}")
-        for i, yolov8_prediction in tqdm(enumerate(results), total=len(results)):
-            yolov8_prediction.save(str(save_dir / f"prediction_{i}.png"))
+    if energy_gate:
+        logging.info(
+            f"Energy gate skipped {number_skipped}/{len(results)} spectrograms ({number_skipped / max(len(results), 1):.1%})"
+        )
+
+    if checkpoint is not None:
+        checkpoint.flush()
+
+    if owns_artifact_writer:
+        with timer.stage("writing"):
+            artifact_writer.close()
 
     return results
 
@@ -157,6 +676,43 @@ def index_to_relative_offset(idx: int, duration: float, overlap: float) -> float
     return idx * (duration - overlap)
 
 
+PREDICTION_COLUMNS = ["probability", "freq_start", "freq_end", "t_start", "t_end"]
+
+# Columns of the normalized box coordinates saved in the checkpoints
+BOX_COLUMNS = ["x1n", "y1n", "x2n", "y2n"]
+
+
+def to_columns(
+    xyxyn: np.ndarray,
+    conf: np.ndarray,
+    idxs: np.ndarray,
+    duration: float,
+    overlap: float,
+    freq_min: float,
+    freq_max: float,
+) -> dict[str, np.ndarray]:
+    """
+    Converts N boxes into the PREDICTION_COLUMNS arrays with array math.
+
+    xyxyn (N, 4) are the normalized box coordinates, conf (N,) their probabilities and
+    idxs (N,) the index of the spectrogram each box was predicted on, used to shift the
+    boxes by their relative offset.
+    """
+    xyxyn = xyxyn.astype(np.float64, copy=False)
+    xmin = np.minimum(xyxyn[:, 0], xyxyn[:, 2])
+    xmax = np.maximum(xyxyn[:, 0], xyxyn[:, 2])
+    ymin = np.minimum(xyxyn[:, 1], xyxyn[:, 3])
+    ymax = np.maximum(xyxyn[:, 1], xyxyn[:, 3])
+    offsets = index_to_relative_offset(idx=idxs, duration=duration, overlap=overlap)
+    return {
+        "probability": conf.astype(np.float64, copy=False),
+        "freq_start": ymin * (freq_max - freq_min),
+        "freq_end": ymax * (freq_max - freq_min),
+        "t_start": xmin * duration + offsets,
+        "t_end": xmax * duration + offsets,
+    }
+
+
 def from_yolov8_prediction(
     yolov8_prediction,
     idx: int,
@@ -165,31 +721,37 @@ def from_yolov8_prediction(
     freq_min: float,
     freq_max: float,
 ) -> list[dict]:
-    results = []
-    for k, box_xyxyn in enumerate(yolov8_prediction.boxes.xyxyn):
-        conf = yolov8_prediction.boxes.conf[k].item()
-        x1, y1, x2, y2 = box_xyxyn.numpy()
-        xmin = min(x1, x2)
-        xmax = max(x1, x2)
-        ymin = min(y1, y2)
-        ymax = max(y1, y2)
-        freq_start = ymin * (freq_max - freq_min)
-        freq_end = ymax * (freq_max - freq_min)
-        t_start = xmin * duration + index_to_relative_offset(
-            idx=idx, duration=duration, overlap=overlap
-        )
-        t_end = xmax * duration + index_to_relative_offset(
-            idx=idx, duration=duration, overlap=overlap
-        )
-        data = {
-            "probability": conf,
-            "freq_start": freq_start,
-            "freq_end": freq_end,
-            "t_start": t_start,
-            "t_end": t_end,
+    boxes = yolov8_prediction.boxes
+    columns = to_columns(
+        xyxyn=boxes.xyxyn.cpu().numpy().reshape(-1, 4),
+        conf=boxes.conf.cpu().numpy(),
+        idxs=np.full(len(boxes), idx),
+        duration=duration,
+        overlap=overlap,
+        freq_min=freq_min,
+        freq_max=freq_max,
+    )
+    return pd.DataFrame(columns, columns=PREDICTION_COLUMNS).to_dict("records")
+
+
+def box_arrays(yolov8_predictions, start: int = 0) -> dict[str, np.ndarray]:
+    """
+    Gathers the boxes of the yolov8 predictions in the arrays xyxyn (N, 4), conf (N,)
+    and idxs (N,), the index of the spectrogram of each box, counted from start.
+    """
+    boxes = [yolov8_prediction.boxes for yolov8_prediction in yolov8_predictions]
+    if len(boxes) == 0:
+        return {
+            "xyxyn": np.empty((0, 4), dtype=np.float32),
+            "conf": np.empty(0, dtype=np.float32),
+            "idxs": np.empty(0, dtype=np.int64),
         }
-        results.append(data)
-    return results
+    counts = np.array([len(b) for b in boxes])
+    return {
+        "xyxyn": torch.cat([b.xyxyn.reshape(-1, 4) for b in boxes]).cpu().numpy(),
+        "conf": torch.cat([b.conf.reshape(-1) for b in boxes]).cpu().numpy(),
+        "idxs": start + np.repeat(np.arange(len(boxes)), counts),
+    }
 
 
 def to_dataframe(
@@ -207,20 +769,19 @@ def to_dataframe(
       freq_end (float): Hz - where the box ends on the frequency axis
       t_start (float): Hz - where the box starts on the time axis
       t_end (float): Hz - where the box ends on the time axis
+
+    The boxes of all the predictions are gathered in single arrays and converted at once.
     """
-    results = []
-    for idx, yolov8_prediction in enumerate(yolov8_predictions):
-        results.extend(
-            from_yolov8_prediction(
-                yolov8_prediction,
-                idx=idx,
-                duration=duration,
-                overlap=overlap,
-                freq_min=freq_min,
-                freq_max=freq_max,
-            )
-        )
-    return pd.DataFrame(results)
+    if len(yolov8_predictions) == 0:
+        return pd.DataFrame(columns=PREDICTION_COLUMNS)
+    columns = to_columns(
+        **box_arrays(yolov8_predictions),
+        duration=duration,
+        overlap=overlap,
+        freq_min=freq_min,
+        freq_max=freq_max,
+    )
+    return pd.DataFrame(columns, columns=PREDICTION_COLUMNS)
 
 
 def pipeline(
@@ -234,22 +795,87 @@ def pipeline(
     freq_max: float,
     n_fft: int,
     hop_length: int,
-    batch_size: int,
+    batch_size: Optional[int],
     output_dir: Path,
     save_spectrograms: bool,
     save_predictions: bool,
     verbose: bool,
+    spectrogram_method: str = "clip",
+    spectrogram_block_size: Optional[int] = None,
+    decimate_waveform: bool = False,
+    stft_backend: str = "torch",
+    pipelined: bool = False,
+    queue_depth: int = 2,
+    streaming: bool = False,
+    block_duration: float = 3600.0,
+    merge_iou_threshold: Optional[float] = None,
+    merge_strategy: str = "suppress",
+    energy_gate: bool = False,
+    energy_gate_k: float = 1.0,
+    timer: Optional[StageTimer] = None,
+    png_compression_level: Optional[int] = None,
+    artifact_workers: int = 2,
+    checkpoint_interval: Optional[float] = None,
 ) -> pd.DataFrame:
     """
     Main entrypoint to generate the predictions on a set of audio_filepaths
+
+    When merge_iou_threshold is set, the detections of each audio file reported twice
+    across the overlap of subsequent spectrograms are merged, see `merge_detections`.
+    When provided, the timer records the time spent in each stage per file and batch.
+    When batch_size is None, the default one of 64 is used, see `machine_settings` to
+    get the one of a machine profile.
+    The spectrograms and predictions saved with save_spectrograms and save_predictions
+    are written as PNGs with the png_compression_level (0-9, the OpenCV default when
+    None) by `artifact_workers` background threads, see `ArtifactWriter`.
+    When checkpoint_interval is set, the completed windows of each audio file are saved
+    every checkpoint_interval seconds in output_dir/checkpoints, and a run interrupted
+    with the same parameters resumes after them, see `Checkpoint`. The checkpoints are
+    removed once all the audio files are analyzed.
     """
+    timer = timer if timer is not None else StageTimer(enabled=False)
+    if batch_size is None:
+        batch_size = DEFAULT_SETTINGS["batch_size"]
+        logging.info(f"Using the default batch size {batch_size}")
+    artifact_writer = None
+    if save_spectrograms or save_predictions:
+        artifact_writer = ArtifactWriter(
+            max_workers=artifact_workers, compression_level=png_compression_level
+        )
+    checkpoints = []
     dfs = []
     for audio_filepath in audio_filepaths:
+        timer.audio_filepath = str(audio_filepath)
         start_time = time.time()
         sub_output_dir = output_dir / audio_filepath.stem
         if save_predictions:
             sub_output_dir.mkdir(exist_ok=True, parents=True)
-            
+        checkpoint = None
+        if checkpoint_interval is not None:
+            checkpoint = Checkpoint(
+                dirpath=output_dir / "checkpoints" / audio_filepath.stem,
+                params={
+                    "audio_filepath": str(audio_filepath),
+                    "model": str(getattr(model, "model_name", None)),
+                    "duration": duration,
+                    "overlap": overlap,
+                    "width": width,
+                    "height": height,
+                    "freq_max": freq_max,
+                    "n_fft": n_fft,
+                    "hop_length": hop_length,
+                    "batch_size": batch_size,
+                    "spectrogram_method": spectrogram_method,
+                    "spectrogram_block_size": spectrogram_block_size,
+                    "decimate_waveform": decimate_waveform,
+                    "stft_backend": stft_backend,
+                    "energy_gate": energy_gate,
+                    "energy_gate_k": energy_gate_k,
+                },
+                interval=checkpoint_interval,
+            )
+            checkpoints.append(checkpoint)
+
         yolov8_predictions = inference(
             model=model,
             audio_filepath=audio_filepath,
@@ -265,14 +891,49 @@ def pipeline(
             save_spectrograms=save_spectrograms,
             save_predictions=save_predictions,
             verbose=verbose,
+            spectrogram_method=spectrogram_method,
+            spectrogram_block_size=spectrogram_block_size,
+            decimate_waveform=decimate_waveform,
+            stft_backend=stft_backend,
+            pipelined=pipelined,
+            queue_depth=queue_depth,
+            streaming=streaming,
+            block_duration=block_duration,
+            energy_gate=energy_gate,
+            energy_gate_k=energy_gate_k,
+            timer=timer,
+            artifact_writer=artifact_writer,
+            checkpoint=checkpoint,
         )
-        df = to_dataframe(
-            yolov8_predictions=yolov8_predictions,
-            duration=duration,
-            overlap=overlap,
-            freq_min=freq_min,
-            freq_max=freq_max,
-        )
+        with timer.stage("postprocessing"):
+            if checkpoint is None or checkpoint.completed_windows == 0:
+                df = to_dataframe(
+                    yolov8_predictions=yolov8_predictions,
+                    duration=duration,
+                    overlap=overlap,
+                    freq_min=freq_min,
+                    freq_max=freq_max,
+                )
+            else:
+                detections = checkpoint.detections()
+                columns = to_columns(
+                    xyxyn=np.stack([detections[k] for k in BOX_COLUMNS], axis=1),
+                    conf=detections["conf"],
+                    idxs=detections["idx"],
+                    duration=duration,
+                    overlap=overlap,
+                    freq_min=freq_min,
+                    freq_max=freq_max,
+                )
+                df = pd.DataFrame(columns, columns=PREDICTION_COLUMNS)
+            if merge_iou_threshold is not None:
+                number_detections = len(df)
+                df = merge_detections(
+                    df, iou_threshold=merge_iou_threshold, strategy=merge_strategy
+                )
+                logging.info(
+                    f"Merged {number_detections} detections into {len(df)} across overlapping spectrograms"
+                )
         df["audio_filepath"] = str(audio_filepath)
         df["instance_class"] = "rumble"
         # df.to_csv(sub_output_dir / "results.csv")
@@ -283,4 +944,99 @@ def pipeline(
         logging.info(
             f"Elapsed time to analyze {audio_filepath.name}: {elapsed_time:.2f}s"
         )
+    if artifact_writer is not None:
+        with timer.stage("writing"):
+            artifact_writer.close()
+    for checkpoint in checkpoints:
+        checkpoint.remove()
     return pd.concat(dfs)
+
+
+# YOLO model loaded once by each worker process of `parallel_pipeline`
+_worker_model: Optional[YOLO] = None
+
+
+def _init_worker(
+    model_weights_filepath: Path,
+    threads_per_worker: int,
+    backend: str,
+    imgsz: Tuple[int, int],
+) -> None:
+    """
+    Initializes a worker process of `parallel_pipeline`: sets its share of torch
+    intra-op threads and loads its own model once.
+    """
+    global _worker_model
+    torch.set_num_threads(threads_per_worker)
+    _worker_model = load_model(model_weights_filepath, backend=backend, imgsz=imgsz)
+
+
+def _pipeline_worker(
+    audio_filepath: Path,
+    pipeline_kwargs: dict,
+    timed: bool,
+) -> Tuple[pd.DataFrame, list[dict]]:
+    """
+    Runs the pipeline on a single audio_filepath with the model of the worker process.
+    Returns the dataframe and the timer records, if timed.
+    """
+    timer = StageTimer(enabled=timed)
+    df = pipeline(
+        model=_worker_model,
+        audio_filepaths=[audio_filepath],
+        timer=timer,
+        **pipeline_kwargs,
+    )
+    return df, timer.records
+
+
+def parallel_pipeline(
+    model_weights_filepath: Path,
+    audio_filepaths: list[Path],
+    num_workers: int,
+    threads_per_worker: Optional[int] = None,
+    backend: str = "pytorch",
+    timer: Optional[StageTimer] = None,
+    **pipeline_kwargs,
+) -> pd.DataFrame:
+    """
+    Same as `pipeline` but the audio_filepaths are analyzed by a pool of `num_workers`
+    processes. Each worker loads the model from model_weights_filepath for the given
+    backend once and uses `threads_per_worker` torch threads (cpu_count / num_workers
+    by default).
+    Files are dispatched to the workers as they become available and the per file
+    dataframes are concatenated in the order of audio_filepaths.
+
+    pipeline_kwargs are the keyword arguments of `pipeline`, except model and audio_filepaths.
+    When provided, the timer collects the stage timings recorded by the workers.
+    """
+    threads_per_worker = threads_per_worker or max(
+        1, (os.cpu_count() or 1) // num_workers
+    )
+    logging.info(
+        f"Analyzing {len(audio_filepaths)} files with {num_workers} workers of {threads_per_worker} threads"
+    )
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(
+            model_weights_filepath,
+            threads_per_worker,
+            backend,
+            (pipeline_kwargs["height"], pipeline_kwargs["width"]),
+        ),
+    ) as executor:
+        outputs = list(
+            executor.map(
+                _pipeline_worker,
+                audio_filepaths,
+                itertools.repeat(pipeline_kwargs),
+                itertools.repeat(timer is not None and timer.enabled),
+                chunksize=1,
+            )
+        )
+    if timer is not None:
+        for _, records in outputs:
+            timer.records.extend(records)
+    return pd.concat([df for df, _ in outputs])
@@ -362,6 +362,7 @@ from tqdm import tqdm
 from ultralytics import YOLO
 import numpy as np
 
+from forest_elephants_rumble_detection.model.yolo.predict import predict_tensor
 from forest_elephants_rumble_detection.model.yolo.torch_inference.torchaudio_nonumpy import (
     waveform_to_image,
 )
@@ -499,32 +500,24 @@ def inference(
             ).float()
         for y in tqdm(waveforms)]
 
-    # Convert spectrograms to 3-channel tensors
-    spectrograms = [torch.stack([spect, spect, spect], dim=0) for spect in spectrograms]
-
-    # Ensure the spectrograms are of shape (3, 640, 640)
-    spectrograms = [torch.nn.functional.interpolate(spect.unsqueeze(0), size=(640, 640)).squeeze(0) for spect in spectrograms]
+    # Convert spectrograms to 3-channel tensors in [0, 1], keeping their native (height, width) geometry
+    spectrograms = [spect.expand(3, -1, -1) / 255 for spect in spectrograms]
 
     if save_spectrograms:
         save_dir = output_dir / "spectrograms"
         logging.info(f"Saving spectrograms in {save_dir}")
         save_dir.mkdir(exist_ok=True, parents=True)
         for i, spectrogram in tqdm(enumerate(spectrograms), total=len(spectrograms)):
-            image = Image.fromarray(spectrogram.squeeze().numpy().transpose(1, 2, 0))
+            image = Image.fromarray((spectrogram[0] * 255).round().to(torch.uint8).numpy())
             image.save(save_dir / f"spectrogram_{i}.png")
 
     results = []
 
-    device = model.device  # Ensure the model's device is used for tensors
-    
     batches = list(batch_sequence(spectrograms, batch_size=batch_size))
     logging.info(f"Running inference on the spectrograms, {len(batches)} batches")
 
     for batch in tqdm(batches):
-        batch_tensor = torch.stack(batch).to(device)
-        if batch_tensor.shape[1] == 1:
-            batch_tensor = batch_tensor.squeeze(1)  # Remove the second dimension if it is 1
-        results.extend(model(batch_tensor, verbose=verbose))
+        results.extend(predict_tensor(model, torch.stack(batch)))
     
     if save_predictions:
         save_dir = output_dir / "predictions"
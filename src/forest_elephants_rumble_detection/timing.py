@@ -0,0 +1,156 @@
+"""
+Lightweight instrumentation of the wall and CPU time spent in the stages of the inference pipeline.
+"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import pandas as pd
+
+from forest_elephants_rumble_detection.utils import write_json
+
+# decode: reading the audio, chunking: splitting it into clips, stft and image:
+# spectrogram and its conversion to an image, spectrogram: both at once for the
+# fused engines, gate: energy gate, forward: model, postprocessing: predictions to
+# dataframe, writing: saving artifacts and results.
+STAGES = [
+    "decode",
+    "chunking",
+    "stft",
+    "image",
+    "spectrogram",
+    "gate",
+    "forward",
+    "postprocessing",
+    "writing",
+]
+
+_DONE = object()
+
+
+class StageTimer:
+    """
+    Records the wall time and the CPU time of the process spent in each stage, labelled
+    with the audio file being processed and the batch index when relevant.
+
+    The CPU time is the one of the whole process: it includes the torch intra-op
+    threads, and the stages that overlap in the pipelined mode share it.
+    A disabled timer records nothing.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.records = []
+        # Audio file the recorded stages are labelled with, set by `pipeline`
+        self.audio_filepath: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        stage: str,
+        wall_time: float,
+        cpu_time: float,
+        batch: Optional[int] = None,
+    ) -> None:
+        """Adds a measurement of the stage for the current audio file."""
+        assert stage in STAGES, f"stage should be in {STAGES}"
+        with self._lock:
+            self.records.append(
+                {
+                    "audio_filepath": self.audio_filepath,
+                    "batch": batch,
+                    "stage": stage,
+                    "wall_time": wall_time,
+                    "cpu_time": cpu_time,
+                }
+            )
+
+    @contextmanager
+    def stage(self, stage: str, batch: Optional[int] = None):
+        """Times the code run in this context as the given stage."""
+        if not self.enabled:
+            yield
+            return
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.record(
+                stage,
+                wall_time=time.perf_counter() - wall_start,
+                cpu_time=time.process_time() - cpu_start,
+                batch=batch,
+            )
+
+    def iterate(self, iterable: Iterable, stage: str) -> Iterator:
+        """
+        Yields the items of iterable and times the production of each item as the given
+        stage, which is where the work of lazy generators happens. The index of the item
+        is used as the batch label.
+        """
+        iterator = iter(iterable)
+        for batch in itertools.count():
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            if self.enabled:
+                self.record(
+                    stage,
+                    wall_time=time.perf_counter() - wall_start,
+                    cpu_time=time.process_time() - cpu_start,
+                    batch=batch,
+                )
+            yield item
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns one row per measurement."""
+        return pd.DataFrame(
+            self.records,
+            columns=["audio_filepath", "batch", "stage", "wall_time", "cpu_time"],
+        ).astype({"batch": "Int64"})
+
+    def summary(self) -> dict:
+        """
+        Returns the total wall and CPU time of each stage, overall and per audio file,
+        with the share of the wall time each stage accounts for.
+        """
+        df = self.to_dataframe()
+        total_wall_time = df["wall_time"].sum()
+        df_stages = df.groupby("stage", sort=False)[["wall_time", "cpu_time"]].agg(
+            ["count", "sum"]
+        )
+        stages = {
+            stage: {
+                "count": int(row[("wall_time", "count")]),
+                "wall_time": float(row[("wall_time", "sum")]),
+                "cpu_time": float(row[("cpu_time", "sum")]),
+                "wall_time_share": (
+                    float(row[("wall_time", "sum")] / total_wall_time)
+                    if total_wall_time > 0
+                    else 0.0
+                ),
+            }
+            for stage, row in df_stages.iterrows()
+        }
+        files = {
+            audio_filepath: {
+                stage: {"wall_time": float(wall_time), "cpu_time": float(cpu_time)}
+                for stage, wall_time, cpu_time in df_file.groupby("stage", sort=False)[
+                    ["wall_time", "cpu_time"]
+                ]
+                .sum()
+                .itertuples()
+            }
+            for audio_filepath, df_file in df.groupby("audio_filepath", sort=False)
+        }
+        return {"stages": stages, "files": files}
+
+    def save(self, output_dir: Path) -> None:
+        """Saves the measurements in timings.csv and their summary in timings.json."""
+        self.to_dataframe().to_csv(output_dir / "timings.csv", index=False)
+        write_json(to=output_dir / "timings.json", data=self.summary())
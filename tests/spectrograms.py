@@ -0,0 +1,25 @@
+"""
+Helpers shared by the spectrogram tests.
+"""
+
+import math
+
+import numpy as np
+import torch
+
+
+def rumble_waveform(sample_rate: int, duration: float) -> torch.Tensor:
+    """Returns noise with an intermittent 14 Hz tone and a DC offset."""
+    generator = torch.Generator().manual_seed(0)
+    t = torch.arange(int(duration * sample_rate)) / sample_rate
+    gate = torch.sin(2 * math.pi * 0.05 * t) > 0.5
+    tone = 0.2 * torch.sin(2 * math.pi * 14 * t) * gate
+    noise = 0.05 * torch.randn(t.shape[0], generator=generator)
+    return (noise + tone + 0.01).unsqueeze(0)
+
+
+def pixel_diff(reference_image: np.ndarray, candidate_image: np.ndarray) -> np.ndarray:
+    """Returns the absolute differences between the pixels of the uint8 images."""
+    return np.abs(
+        reference_image.astype(np.float64) - candidate_image.astype(np.float64)
+    )
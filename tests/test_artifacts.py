@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+from forest_elephants_rumble_detection.model.yolo.artifacts import (
+    BOX_COLOR,
+    ArtifactWriter,
+    render_prediction,
+)
+
+
+def spectrogram(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (256, 640), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("compression_level", [None, 0, 9])
+def test_artifact_writer_writes_the_spectrograms(tmp_path, compression_level):
+    images = [spectrogram(seed) for seed in range(10)]
+    # Fewer slots than artifacts, the submissions wait for the writes
+    with ArtifactWriter(queue_size=2, compression_level=compression_level) as writer:
+        for i, image in enumerate(images):
+            writer.save_spectrogram(image, tmp_path / f"spectrogram_{i}.png")
+    for i, image in enumerate(images):
+        filepath = tmp_path / f"spectrogram_{i}.png"
+        written = cv2.imread(str(filepath), cv2.IMREAD_UNCHANGED)
+        np.testing.assert_array_equal(written, image)
+
+
+def test_artifact_writer_renders_the_predictions(tmp_path):
+    image = spectrogram(0)
+    boxes = torch.tensor(
+        [[100.0, 50.0, 200.0, 150.0, 0.9, 0.0], [300.0, 0.0, 400.0, 80.0, 0.4, 0.0]]
+    )
+    prediction = Results(
+        np.stack([image] * 3, axis=-1),
+        path="image.png",
+        names={0: "rumble"},
+        boxes=boxes,
+    )
+    with ArtifactWriter() as writer:
+        writer.save_prediction(prediction, tmp_path / "prediction.png")
+    written = cv2.imread(str(tmp_path / "prediction.png"))
+    rendered = render_prediction(prediction)
+    np.testing.assert_array_equal(written, rendered)
+    # The left edge of the first box is drawn in the box color
+    np.testing.assert_array_equal(rendered[100, 100], BOX_COLOR)
+    np.testing.assert_array_equal(rendered[200:, 450:], prediction.orig_img[200:, 450:])
+
+
+def test_artifact_writer_raises_the_write_errors(tmp_path):
+    writer = ArtifactWriter()
+    writer.save_spectrogram(spectrogram(0), tmp_path / "missing" / "spectrogram.png")
+    writer.save_spectrogram(spectrogram(1), tmp_path / "spectrogram.png")
+    with pytest.raises(AssertionError, match="Could not write"):
+        writer.close()
+    assert (tmp_path / "spectrogram.png").exists()
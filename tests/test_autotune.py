@@ -0,0 +1,55 @@
+from forest_elephants_rumble_detection.model.yolo.autotune import (
+    DEFAULT_SETTINGS,
+    candidate_workers,
+    machine_settings,
+    save_machine_profile,
+)
+
+TRIALS = [
+    {
+        "batch_size": 16,
+        "num_workers": 1,
+        "threads_per_worker": 4,
+        "windows_per_second": 10.0,
+        "peak_rss_mb": 500.0,
+    },
+    {
+        "batch_size": 32,
+        "num_workers": 2,
+        "threads_per_worker": 2,
+        "windows_per_second": 14.0,
+        "peak_rss_mb": 900.0,
+    },
+    {
+        "batch_size": 128,
+        "num_workers": 4,
+        "threads_per_worker": 1,
+        "windows_per_second": 20.0,
+        "peak_rss_mb": 3000.0,
+    },
+]
+
+
+def test_machine_settings_are_the_defaults_without_profile(tmp_path):
+    assert machine_settings() == DEFAULT_SETTINGS
+    assert DEFAULT_SETTINGS["batch_size"] == 64
+    assert machine_settings(tmp_path / "missing.yaml") == DEFAULT_SETTINGS
+
+
+def test_machine_settings_of_a_saved_profile(tmp_path):
+    filepath = tmp_path / "machine_profile.yaml"
+    save_machine_profile(
+        TRIALS, memory_budget_mb=1000.0, backend="pytorch", filepath=filepath
+    )
+    assert machine_settings(filepath, backend="pytorch") == {
+        "batch_size": 32,
+        "num_workers": 2,
+        "threads_per_worker": 2,
+    }
+    # Calibrated for another backend
+    assert machine_settings(filepath, backend="onnx") == DEFAULT_SETTINGS
+
+
+def test_candidate_workers():
+    pairs = [(1, 8), (1, 4), (2, 4), (2, 2), (4, 2), (4, 1), (8, 1)]
+    assert candidate_workers(8) == pairs
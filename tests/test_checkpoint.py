@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+import torchaudio
+from ultralytics.engine.results import Results
+
+from forest_elephants_rumble_detection.model.yolo import predict
+from forest_elephants_rumble_detection.model.yolo.checkpoint import Checkpoint
+
+PARAMS = {"audio_filepath": "audio.wav", "batch_size": 4}
+
+
+def columns(generator: np.random.Generator, number_rows: int) -> dict[str, np.ndarray]:
+    return {
+        "idx": generator.integers(0, 100, number_rows),
+        "x1n": generator.uniform(0, 1, number_rows).astype(np.float32),
+        "conf": generator.uniform(0, 1, number_rows).astype(np.float32),
+    }
+
+
+def test_checkpoint_reloads_the_flushed_windows(tmp_path):
+    generator = np.random.default_rng(0)
+    checkpoint = Checkpoint(tmp_path / "checkpoint", params=PARAMS, interval=0.0)
+    updates = [columns(generator, n) for n in [3, 0, 5]]
+    for update in updates:
+        checkpoint.update(update, number_windows=4, scores=generator.uniform(size=4))
+    expected = checkpoint.detections()
+
+    # Bytes of an append interrupted before the state was written
+    with open(checkpoint.detections_filepath, "ab") as f:
+        f.write(b"12,0.5,0.2")
+    reloaded = Checkpoint(tmp_path / "checkpoint", params=PARAMS, interval=0.0)
+    assert reloaded.completed_windows == 12
+    np.testing.assert_array_equal(reloaded.scores, checkpoint.scores)
+    detections = reloaded.detections()
+    assert detections.keys() == expected.keys()
+    for column, values in expected.items():
+        assert detections[column].dtype == values.dtype
+        np.testing.assert_array_equal(detections[column], values)
+
+    reloaded.update(columns(generator, 2), number_windows=4)
+    assert len(reloaded.detections()["idx"]) == 10
+
+
+def test_checkpoint_saved_with_other_params_is_discarded(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "checkpoint", params=PARAMS, interval=0.0)
+    checkpoint.update(columns(np.random.default_rng(0), 3), number_windows=4)
+    reloaded = Checkpoint(
+        tmp_path / "checkpoint", params={**PARAMS, "batch_size": 8}, interval=0.0
+    )
+    assert reloaded.completed_windows == 0
+    assert reloaded.detections() == {}
+    assert not reloaded.state_filepath.exists()
+
+
+class Crash(Exception):
+    pass
+
+
+class FakeModel:
+    """Stands in for the YOLO model, see `fake_predict_images`."""
+
+    model_name = "fake"
+    names = {0: "rumble"}
+
+    def __init__(self, crash_after: int | None = None):
+        self.crash_after = crash_after
+        self.number_batches = 0
+
+
+def fake_predict_images(model: FakeModel, images: list, verbose: bool) -> list:
+    """
+    Returns a deterministic box per image, on its brightest column, and raises Crash
+    once the model has seen crash_after batches.
+    """
+    if model.crash_after is not None and model.number_batches == model.crash_after:
+        raise Crash()
+    model.number_batches += 1
+    results = []
+    for image in images:
+        arr = np.asarray(image).astype(np.float32)
+        x = float(arr.mean(axis=0).argmax())
+        boxes = torch.tensor([[x, 20.0, x + 30.0, 200.0, arr.mean() / 255, 0.0]])
+        results.append(Results(arr, path="image.png", names=model.names, boxes=boxes))
+    return results
+
+
+@pytest.mark.parametrize("energy_gate", [False, True])
+def test_resumed_pipeline_matches_uninterrupted_run(tmp_path, monkeypatch, energy_gate):
+    monkeypatch.setattr(predict, "predict_images", fake_predict_images)
+    sample_rate = 4000
+    waveform = 0.3 * torch.randn(
+        1, 300 * sample_rate, generator=torch.Generator().manual_seed(0)
+    )
+    audio_filepath = tmp_path / "audio.wav"
+    torchaudio.save(audio_filepath, waveform, sample_rate, bits_per_sample=16)
+    kwargs = {
+        "audio_filepaths": [audio_filepath],
+        "duration": 20.0,
+        "overlap": 5.0,
+        "width": 640,
+        "height": 256,
+        "freq_min": 0.0,
+        "freq_max": 250.0,
+        "n_fft": 4096,
+        "hop_length": 1024,
+        "batch_size": 4,
+        "save_spectrograms": False,
+        "save_predictions": False,
+        "verbose": False,
+        "energy_gate": energy_gate,
+    }
+    expected = predict.pipeline(
+        model=FakeModel(), output_dir=tmp_path / "uninterrupted", **kwargs
+    )
+    assert len(expected) > 0
+
+    output_dir = tmp_path / "resumed"
+    with pytest.raises(Crash):
+        predict.pipeline(
+            model=FakeModel(crash_after=2),
+            output_dir=output_dir,
+            checkpoint_interval=0.0,
+            **kwargs,
+        )
+    model = FakeModel()
+    df = predict.pipeline(
+        model=model, output_dir=output_dir, checkpoint_interval=0.0, **kwargs
+    )
+    # 19 windows in batches of 4, the 2 completed batches are not run again
+    assert model.number_batches == 3
+    pd.testing.assert_frame_equal(df, expected)
+    assert not (output_dir / "checkpoints" / "audio").exists()
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from forest_elephants_rumble_detection.model.yolo.merge import box_iou, merge_detections
+
+COLUMNS = ["probability", "freq_start", "freq_end", "t_start", "t_end"]
+
+
+def detections(records: list[tuple]) -> pd.DataFrame:
+    return pd.DataFrame(records, columns=COLUMNS)
+
+
+def pairwise_merge(df: pd.DataFrame, iou_threshold: float) -> list[int]:
+    """
+    Returns the index, in df sorted by t_start, of the representative of each cluster,
+    matching each detection against all the clusters in O(n^2).
+    """
+    df = df.sort_values("t_start", kind="stable").reset_index(drop=True)
+    boxes = df[["t_start", "t_end", "freq_start", "freq_end"]].to_numpy()
+    representatives = []
+    for i in range(len(df)):
+        best_cluster, best_iou = None, iou_threshold
+        for cluster, j in enumerate(representatives):
+            iou = box_iou(*boxes[j], *boxes[i])
+            if iou >= best_iou:
+                best_cluster, best_iou = cluster, iou
+        if best_cluster is None:
+            representatives.append(i)
+        elif df["probability"][i] > df["probability"][representatives[best_cluster]]:
+            representatives[best_cluster] = i
+    return sorted(representatives, key=lambda i: (df["t_start"][i], i))
+
+
+def test_merge_duplicates_across_overlapping_windows():
+    # Each rumble is reported by two subsequent windows, with slightly different boxes
+    df = detections(
+        [
+            (0.9, 10.0, 40.0, 150.0, 160.0),
+            (0.6, 11.0, 41.0, 150.5, 160.2),
+            (0.5, 20.0, 60.0, 300.0, 306.0),
+            (0.8, 19.0, 60.0, 300.2, 306.1),
+            (0.7, 100.0, 140.0, 152.0, 158.0),
+        ]
+    )
+    df_merged = merge_detections(df, iou_threshold=0.5, strategy="suppress")
+    assert df_merged["probability"].tolist() == [0.9, 0.7, 0.8]
+    assert df_merged["t_start"].tolist() == [150.0, 152.0, 300.2]
+
+    df_union = merge_detections(df, iou_threshold=0.5, strategy="union")
+    extent = df_union.iloc[0][["t_start", "t_end", "freq_start", "freq_end"]]
+    assert extent.tolist() == [150.0, 160.2, 10.0, 41.0]
+    assert df_union["probability"].tolist() == [0.9, 0.7, 0.8]
+
+
+@pytest.mark.parametrize("iou_threshold", [0.3, 0.5, 0.8])
+def test_merge_matches_pairwise_comparisons(iou_threshold):
+    rng = np.random.default_rng(0)
+    number_detections = 300
+    t_start = rng.uniform(0, 3000, number_detections)
+    freq_start = rng.uniform(0, 200, number_detections)
+    df = pd.DataFrame(
+        {
+            "probability": rng.uniform(0, 1, number_detections),
+            "freq_start": freq_start,
+            "freq_end": freq_start + rng.uniform(5, 50, number_detections),
+            "t_start": t_start,
+            "t_end": t_start + rng.uniform(1, 30, number_detections),
+        }
+    )
+    # Duplicates of a third of the detections, jittered
+    duplicates = df.sample(frac=1 / 3, random_state=0).copy()
+    duplicates[["t_start", "t_end"]] += rng.uniform(-0.5, 0.5, (len(duplicates), 1))
+    duplicates["probability"] = rng.uniform(0, 1, len(duplicates))
+    df = pd.concat([df, duplicates], ignore_index=True)
+
+    df_merged = merge_detections(df, iou_threshold=iou_threshold)
+    df_sorted = df.sort_values("t_start", kind="stable").reset_index(drop=True)
+    expected = df_sorted.iloc[pairwise_merge(df, iou_threshold)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_merged, expected)
+    assert len(df_merged) < len(df)
+
+
+def test_merge_without_detections():
+    df_merged = merge_detections(detections([]))
+    assert df_merged.empty
+    assert list(df_merged.columns) == COLUMNS
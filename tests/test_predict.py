@@ -0,0 +1,42 @@
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+from forest_elephants_rumble_detection.model.yolo.predict import (
+    predict_gated,
+    predict_tensor,
+)
+
+
+def fresh_model() -> YOLO:
+    """Returns an untrained yolov8n whose predictor is not set up yet."""
+    return YOLO("yolov8n.yaml")
+
+
+def uint8_images(batch_size: int = 2) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(0)
+    return torch.randint(
+        0, 256, (batch_size, 256, 640), dtype=torch.uint8, generator=generator
+    )
+
+
+def test_predict_tensor_uint8_on_fresh_model():
+    model = fresh_model()
+    images = uint8_images()
+    predictions = predict_tensor(model, images)
+    assert len(predictions) == 2
+    assert predictions[0].orig_img.shape == (256, 640, 3)
+
+    # Same detections as the float images fed to the now set up predictor
+    floats = (images.unsqueeze(1) / 255).expand(-1, 3, -1, -1).contiguous()
+    expected = predict_tensor(model, floats)
+    for prediction, expected_prediction in zip(predictions, expected):
+        assert torch.equal(prediction.boxes.data, expected_prediction.boxes.data)
+
+
+def test_predict_gated_uint8_on_fresh_model():
+    images = uint8_images(batch_size=3)
+    mask = np.array([True, False, True])
+    predictions = predict_gated(fresh_model(), images, mask, start=0, verbose=False)
+    assert len(predictions) == 3
+    assert len(predictions[1].boxes) == 0
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+from forest_elephants_rumble_detection.model.yolo.predict import (
+    PREDICTION_COLUMNS,
+    from_yolov8_prediction,
+    to_dataframe,
+)
+
+PARAMS = {"duration": 164.0, "overlap": 10.0, "freq_min": 0.0, "freq_max": 250.0}
+
+
+def prediction(number_boxes: int, generator: torch.Generator) -> Results:
+    """Returns a prediction on a 640x256 image with random, partly flipped, boxes."""
+    xyxy = torch.rand(number_boxes, 4, generator=generator) * torch.tensor(
+        [640.0, 256.0, 640.0, 256.0]
+    )
+    conf = torch.rand(number_boxes, 1, generator=generator)
+    boxes = torch.cat([xyxy, conf, torch.zeros(number_boxes, 1)], dim=1)
+    return Results(
+        np.zeros((256, 640, 3), dtype=np.uint8),
+        path="image.png",
+        names={0: "rumble"},
+        boxes=boxes,
+    )
+
+
+def per_box_records(yolov8_prediction: Results, idx: int) -> list[dict]:
+    """Converts the boxes one at a time, like the original implementation."""
+    offset = idx * (PARAMS["duration"] - PARAMS["overlap"])
+    freq_range = PARAMS["freq_max"] - PARAMS["freq_min"]
+    records = []
+    for k, box_xyxyn in enumerate(yolov8_prediction.boxes.xyxyn):
+        x1, y1, x2, y2 = box_xyxyn.numpy()
+        records.append(
+            {
+                "probability": yolov8_prediction.boxes.conf[k].item(),
+                "freq_start": min(y1, y2) * freq_range,
+                "freq_end": max(y1, y2) * freq_range,
+                "t_start": min(x1, x2) * PARAMS["duration"] + offset,
+                "t_end": max(x1, x2) * PARAMS["duration"] + offset,
+            }
+        )
+    return records
+
+
+def test_to_dataframe_matches_per_box_conversion():
+    generator = torch.Generator().manual_seed(0)
+    predictions = [prediction(n, generator) for n in [3, 0, 5, 1]]
+    expected = pd.DataFrame(
+        [
+            record
+            for idx, yolov8_prediction in enumerate(predictions)
+            for record in per_box_records(yolov8_prediction, idx)
+        ]
+    )
+    df = to_dataframe(predictions, **PARAMS)
+    assert list(df.columns) == PREDICTION_COLUMNS
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    records = from_yolov8_prediction(predictions[2], idx=2, **PARAMS)
+    expected_records = per_box_records(predictions[2], idx=2)
+    assert records == [pytest.approx(record) for record in expected_records]
+
+
+def test_to_dataframe_without_predictions():
+    df = to_dataframe([], **PARAMS)
+    assert df.empty
+    assert list(df.columns) == PREDICTION_COLUMNS
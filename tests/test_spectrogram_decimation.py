@@ -0,0 +1,31 @@
+import pytest
+
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
+    baseline_spectrogram,
+    spectrogram_tensor_to_np_image,
+    waveform_to_spectrogram,
+)
+from tests.spectrograms import pixel_diff, rumble_waveform
+
+
+@pytest.mark.parametrize("sample_rate", [4000, 8000, 44100])
+def test_decimated_spectrogram_matches_baseline(sample_rate):
+    kwargs = {
+        "sample_rate": sample_rate,
+        "n_fft": 4096,
+        "hop_length": 1024,
+        "freq_max": 250.0,
+    }
+    waveform = rumble_waveform(sample_rate, duration=60.0)
+    reference = baseline_spectrogram(waveform, **kwargs)
+    candidate = waveform_to_spectrogram(waveform, **kwargs, decimate_waveform=True)
+    assert candidate.shape == reference.shape
+    # Same dB range, hence the same min/max normalization of the images
+    assert abs(candidate.max().item() - reference.max().item()) < 0.01
+    assert abs(candidate.min().item() - reference.min().item()) < 0.5
+
+    reference_image = spectrogram_tensor_to_np_image(reference, width=640, height=256)
+    candidate_image = spectrogram_tensor_to_np_image(candidate, width=640, height=256)
+    diff = pixel_diff(reference_image, candidate_image)
+    assert diff.mean() <= 1.0
+    assert diff.max() <= 4.0
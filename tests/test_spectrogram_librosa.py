@@ -0,0 +1,67 @@
+import io
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from PIL import Image
+
+from forest_elephants_rumble_detection.data.spectrogram.librosa import (
+    make_spectrogram2,
+    make_spectrogram_image,
+)
+
+matplotlib.use("Agg")
+
+
+def rumble_audio(seed: int, sr: int, duration: float) -> np.ndarray:
+    """Returns noise with an intermittent tone around 14 Hz."""
+    generator = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+    gate = np.sin(2 * np.pi * 0.05 * t) > 0.5
+    tone = 0.2 * np.sin(2 * np.pi * (14 + seed) * t) * gate
+    noise = 0.05 * generator.standard_normal(t.shape[0])
+    return (noise + tone).astype(np.float32)
+
+
+def specshow_image(audio: np.ndarray, **kwargs) -> np.ndarray:
+    """Returns the image saved by build_features.py with the matplotlib renderer."""
+    make_spectrogram2(audio, **kwargs)
+    buffer = io.BytesIO()
+    plt.savefig(
+        buffer, format="png", bbox_inches="tight", pad_inches=0.0, dpi=kwargs["dpi"]
+    )
+    plt.close("all")
+    return np.array(Image.open(buffer).convert("RGB"))
+
+
+@pytest.mark.parametrize(
+    "sr,duration,n_fft,hop_length,width,height,dpi",
+    [
+        # Defaults of build_features.py
+        (4000, 60.0, 1048 * 8, 512, 640, 640, 96),
+        (8000, 17.3, 1048 * 8, 512, 640, 640, 96),
+        (4000, 30.0, 2048, 256, 640, 256, 72),
+    ],
+)
+@pytest.mark.parametrize("seed", [0, 1])
+def test_array_renderer_matches_specshow(
+    seed, sr, duration, n_fft, hop_length, width, height, dpi
+):
+    kwargs = {
+        "sr": sr,
+        "n_fft": n_fft,
+        "top_db": 70,
+        "fmin": 0.0,
+        "fmax": 250.0,
+        "dpi": dpi,
+        "hop_length": hop_length,
+        "width": width,
+        "height": height,
+    }
+    audio = rumble_audio(seed, sr=sr, duration=duration)
+    expected = specshow_image(audio, **kwargs)
+    image = make_spectrogram_image(audio, **kwargs)
+    if (width, height, dpi) == (640, 640, 96):
+        assert image.shape == (height, width, 3)
+    np.testing.assert_array_equal(image, expected)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import torch
+
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
+    clip,
+    sliced_waveform_to_np_images,
+    waveform_to_np_image,
+)
+from forest_elephants_rumble_detection.model.yolo.predict import chunk_offsets
+
+
+@pytest.mark.parametrize("block_size", [None, 3])
+@pytest.mark.parametrize(
+    "sample_rate,decimate_waveform,duration,overlap",
+    [
+        # Clips 51.2 s apart, on the frame grid, sharing their spectrograms
+        (4000, False, 60.0, 8.8),
+        (8000, True, 60.0, 8.8),
+        # Clips 50 s apart, off the frame grid
+        (4000, False, 60.0, 10.0),
+        (8000, True, 60.0, 10.0),
+    ],
+)
+def test_sliced_images_match_clip_images(
+    sample_rate, decimate_waveform, duration, overlap, block_size
+):
+    kwargs = {
+        "sample_rate": sample_rate,
+        "n_fft": 4096,
+        "hop_length": 1024,
+        "freq_max": 250.0,
+        "width": 640,
+        "height": 256,
+        "decimate_waveform": decimate_waveform,
+    }
+    total_seconds = 300.0
+    waveform = 0.3 * torch.randn(
+        1,
+        int(total_seconds * sample_rate),
+        generator=torch.Generator().manual_seed(0),
+    )
+    offsets = chunk_offsets(
+        total_seconds=total_seconds, duration=duration, overlap=overlap
+    )
+    images = list(
+        sliced_waveform_to_np_images(
+            waveform,
+            offsets=offsets,
+            duration=duration,
+            block_size=block_size,
+            **kwargs,
+        )
+    )
+    assert len(images) == len(offsets)
+    for offset, image in zip(offsets, images):
+        clip_waveform = clip(
+            waveform, offset=offset, duration=duration, sample_rate=sample_rate
+        )
+        expected = waveform_to_np_image(clip_waveform, **kwargs)
+        pixel_diff = np.abs(image.astype(np.float64) - expected.astype(np.float64))
+        assert pixel_diff.mean() <= 0.01
+        assert pixel_diff.max() <= 1.0
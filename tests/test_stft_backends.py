@@ -0,0 +1,72 @@
+import pytest
+import torch
+
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
+    STFT_BACKENDS,
+    STFT_PARITY_TOLERANCE_DB,
+    baseline_spectrogram,
+    fastest_stft_backend,
+    spectrogram_engine,
+    spectrogram_tensor_to_np_image,
+    stft_parity,
+)
+from tests.spectrograms import pixel_diff, rumble_waveform
+
+N_FFT = 4096
+HOP_LENGTH = 1024
+FREQ_MAX = 250.0
+
+
+@pytest.mark.parametrize("decimate_waveform", [False, True])
+@pytest.mark.parametrize("sample_rate", [4000, 44100])
+@pytest.mark.parametrize("stft_backend", list(STFT_BACKENDS.keys()))
+def test_stft_backend_matches_torch_and_baseline(
+    stft_backend, sample_rate, decimate_waveform
+):
+    kwargs = {
+        "sample_rate": sample_rate,
+        "n_fft": N_FFT,
+        "hop_length": HOP_LENGTH,
+        "freq_max": FREQ_MAX,
+    }
+    waveform = rumble_waveform(sample_rate, duration=60.0)
+    engine = spectrogram_engine(
+        **kwargs, decimate_waveform=decimate_waveform, stft_backend=stft_backend
+    )
+    reference_engine = spectrogram_engine(
+        **kwargs, decimate_waveform=decimate_waveform
+    )
+    power = engine.power_spectrogram(waveform)
+    reference_power = reference_engine.power_spectrogram(waveform)
+    assert power.shape == reference_power.shape
+    assert stft_parity(reference_power, power) <= STFT_PARITY_TOLERANCE_DB
+
+    reference = baseline_spectrogram(waveform, **kwargs)
+    candidate = engine.spectrogram(waveform)
+    assert candidate.shape == reference.shape
+    reference_image = spectrogram_tensor_to_np_image(reference, width=640, height=256)
+    candidate_image = spectrogram_tensor_to_np_image(candidate, width=640, height=256)
+    diff = pixel_diff(reference_image, candidate_image)
+    assert diff.mean() <= 0.02
+    assert diff.max() <= 1.0
+
+
+def test_stft_parity_ignores_the_quiet_bins():
+    reference = torch.tensor([[1.0, 1e-9, 1e-3]])
+    candidate = torch.tensor([[1.0, 1e-10, 1.1e-3]])
+    assert stft_parity(reference, candidate) == pytest.approx(
+        10 * torch.log10(torch.tensor(1.1)).item(), abs=1e-4
+    )
+    assert stft_parity(reference, candidate, top_db=20.0) == 0.0
+
+
+def test_fastest_stft_backend_is_a_backend():
+    stft_backend = fastest_stft_backend(
+        sample_rate=4000,
+        n_fft=N_FFT,
+        hop_length=HOP_LENGTH,
+        freq_max=FREQ_MAX,
+        number_frames=32,
+        number_repeats=1,
+    )
+    assert stft_backend in STFT_BACKENDS
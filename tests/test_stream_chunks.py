@@ -0,0 +1,34 @@
+import pytest
+import torch
+import torchaudio
+
+from forest_elephants_rumble_detection.model.yolo.predict import chunk, stream_chunks
+
+
+@pytest.mark.parametrize("suffix", [".wav", ".flac"])
+@pytest.mark.parametrize("start_window", [0, 2])
+def test_stream_chunks_match_chunk(tmp_path, suffix, start_window):
+    sample_rate = 4000
+    waveform = 0.3 * torch.randn(
+        1, 100 * sample_rate + 123, generator=torch.Generator().manual_seed(0)
+    )
+    audio_filepath = tmp_path / f"audio{suffix}"
+    torchaudio.save(audio_filepath, waveform, sample_rate, bits_per_sample=16)
+    loaded_waveform, _ = torchaudio.load(audio_filepath)
+
+    expected = chunk(
+        waveform=loaded_waveform, sample_rate=sample_rate, duration=20.0, overlap=5.0
+    )[start_window:]
+    # Blocks shorter than the clips, carrying over the overlap
+    clips = list(
+        stream_chunks(
+            audio_filepath,
+            duration=20.0,
+            overlap=5.0,
+            block_duration=7.0,
+            start_window=start_window,
+        )
+    )
+    assert len(clips) == len(expected)
+    for streamed_clip, expected_clip in zip(clips, expected):
+        assert torch.equal(streamed_clip, expected_clip)
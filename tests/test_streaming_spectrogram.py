@@ -0,0 +1,49 @@
+import random
+
+import pytest
+import torch
+
+from forest_elephants_rumble_detection.data.spectrogram.torchaudio import (
+    STREAMING_TOLERANCE_DB,
+    STREAMING_TOP_DB,
+    StreamingSpectrogram,
+    spectrogram_engine,
+    spectrogram_parity,
+)
+
+
+def stream(engine, waveform: torch.Tensor, max_block_size: int) -> torch.Tensor:
+    """Returns the spectrogram of the waveform pushed in blocks of random sizes."""
+    rng = random.Random(0)
+    streaming = StreamingSpectrogram(engine)
+    spectrograms = []
+    start = 0
+    while start < waveform.shape[-1]:
+        size = rng.randint(1, max_block_size)
+        spectrograms.append(streaming.push(waveform[:, start : start + size]))
+        start += size
+    spectrograms.append(streaming.flush())
+    return torch.cat(spectrograms, dim=-1)
+
+
+@pytest.mark.parametrize("decimate_waveform", [False, True])
+@pytest.mark.parametrize("sample_rate", [4000, 44100])
+@pytest.mark.parametrize("duration", [3.75, 15.0])
+def test_streaming_spectrogram_matches_one_shot(
+    decimate_waveform, sample_rate, duration
+):
+    engine = spectrogram_engine(
+        sample_rate=sample_rate,
+        n_fft=4096,
+        hop_length=1024,
+        freq_max=250.0,
+        decimate_waveform=decimate_waveform,
+    )
+    waveform = 0.3 * torch.randn(
+        1, int(duration * sample_rate), generator=torch.Generator().manual_seed(0)
+    )
+    expected = engine.spectrogram(waveform)
+    streamed = stream(engine, waveform, max_block_size=3000)
+    assert streamed.shape == expected.shape
+    difference_db = spectrogram_parity(expected, streamed, top_db=STREAMING_TOP_DB)
+    assert difference_db <= STREAMING_TOLERANCE_DB
@@ -0,0 +1,67 @@
+import json
+import time
+
+import pandas as pd
+import pytest
+
+from forest_elephants_rumble_detection.timing import StageTimer
+
+
+def slow_items(number_items: int, seconds: float):
+    """Lazy generator doing its work as the items are pulled."""
+    for i in range(number_items):
+        time.sleep(seconds)
+        yield i
+
+
+def test_stage_timer_records_the_stages():
+    timer = StageTimer()
+    timer.audio_filepath = "a.wav"
+    with timer.stage("decode"):
+        time.sleep(0.02)
+    assert list(timer.iterate(slow_items(3, 0.01), stage="spectrogram")) == [0, 1, 2]
+    timer.audio_filepath = "b.wav"
+    with pytest.raises(ValueError):
+        with timer.stage("forward", batch=4):
+            raise ValueError()
+
+    df = timer.to_dataframe()
+    assert df["stage"].tolist() == ["decode"] + ["spectrogram"] * 3 + ["forward"]
+    assert df["audio_filepath"].tolist() == ["a.wav"] * 4 + ["b.wav"]
+    assert df["batch"].tolist() == [pd.NA, 0, 1, 2, 4]
+    assert df["wall_time"].iloc[0] >= 0.02
+    assert (df["wall_time"].iloc[1:4] >= 0.01).all()
+
+    summary = timer.summary()
+    assert summary["stages"]["spectrogram"]["count"] == 3
+    assert sum(s["wall_time_share"] for s in summary["stages"].values()) == (
+        pytest.approx(1.0)
+    )
+    assert summary["files"]["a.wav"].keys() == {"decode", "spectrogram"}
+    assert summary["files"]["b.wav"].keys() == {"forward"}
+
+
+def test_disabled_stage_timer_records_nothing():
+    timer = StageTimer(enabled=False)
+    with timer.stage("decode"):
+        pass
+    assert list(timer.iterate(range(3), stage="spectrogram")) == [0, 1, 2]
+    assert timer.to_dataframe().empty
+
+
+def test_stage_timer_rejects_unknown_stages():
+    with pytest.raises(AssertionError):
+        with StageTimer().stage("unknown"):
+            pass
+
+
+def test_stage_timer_saves_the_timings(tmp_path):
+    timer = StageTimer()
+    timer.audio_filepath = "a.wav"
+    with timer.stage("gate", batch=0):
+        pass
+    timer.save(tmp_path)
+    df = pd.read_csv(tmp_path / "timings.csv")
+    assert df["stage"].tolist() == ["gate"]
+    with open(tmp_path / "timings.json") as f:
+        assert json.load(f)["stages"]["gate"]["count"] == 1
@@ -0,0 +1,116 @@
+import struct
+
+import librosa
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+import torchaudio
+
+from forest_elephants_rumble_detection.data.audio import load_audio
+from forest_elephants_rumble_detection.data.wav import (
+    WAVE_FORMAT_IEEE_FLOAT,
+    WAVE_FORMAT_PCM,
+    WavReader,
+    open_wav,
+    parse_header,
+)
+
+SAMPLE_RATE = 4000
+
+# soundfile subtype -> (format, bits per sample)
+SUBTYPES = {
+    "PCM_U8": (WAVE_FORMAT_PCM, 8),
+    "PCM_16": (WAVE_FORMAT_PCM, 16),
+    "PCM_24": (WAVE_FORMAT_PCM, 24),
+    "PCM_32": (WAVE_FORMAT_PCM, 32),
+    "FLOAT": (WAVE_FORMAT_IEEE_FLOAT, 32),
+    "DOUBLE": (WAVE_FORMAT_IEEE_FLOAT, 64),
+}
+
+
+def write_wav(filepath, subtype: str, num_channels: int, num_frames: int = 10007):
+    """
+    Writes a WAV file of noise, with full scale samples, and returns its filepath. The
+    files of more than 2 channels are written with the extensible format.
+    """
+    rng = np.random.default_rng(0)
+    data = rng.uniform(-1, 1, (num_frames, num_channels))
+    data[:2] = [[-1.0] * num_channels, [1.0 - 2**-23] * num_channels]
+    wav_format = "WAVEX" if num_channels > 2 else "WAV"
+    sf.write(filepath, data, SAMPLE_RATE, subtype=subtype, format=wav_format)
+    return filepath
+
+
+@pytest.mark.parametrize("num_channels", [1, 2, 3])
+@pytest.mark.parametrize("subtype", list(SUBTYPES.keys()))
+def test_wav_reader_matches_torchaudio_load(tmp_path, subtype, num_channels):
+    filepath = write_wav(tmp_path / "audio.wav", subtype, num_channels)
+    expected, sample_rate = torchaudio.load(filepath)
+
+    header = parse_header(filepath)
+    audio_format, bits_per_sample = SUBTYPES[subtype]
+    assert header["audio_format"] == audio_format
+    assert header["bits_per_sample"] == bits_per_sample
+    assert header["num_channels"] == num_channels
+    assert header["sample_rate"] == SAMPLE_RATE
+    assert header["data_size"] == 10007 * header["block_align"]
+
+    reader = WavReader(filepath)
+    assert reader.sample_rate == sample_rate
+    assert reader.shape == tuple(expected.shape)
+    waveform = reader.read_float()
+    assert waveform.flags.writeable and waveform.flags.c_contiguous
+    assert torch.equal(torch.from_numpy(waveform), expected)
+    window = reader.read_float(frame_offset=1234, num_frames=4000)
+    assert torch.equal(torch.from_numpy(window), expected[:, 1234:5234])
+    # Truncated at the end of the file
+    window = reader.read_float(frame_offset=10000, num_frames=4000)
+    assert window.shape == (num_channels, 7)
+    clip = reader.to_float(reader.clip(offset=0.3337, duration=1.0))
+    assert torch.equal(torch.from_numpy(clip), expected[:, 1334:5334])
+
+
+def test_parse_header_skips_the_other_chunks(tmp_path):
+    samples = np.arange(-50, 50, dtype="<i2")
+    fmt = struct.pack(
+        "<HHIIHH", WAVE_FORMAT_PCM, 1, SAMPLE_RATE, 2 * SAMPLE_RATE, 2, 16
+    )
+    chunks = (
+        b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        # Odd sized chunk, padded to an even size
+        + b"LIST" + struct.pack("<I", 3) + b"abc\x00"
+        # Declared larger than the file, like a truncated recording
+        + b"data" + struct.pack("<I", 1000) + samples.tobytes()
+    )
+    filepath = tmp_path / "audio.wav"
+    filepath.write_bytes(
+        b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+    )
+    header = parse_header(filepath)
+    assert header["data_size"] == 200
+    reader = WavReader(filepath)
+    assert reader.num_frames == 100
+    np.testing.assert_array_equal(reader.read()[:, 0], samples)
+
+
+def test_open_wav_returns_none_for_other_files(tmp_path):
+    filepath = tmp_path / "audio.flac"
+    sf.write(filepath, np.zeros(100), SAMPLE_RATE)
+    assert open_wav(filepath) is None
+    with pytest.raises(ValueError):
+        parse_header(filepath)
+
+
+@pytest.mark.parametrize("subtype", ["PCM_16", "PCM_24", "FLOAT"])
+@pytest.mark.parametrize("offset,duration", [(0.0, 1.0), (0.3337, 1.4999), (1.2, None)])
+def test_load_audio_matches_librosa(tmp_path, subtype, offset, duration):
+    filepath = write_wav(tmp_path / "audio.wav", subtype, num_channels=2)
+    audio, sr = load_audio(filepath, duration=duration, offset=offset)
+    expected, expected_sr = librosa.load(
+        filepath, sr=None, mono=True, duration=duration, offset=offset
+    )
+    assert sr == expected_sr
+    assert audio.dtype == expected.dtype
+    assert audio.shape == expected.shape
+    np.testing.assert_allclose(audio, expected, rtol=0, atol=1e-7)